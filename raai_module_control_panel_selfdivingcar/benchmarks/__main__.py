@@ -0,0 +1,46 @@
+# Copyright (C) 2023, NG:ITL
+"""
+Runs the hot path benchmarks headless.
+
+    python -m benchmarks                                   run everything and print the results
+    python -m benchmarks --save benchmarks/baseline.json   additionally store the results as json
+    python -m benchmarks --compare benchmarks/baseline.json  print the p50 change against stored results
+    python -m benchmarks receive_data model_set_all        run only the named benchmarks
+"""
+import os
+import sys
+import argparse
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PySide6.QtCore import QCoreApplication  # noqa: E402
+
+from benchmarks.harness import load_results, print_results, save_results  # noqa: E402
+from benchmarks.bench_hot_paths import BENCHMARKS  # noqa: E402
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Control panel hot path benchmarks")
+    parser.add_argument("names", nargs="*", help="benchmarks to run, all if omitted")
+    parser.add_argument("--iterations", type=int, default=20_000)
+    parser.add_argument("--save", metavar="PATH", help="store the results as json")
+    parser.add_argument("--compare", metavar="PATH", help="compare against results stored with --save")
+    args = parser.parse_args()
+
+    unknown = [name for name in args.names if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown benchmarks: {', '.join(unknown)}, available: {', '.join(BENCHMARKS)}")
+
+    app = QCoreApplication(sys.argv[:1])  # noqa: F841, the models need an application instance
+
+    results = {}
+    for name in args.names or BENCHMARKS:
+        results[name] = BENCHMARKS[name](args.iterations)
+
+    print_results(results, load_results(args.compare) if args.compare else None)
+    if args.save:
+        save_results(args.save, results)
+
+
+if __name__ == "__main__":
+    main()
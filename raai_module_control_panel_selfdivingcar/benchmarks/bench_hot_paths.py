@@ -0,0 +1,321 @@
+# Copyright (C) 2023, NG:ITL
+"""
+Benchmarks of the control panel hot paths, collected in BENCHMARKS and run by python -m benchmarks.
+
+Every benchmark takes the number of iterations and returns a harness result. Sockets are local
+ipc:// sockets in a temporary directory, nothing else of the race setup has to run.
+"""
+import os
+import json
+import time
+import shutil
+import tempfile
+import pynng
+
+from benchmarks.harness import measure, summarize
+from benchmarks.bench_wire_format import CONFIG_PAYLOAD, DRIVER_INPUT_PAYLOAD
+from control_panel_backend.control_panel import (
+    ConfigPublisher,
+    read_config,
+    receive_all_data,
+    receive_data,
+    remove_pynng_topic,
+    send_data,
+)
+from control_panel_backend.config_store import ConfigStore
+from control_panel_backend.control_panel_model import ControlPanelModel
+from control_panel_backend.database_interface_model import DriverDataPublisher
+from control_panel_backend.driver_cache import DriverCache
+from control_panel_backend.driver_database_stub import generate_drivers
+from control_panel_backend.driver_input_scaling import (
+    driver_input_to_array,
+    scale_driver_input,
+    scale_driver_input_sample,
+)
+from control_panel_backend.timer_model import Timer
+from control_panel_backend.wire_format import decode_message, encode_message
+
+CAR_CONFIG = {
+    "start": False,
+    "stream": True,
+    "motor": False,
+    "process": False,
+    "debug": False,
+    "curvespeed": 42.5,
+    "straightlinespeed": 80.0,
+}
+
+
+class LocalSockets:
+    """A publisher and a subscriber connected over ipc:// in a temporary directory."""
+
+    def __init__(self, topic: str) -> None:
+        self._dir = tempfile.mkdtemp(prefix="raai_bench_")
+        address = "ipc://" + os.path.join(self._dir, "bench.ipc")
+        self.pub = pynng.Pub0(send_buffer_size=1024)
+        self.pub.listen(address)
+        self.sub = pynng.Sub0(recv_buffer_size=1024, recv_timeout=1000)
+        self.sub.subscribe(topic)
+        self.sub.dial(address)
+        # let the subscriber's pipe attach before anything is sent
+        time.sleep(0.1)
+
+    def close(self) -> None:
+        self.sub.close()
+        self.pub.close()
+        shutil.rmtree(self._dir, ignore_errors=True)
+
+
+def bench_send_data_json(iterations: int) -> dict:
+    sockets = LocalSockets("config")
+    try:
+        return measure(lambda: send_data(sockets.pub, CONFIG_PAYLOAD, "config", p_print=False), iterations)
+    finally:
+        sockets.close()
+
+
+def bench_send_data_binary(iterations: int) -> dict:
+    sockets = LocalSockets("config")
+    try:
+        return measure(lambda: send_data(sockets.pub, CONFIG_PAYLOAD, "config", False, binary=True), iterations)
+    finally:
+        sockets.close()
+
+
+def _fill(sockets: LocalSockets, count: int) -> None:
+    for _ in range(count):
+        send_data(sockets.pub, DRIVER_INPUT_PAYLOAD, "driver_input", p_print=False)
+    # the messages have to be in the subscriber's queue, the transport is not part of the measurement
+    time.sleep(0.005)
+
+
+def bench_receive_data(iterations: int, batch: int = 64) -> dict:
+    sockets = LocalSockets("driver_input")
+    latencies: list = []
+    total_ns = 0
+    try:
+        while len(latencies) < iterations:
+            _fill(sockets, batch)
+            start = time.perf_counter_ns()
+            for _ in range(batch):
+                t = time.perf_counter_ns()
+                receive_data(sockets.sub)
+                latencies.append(time.perf_counter_ns() - t)
+            total_ns += time.perf_counter_ns() - start
+        return summarize(latencies, total_ns)
+    finally:
+        sockets.close()
+
+
+def bench_receive_all_data_x64(iterations: int) -> dict:
+    sockets = LocalSockets("driver_input")
+    latencies: list = []
+    total_ns = 0
+    try:
+        for _ in range(max(1, iterations // 64)):
+            _fill(sockets, 64)
+            t = time.perf_counter_ns()
+            receive_all_data(sockets.sub)
+            latencies.append(time.perf_counter_ns() - t)
+            total_ns += latencies[-1]
+        return summarize(latencies, total_ns)
+    finally:
+        sockets.close()
+
+
+def bench_remove_pynng_topic(iterations: int) -> dict:
+    msg = ("driver_input " + json.dumps(DRIVER_INPUT_PAYLOAD)).encode()
+    return measure(lambda: remove_pynng_topic(msg), iterations)
+
+
+def bench_decode_message_json(iterations: int) -> dict:
+    msg = ("driver_input " + json.dumps(DRIVER_INPUT_PAYLOAD)).encode()
+    return measure(lambda: decode_message(msg), iterations)
+
+
+def bench_decode_message_binary(iterations: int) -> dict:
+    msg = encode_message("driver_input", DRIVER_INPUT_PAYLOAD)
+    return measure(lambda: decode_message(msg), iterations)
+
+
+def _alternating(function, *value_sets):
+    # alternate between value sets, so every call really changes the values and emits
+    state = {"i": 0}
+
+    def call() -> None:
+        state["i"] ^= 1
+        function(*value_sets[state["i"]])
+
+    return call
+
+
+def bench_model_set_all(iterations: int) -> dict:
+    model = ControlPanelModel()
+    call = _alternating(model.set_all, (10.0, 20.0, 30.0, 40.0, 50.0, 60.0), (11.0, 21.0, 31.0, 41.0, 51.0, 61.0))
+    return measure(call, iterations)
+
+
+def bench_model_set_actual_all(iterations: int) -> dict:
+    model = ControlPanelModel()
+    call = _alternating(
+        model.set_actual_all, (10.0, 20.0, 30.0, 40.0, 50.0, 60.0), (11.0, 21.0, 31.0, 41.0, 51.0, 61.0)
+    )
+    return measure(call, iterations)
+
+
+def bench_timer_set_timestamp(iterations: int) -> dict:
+    timer = Timer(0, 0, 0)
+    state = {"ns": 0}
+
+    def tick() -> None:
+        state["ns"] += 1_000_000
+        timer.set_timestamp(state["ns"])
+
+    return measure(tick, iterations)
+
+
+def bench_scale_driver_input_sample(iterations: int) -> dict:
+    # the live path, one sample per call
+    return measure(lambda: scale_driver_input_sample(DRIVER_INPUT_PAYLOAD, 15, 50, 50, 100), iterations)
+
+
+def bench_scale_driver_input_x100k(iterations: int) -> dict:
+    samples = driver_input_to_array([DRIVER_INPUT_PAYLOAD] * 100_000)
+    return measure(lambda: scale_driver_input(samples, 15, 50, 50, 100, -8.0), max(1, iterations // 1000), 10)
+
+
+def bench_config_publisher_idle(iterations: int) -> dict:
+    sockets = LocalSockets("config")
+    try:
+        publisher = ConfigPublisher(ControlPanelModel(), sockets.pub, keep_alive_interval_ms=0)
+        return measure(publisher.publish, iterations)
+    finally:
+        sockets.close()
+
+
+def bench_config_json_round_trip(iterations: int) -> dict:
+    return measure(lambda: json.loads(json.dumps(CAR_CONFIG)), iterations)
+
+
+def bench_read_config_file(iterations: int) -> dict:
+    directory = tempfile.mkdtemp(prefix="raai_bench_")
+    path = os.path.join(directory, "config.json")
+    try:
+        with open(path, "w") as file:
+            json.dump(CAR_CONFIG, file, indent=4)
+        return measure(lambda: read_config(path), iterations)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def bench_config_store_update(iterations: int) -> dict:
+    directory = tempfile.mkdtemp(prefix="raai_bench_")
+    store = ConfigStore(os.path.join(directory, "config.json"), CAR_CONFIG)
+    try:
+        call = _alternating(store.update, ({"curvespeed": 1.0},), ({"curvespeed": 2.0},))
+        return measure(call, iterations)
+    finally:
+        store.close()
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+class LocalDriverDatabase:
+    """A DriverDataPublisher with a roster of generated drivers, its sockets in a temporary directory."""
+
+    def __init__(self, count: int) -> None:
+        self._dir = tempfile.mkdtemp(prefix="raai_bench_")
+        self.publisher = DriverDataPublisher(
+            "ipc://" + os.path.join(self._dir, "current_driver.ipc"), "ipc://" + os.path.join(self._dir, "rest_api.ipc")
+        )
+        self.drivers = generate_drivers(count)
+        self.publisher.set_drivers(self.drivers)
+
+    def close(self) -> None:
+        self.publisher.close()
+        shutil.rmtree(self._dir, ignore_errors=True)
+
+
+def _renamed_driver(database: LocalDriverDatabase, state: dict) -> dict:
+    state["n"] += 1
+    return dict(database.drivers[state["n"] % len(database.drivers)], name=f"Renamed {state['n']}")
+
+
+def bench_driver_merge_delta_10k(iterations: int) -> dict:
+    # a refresh with get_drivers_since, one driver changed
+    database = LocalDriverDatabase(10_000)
+    state = {"n": 0}
+    try:
+        return measure(
+            lambda: database.publisher.merge_drivers({"drivers": [_renamed_driver(database, state)]}), iterations
+        )
+    finally:
+        database.close()
+
+
+def bench_driver_merge_full_10k(iterations: int) -> dict:
+    # the same change with a full get_drivers snapshot
+    database = LocalDriverDatabase(10_000)
+    state = {"n": 0}
+
+    def refresh() -> None:
+        driver = _renamed_driver(database, state)
+        database.publisher.set_drivers([driver if d["id"] == driver["id"] else d for d in database.drivers])
+
+    try:
+        return measure(refresh, max(1, iterations // 1000), 2)
+    finally:
+        database.close()
+
+
+def bench_driver_cache_load_10k(iterations: int) -> dict:
+    # the roster at startup, before the database service answered
+    directory = tempfile.mkdtemp(prefix="raai_bench_")
+    cache = DriverCache(os.path.join(directory, "driver_cache.sqlite"))
+    cache.store("bench", 1, generate_drivers(10_000), full=True)
+    try:
+        return measure(cache.load, max(1, iterations // 1000), 2)
+    finally:
+        cache.close()
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def bench_driver_cache_store_delta(iterations: int) -> dict:
+    directory = tempfile.mkdtemp(prefix="raai_bench_")
+    cache = DriverCache(os.path.join(directory, "driver_cache.sqlite"))
+    drivers = generate_drivers(10_000)
+    cache.store("bench", 1, drivers, full=True)
+    state = {"n": 0}
+
+    def store() -> None:
+        state["n"] += 1
+        cache.store("bench", state["n"], [dict(drivers[state["n"] % len(drivers)], name=f"Renamed {state['n']}")])
+
+    try:
+        return measure(store, iterations)
+    finally:
+        cache.close()
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+BENCHMARKS = {
+    "send_data_json": bench_send_data_json,
+    "send_data_binary": bench_send_data_binary,
+    "receive_data": bench_receive_data,
+    "receive_all_data_x64": bench_receive_all_data_x64,
+    "remove_pynng_topic": bench_remove_pynng_topic,
+    "decode_message_json": bench_decode_message_json,
+    "decode_message_binary": bench_decode_message_binary,
+    "model_set_all": bench_model_set_all,
+    "model_set_actual_all": bench_model_set_actual_all,
+    "timer_set_timestamp": bench_timer_set_timestamp,
+    "scale_driver_input_sample": bench_scale_driver_input_sample,
+    "scale_driver_input_x100k": bench_scale_driver_input_x100k,
+    "config_publisher_idle": bench_config_publisher_idle,
+    "config_json_round_trip": bench_config_json_round_trip,
+    "read_config_file": bench_read_config_file,
+    "config_store_update": bench_config_store_update,
+    "driver_merge_delta_10k": bench_driver_merge_delta_10k,
+    "driver_merge_full_10k": bench_driver_merge_full_10k,
+    "driver_cache_load_10k": bench_driver_cache_load_10k,
+    "driver_cache_store_delta": bench_driver_cache_store_delta,
+}
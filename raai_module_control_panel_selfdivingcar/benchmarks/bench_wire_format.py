@@ -0,0 +1,62 @@
+# Copyright (C) 2023, NG:ITL
+"""
+Compares the json and the binary wire format of the "config" and "driver_input" topics.
+
+Run from the module directory: python -m benchmarks.bench_wire_format
+"""
+import json
+import timeit
+
+from control_panel_backend.control_panel import remove_pynng_topic
+from control_panel_backend.wire_format import encode_message, decode_message
+
+CONFIG_PAYLOAD = {
+    "max_throttle": 15.0,
+    "max_brake": 50.0,
+    "max_clutch": 50.0,
+    "max_steering": 100.0,
+    "steering_offset": -8.0,
+}
+DRIVER_INPUT_PAYLOAD = {
+    "throttle": 42.5,
+    "brake": 0.0,
+    "clutch": 12.25,
+    "steering": -3.75,
+    "tilt_x": 0.5,
+    "tilt_y": -0.25,
+    "vibration": 0.0,
+}
+
+
+def encode_json(topic: str, payload: dict) -> bytes:
+    # the path of send_data
+    return (topic + " " + json.dumps(payload)).encode()
+
+
+def decode_json(msg: bytes) -> dict:
+    # the path of receive_data before wire_format
+    return json.loads(remove_pynng_topic(msg))
+
+
+def bench(function, *args, number: int = 100_000) -> float:
+    """Returns the best time per call in ns."""
+    return min(timeit.repeat(lambda: function(*args), number=number, repeat=5)) / number * 1e9
+
+
+def main() -> None:
+    print(f"{'topic':<14}{'format':<8}{'bytes':>7}{'encode ns':>12}{'decode ns':>12}")
+    for topic, payload in (("config", CONFIG_PAYLOAD), ("driver_input", DRIVER_INPUT_PAYLOAD)):
+        json_msg = encode_json(topic, payload)
+        binary_msg = encode_message(topic, payload)
+        assert decode_json(json_msg) == decode_message(binary_msg)[1]
+
+        rows = (
+            ("json", json_msg, bench(encode_json, topic, payload), bench(decode_json, json_msg)),
+            ("binary", binary_msg, bench(encode_message, topic, payload), bench(decode_message, binary_msg)),
+        )
+        for name, msg, encode_ns, decode_ns in rows:
+            print(f"{topic:<14}{name:<8}{len(msg):>7}{encode_ns:>12.0f}{decode_ns:>12.0f}")
+
+
+if __name__ == "__main__":
+    main()
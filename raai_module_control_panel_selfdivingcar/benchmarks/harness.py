@@ -0,0 +1,92 @@
+# Copyright (C) 2023, NG:ITL
+import json
+import time
+import platform
+import subprocess
+
+PERCENTILES = (50, 90, 99, 99.9)
+
+
+def percentile(sorted_values: list, p: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(p / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def measure(function, iterations: int = 10_000, warmup: int = 1_000) -> dict:
+    """
+    Calls function iterations times and times every call.
+
+    Returns:
+    dict: The throughput in calls per second and the latency percentiles in ns.
+    """
+    for _ in range(warmup):
+        function()
+
+    latencies = [0] * iterations
+    clock = time.perf_counter_ns
+    start = clock()
+    for i in range(iterations):
+        t = clock()
+        function()
+        latencies[i] = clock() - t
+    total_ns = clock() - start
+
+    return summarize(latencies, total_ns)
+
+
+def summarize(latencies: list, total_ns: int) -> dict:
+    """Turns per-call latencies in ns and the total run time into a benchmark result."""
+    iterations = len(latencies)
+    latencies = sorted(latencies)
+    result = {
+        "iterations": iterations,
+        "throughput_per_s": iterations / (total_ns / 1e9),
+        "mean_ns": sum(latencies) / iterations,
+        "max_ns": latencies[-1],
+    }
+    for p in PERCENTILES:
+        result[f"p{p:g}_ns"] = percentile(latencies, p)
+    return result
+
+
+def environment() -> dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = ""
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "node": platform.node(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+
+
+def save_results(path: str, results: dict) -> None:
+    with open(path, "w") as file:
+        json.dump({"environment": environment(), "results": results}, file, indent=2)
+
+
+def load_results(path: str) -> dict:
+    with open(path, "r") as file:
+        return json.load(file)["results"]
+
+
+def print_results(results: dict, baseline: dict | None = None) -> None:
+    header = f"{'benchmark':<32}{'ops/s':>12}{'p50 ns':>10}{'p99 ns':>10}{'p99.9 ns':>10}"
+    if baseline is not None:
+        header += f"{'p50 vs base':>13}"
+    print(header)
+
+    for name, result in results.items():
+        line = (
+            f"{name:<32}{result['throughput_per_s']:>12.0f}{result['p50_ns']:>10.0f}"
+            f"{result['p99_ns']:>10.0f}{result['p99.9_ns']:>10.0f}"
+        )
+        if baseline is not None and name in baseline and baseline[name]["p50_ns"]:
+            change = result["p50_ns"] / baseline[name]["p50_ns"] - 1
+            line += f"{change:>+12.1%}"
+        print(line)
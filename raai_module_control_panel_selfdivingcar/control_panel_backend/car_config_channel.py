@@ -0,0 +1,127 @@
+# Copyright (C) 2023, NG:ITL
+import json
+import time
+import uuid
+import pynng
+
+from PySide6.QtCore import QObject, QSocketNotifier, QTimer, Signal
+
+from control_panel_backend.car_config_receiver import CAR_CONFIG_TOPIC, CAR_CONFIG_KEYS
+
+
+class CarConfigChannel(QObject):
+    """
+    Streams changes of the car config to the car over pynng.
+
+    Every change is published as a delta with a sequence number on the pub address:
+    "car_config {"epoch": "9f1c...", "seq": 3, "delta": {"motor": true}}". The sequence numbers
+    count from the start of the channel, the epoch is a new id per start, so the car can tell the
+    deltas of a restarted panel from old ones. The car acknowledges applied deltas on the ack
+    address (Req/Rep), the request {"epoch": "9f1c...", "ack": seq} acknowledges every delta of the
+    epoch up to seq, the request {"snapshot": true} asks for the full state, e.g. after the car
+    noticed a gap in the sequence or another epoch. Both are answered with the epoch and the current
+    sequence number, the snapshot request also with the state.
+
+    Deltas that are not acknowledged within ack_timeout_ms are reported through ack_timed_out,
+    so the caller can fall back to pushing a full snapshot another way.
+    """
+
+    acked = Signal(int)
+    ack_timed_out = Signal(int)
+
+    def __init__(self, pub_address: str, ack_address: str, state: dict, ack_timeout_ms: int = 500) -> None:
+        QObject.__init__(self)
+        self._state = {key: state[key] for key in CAR_CONFIG_KEYS if key in state}
+        self.epoch = uuid.uuid4().hex
+        self._seq = 0
+        self._acked_seq = 0
+        self._unacked: dict[int, float] = {}
+        self.ack_timeout_ms = ack_timeout_ms
+
+        self._pub = pynng.Pub0()
+        self._pub.listen(pub_address)
+
+        self._rep = pynng.Rep0()
+        self._rep.listen(ack_address)
+        self._notifier = QSocketNotifier(self._rep.recv_fd, QSocketNotifier.Type.Read)
+        self._notifier.activated.connect(self.handle_requests)  # type: ignore
+
+        self._ack_timer = QTimer(self)
+        self._ack_timer.setSingleShot(True)
+        self._ack_timer.timeout.connect(self.check_acks)  # type: ignore
+
+    def get_state(self) -> dict:
+        return dict(self._state)
+
+    def get_seq(self) -> int:
+        return self._seq
+
+    def get_acked_seq(self) -> int:
+        return self._acked_seq
+
+    def send_delta(self, delta: dict) -> int:
+        """
+        Applies delta to the local state and publishes it to the car.
+
+        Args:
+        delta (dict): The changed keys and their new values.
+
+        Returns:
+        int: The sequence number of the delta.
+        """
+        self._state.update(delta)
+        self._seq += 1
+        msg = CAR_CONFIG_TOPIC + " " + json.dumps({"epoch": self.epoch, "seq": self._seq, "delta": delta})
+        self._pub.send(msg.encode())
+
+        self._unacked[self._seq] = time.monotonic()
+        if not self._ack_timer.isActive():
+            self._ack_timer.start(self.ack_timeout_ms)
+        return self._seq
+
+    def handle_requests(self) -> None:
+        while True:
+            try:
+                request = json.loads(self._rep.recv(block=False))
+            except pynng.TryAgain:
+                return
+            except json.JSONDecodeError:
+                request = {}
+
+            reply: dict = {"epoch": self.epoch, "seq": self._seq}
+            if request.get("snapshot"):
+                reply["state"] = self._state
+            # an ack for the sequence of an earlier run of the panel says nothing about this one
+            if "ack" in request and request.get("epoch") == self.epoch:
+                self.handle_ack(int(request["ack"]))
+            self._rep.send(json.dumps(reply).encode())
+
+    def handle_ack(self, seq: int) -> None:
+        if seq <= self._acked_seq:
+            return
+
+        self._acked_seq = seq
+        for pending_seq in [s for s in self._unacked if s <= seq]:
+            del self._unacked[pending_seq]
+        if not self._unacked:
+            self._ack_timer.stop()
+        self.acked.emit(seq)
+
+    def check_acks(self) -> None:
+        if not self._unacked:
+            return
+
+        deadline = time.monotonic() - self.ack_timeout_ms / 1000
+        expired = [seq for seq, sent in self._unacked.items() if sent <= deadline]
+        if expired:
+            # one fallback covers all of them, the snapshot contains every change so far
+            self._unacked.clear()
+            self.ack_timed_out.emit(max(expired))
+        else:
+            oldest = min(self._unacked.values())
+            self._ack_timer.start(max(1, int((oldest - deadline) * 1000)))
+
+    def close(self) -> None:
+        self._notifier.setEnabled(False)
+        self._pub.close()
+        self._rep.close()
@@ -0,0 +1,161 @@
+# Copyright (C) 2023, NG:ITL
+"""
+Reference receiver for the car config channel of the control panel, meant to run on the car.
+
+It only depends on pynng, so it can be copied to the Raspberry Pi as a single file:
+
+    python car_config_receiver.py --pub tcp://<panel ip>:22500 --ack tcp://<panel ip>:22501 --output data.json
+
+Every applied change is written to the output file (atomically), so software on the car that
+reads data.json keeps working, it just gets the values within milliseconds.
+"""
+import os
+import json
+import argparse
+import threading
+import pynng
+
+CAR_CONFIG_TOPIC = "car_config"
+CAR_CONFIG_KEYS = ("start", "stream", "motor", "process", "debug", "curvespeed", "straightlinespeed")
+
+
+def write_json_atomically(path: str, data: dict) -> None:
+    """Writes data to a temporary file next to path and renames it over path."""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as file:
+        json.dump(data, file)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(tmp_path, path)
+
+
+class CarConfigReceiver:
+    """
+    Applies the config deltas published by the control panel in sequence order.
+
+    On start, whenever a sequence number is missing and when a delta of another epoch arrives, which
+    means the panel was restarted and counts from 1 again, the full state is requested from the panel.
+    Applied deltas are acknowledged, on_change is called with the changed keys.
+    """
+
+    def __init__(self, pub_address: str, ack_address: str, on_change=None, timeout_ms: int = 500) -> None:
+        self.state: dict = {}
+        self.epoch = ""
+        self.seq = 0
+        self.synced = False
+        self.resyncs = 0
+        self._on_change = on_change
+        self._running = False
+
+        self._sub = pynng.Sub0(recv_timeout=timeout_ms)
+        self._sub.subscribe(CAR_CONFIG_TOPIC + " ")
+        self._sub.dial(pub_address, block=False)
+
+        self._req = pynng.Req0(recv_timeout=timeout_ms, send_timeout=timeout_ms)
+        self._req.dial(ack_address, block=False)
+
+    def _request(self, request: dict) -> dict | None:
+        try:
+            self._req.send(json.dumps(request).encode())
+            return json.loads(self._req.recv())
+        except pynng.Timeout:
+            return None
+
+    def _apply(self, delta: dict) -> None:
+        self.state.update(delta)
+        if self._on_change is not None:
+            self._on_change(delta)
+
+    def resync(self) -> bool:
+        """
+        Replaces the local state with a snapshot from the panel.
+
+        Returns:
+        bool: False if the panel didn't answer, run retries it until it does.
+        """
+        reply = self._request({"snapshot": True})
+        if reply is None:
+            self.synced = False
+            return False
+
+        self.epoch = reply["epoch"]
+        self.seq = reply["seq"]
+        self.synced = True
+        self.resyncs += 1
+        self._apply(reply["state"])
+        return True
+
+    def handle_message(self, msg: bytes) -> None:
+        message = json.loads(msg[len(CAR_CONFIG_TOPIC) + 1 :])
+        seq = message["seq"]
+        if message["epoch"] == self.epoch:
+            if seq <= self.seq:
+                # already contained in the last snapshot
+                return
+            if seq == self.seq + 1:
+                self.seq = seq
+                self._apply(message["delta"])
+            elif not self.resync():
+                return
+        elif not self.resync():
+            return
+
+        self.acknowledge()
+
+    def acknowledge(self) -> None:
+        self._request({"epoch": self.epoch, "ack": self.seq})
+
+    def run(self) -> None:
+        self._running = True
+        while self._running:
+            if not self.synced:
+                if self.resync():
+                    self.acknowledge()
+                continue
+
+            try:
+                msg = self._sub.recv()
+            except pynng.Timeout:
+                continue
+            self.handle_message(msg)
+
+    def stop(self) -> None:
+        self._running = False
+
+    def close(self) -> None:
+        self._sub.close()
+        self._req.close()
+
+
+class LocalCarStandIn:
+    """Runs a CarConfigReceiver on a background thread in place of the car, used for tests."""
+
+    def __init__(self, pub_address: str, ack_address: str) -> None:
+        self.changes: list[dict] = []
+        self.receiver = CarConfigReceiver(pub_address, ack_address, on_change=self.changes.append, timeout_ms=100)
+        self._thread = threading.Thread(target=self.receiver.run, name="car_stand_in", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self.receiver.stop()
+        self._thread.join()
+        self.receiver.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Receives the live car config from the control panel")
+    parser.add_argument("--pub", required=True, help="address of the panel's config publisher")
+    parser.add_argument("--ack", required=True, help="address of the panel's ack endpoint")
+    parser.add_argument("--output", default="data.json", help="json file that mirrors the received config")
+    args = parser.parse_args()
+
+    def write_output(delta: dict) -> None:
+        write_json_atomically(args.output, receiver.state)
+
+    receiver = CarConfigReceiver(args.pub, args.ack, on_change=write_output)
+    try:
+        receiver.run()
+    except KeyboardInterrupt:
+        receiver.close()
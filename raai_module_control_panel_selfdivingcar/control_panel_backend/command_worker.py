@@ -0,0 +1,57 @@
+# Copyright (C) 2023, NG:ITL
+import queue
+import threading
+
+from PySide6.QtCore import QObject, Signal
+
+
+class CommandWorker(QObject):
+    """
+    Runs blocking commands (SSH, SFTP, ...) one after another on a background thread.
+
+    Commands are executed in the order they were submitted. The outcome is reported through
+    command_finished / command_failed, connect them to slots of a QObject living in the GUI thread
+    so they are delivered there as queued calls.
+    """
+
+    command_finished = Signal(str, object)
+    command_failed = Signal(str, str)
+
+    def __init__(self, name: str = "command_worker") -> None:
+        QObject.__init__(self)
+        self._queue: queue.Queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def submit(self, name: str, function, *args) -> None:
+        """
+        Queues a command, this never blocks.
+
+        Args:
+        name (str): The name the command is reported under.
+        function (callable): The blocking function to execute on the worker thread.
+        args: The arguments passed to the function.
+        """
+        self._queue.put((name, function, args))
+
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    def stop(self, timeout: float | None = None) -> None:
+        """Lets the worker finish the queued commands and waits up to timeout seconds for it."""
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+    def _run(self) -> None:
+        while True:
+            command = self._queue.get()
+            if command is None:
+                break
+
+            name, function, args = command
+            try:
+                result = function(*args)
+            except Exception as e:
+                self.command_failed.emit(name, str(e))
+            else:
+                self.command_finished.emit(name, result)
@@ -0,0 +1,100 @@
+# Copyright (C) 2023, NG:ITL
+import os
+import json
+import time
+import threading
+
+
+class ConfigStore:
+    """
+    Holds a json config in memory and persists it to disk in the background.
+
+    Reads and writes only touch the in-memory state. Changes are written by a background thread,
+    all changes made within batch_interval_s end up in a single write. The file is written to a
+    temporary file first and renamed over the old one, so it is never left half-written.
+    """
+
+    def __init__(self, path: str, defaults: dict | None = None, batch_interval_s: float = 0.2) -> None:
+        self.path = path
+        self.batch_interval_s = batch_interval_s
+
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._data = dict(defaults or {})
+        self._data.update(self._load(path))
+        self._version = 0
+        self._written_version = 0
+
+        self._changed = threading.Event()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="config_store", daemon=True)
+        self._thread.start()
+
+    @staticmethod
+    def _load(path: str) -> dict:
+        try:
+            with open(path, "r") as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return {}
+        except json.JSONDecodeError:
+            print(f"Config file {path} is damaged, using default values")
+            return {}
+
+    def get(self, key: str, default=None):
+        return self._data.get(key, default)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return dict(self._data)
+
+    def set(self, key: str, value) -> None:
+        self.update({key: value})
+
+    def update(self, values: dict) -> None:
+        with self._lock:
+            changed = any(key not in self._data or self._data[key] != value for key, value in values.items())
+            if not changed:
+                return
+            self._data.update(values)
+            self._version += 1
+        self._changed.set()
+
+    def flush(self) -> None:
+        """Writes pending changes right away, blocks until they are on disk."""
+        with self._write_lock:
+            with self._lock:
+                if self._version == self._written_version:
+                    return
+                data = dict(self._data)
+                version = self._version
+
+            self._write(data)
+            self._written_version = version
+
+    def close(self) -> None:
+        self._closed = True
+        self._changed.set()
+        self._thread.join()
+        self.flush()
+
+    def _write(self, data: dict) -> None:
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as file:
+            json.dump(data, file, indent=2)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp_path, self.path)
+
+    def _run(self) -> None:
+        # closed is checked after clearing the event, a close() during the batch sleep must not be lost
+        while not self._closed:
+            self._changed.wait()
+
+            # gather the changes of a slider drag or a series of clicks into one write
+            time.sleep(self.batch_interval_s)
+            self._changed.clear()
+            try:
+                self.flush()
+            except OSError as e:
+                print(f"Writing config file {self.path} failed: {e}")
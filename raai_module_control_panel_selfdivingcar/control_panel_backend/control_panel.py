@@ -3,31 +3,90 @@ import os
 import sys
 import json
 import pynng
-import time
-import paramiko
 import subprocess
 
 from pathlib import Path
+from typing import TYPE_CHECKING, Optional
 
-from PySide6.QtGui import QGuiApplication
-from PySide6.QtQml import QQmlApplicationEngine
+from PySide6.QtCore import QObject
+from PySide6.QtCore import QCoreApplication
 from PySide6.QtCore import QTimer
 from PySide6.QtCore import QSocketNotifier
 
 from control_panel_backend import control_panel_model
+from control_panel_backend import latency_tracer
+from control_panel_backend import telemetry_recorder
 from control_panel_backend.control_panel_model import ControlPanelModel
 from control_panel_backend.timer_model import Timer
+from control_panel_backend.lap_timer import LapTimer, TimerStates
+from control_panel_backend.lap_history import LapListModel, LAP_HISTORY_CAPACITY, LAP_AVERAGE_WINDOW
 from control_panel_backend.database_interface_model import DriverDataPublisher
-from enum import IntEnum
+from control_panel_backend.request_client import REQUEST_TIMEOUT_MS, REQUEST_RETRIES
+from control_panel_backend.driver_cache import DRIVER_CACHE_PATH
+from control_panel_backend.ssh_session import SSH_SESSIONS
+from control_panel_backend.command_worker import CommandWorker
+from control_panel_backend.update_coalescer import UpdateCoalescer
+from control_panel_backend.car_config_channel import CarConfigChannel
+from control_panel_backend.config_store import ConfigStore
+from control_panel_backend.wire_format import encode_message, decode_message, binary_topic, WireFormatError
+from control_panel_backend.driver_input_scaling import scale_driver_input_sample
+from control_panel_backend.latency_tracer import LatencyIntrospection, LATENCY_TRACER_PYNNG_ADDRESS
+from control_panel_backend.telemetry_recorder import TelemetryRecorder, TELEMETRY_DIRECTORY, TELEMETRY_SEGMENT_RECORDS
+
+if TYPE_CHECKING:
+    # imported by attach_ui only, headless runs don't load QML
+    from PySide6.QtQml import QQmlApplicationEngine
 
 
 
 CONTROL_PANEL_PYNNG_ADDRESS = "ipc:///tmp/RAAI/control_panel.ipc"
 CONTROL_COMPONENT_PYNNG_ADDRESS = "ipc:///tmp/RAAI/vehicle_output_writer.ipc"
 PLATFORM_CONTROLLER_PYNNG_ADDRESS = "ipc:///tmp/RAAI/driver_input_reader.ipc"
+# the car dials these, so they have to be reachable over the network
+CAR_CONFIG_PYNNG_ADDRESS = "tcp://0.0.0.0:22500"
+CAR_CONFIG_ACK_PYNNG_ADDRESS = "tcp://0.0.0.0:22501"
+CAR_CONFIG_ACK_TIMEOUT_MS = 500
+
+CONFIG_KEEP_ALIVE_INTERVAL_MS = 500
+SPEED_UPDATE_INTERVAL_MS = 500
+# also publishes "config" in the binary layout as "bin.config", for subscribers that know wire_format
+CONFIG_PUBLISH_BINARY = True
+
+# SSH connection information for the Raspberry Pi
+CAR_SSH_HOST = "192.168.30.123"
+CAR_SSH_PORT = 22
+CAR_SSH_USERNAME = "itlab"
+CAR_SSH_PASSWORD = "1234"
+CAR_CONFIG_REMOTE_PATH = "/home/itlab/cam/inside-out-server/data.json"
+CAR_CONFIG_LOCAL_PATH = "control_panel_backend/config_selfdriving_car.json"
+CAR_CONFIG_DEFAULTS = {
+    "start": False,
+    "stream": False,
+    "motor": False,
+    "process": False,
+    "debug": False,
+    "curvespeed": 0.0,
+    "straightlinespeed": 0.0,
+}
+CAR_START_SCRIPT_PATH = "/home/itlab/start.sh"
+CAR_TMUX_SESSION_NAME = "my_session"
+
+
+def encode_data(payload: dict, topic: str = " ", binary: bool = False) -> bytes:
+    """
+    encodes data into a pynng message the way send_data sends it
+
+    :param payload: data that should be sent in form of a dictionary
+    :param topic: the topic under which the data should be published  (e.g. "lap_time:")
+    :param binary: if true, the compact binary layout of the topic is used under "bin.<topic>" instead of json,
+        only available for the topics in wire_format.BINARY_CODECS
+    """
+    if binary:
+        return encode_message(topic, payload)
+    return (topic + " " + json.dumps(payload)).encode()
 
 
-def send_data(pub: pynng.Pub0, payload: dict, topic: str = " ", p_print: bool = True) -> None:
+def send_data(pub: pynng.Pub0, payload: dict, topic: str = " ", p_print: bool = True, binary: bool = False) -> None:
     """
     publishes data via pynng
 
@@ -35,13 +94,15 @@ def send_data(pub: pynng.Pub0, payload: dict, topic: str = " ", p_print: bool =
     :param payload: data that should be sent in form of a dictionary
     :param topic: the topic under which the data should be published  (e.g. "lap_time:")
     :param p_print: if true, the message that is sent will be printed out. Standard is set to true
+    :param binary: if true, the compact binary layout of the topic is sent under "bin.<topic>" instead of json,
+        only available for the topics in wire_format.BINARY_CODECS
     """
-    json_data = json.dumps(payload)
-    topic = topic + " "
-    msg = topic + json_data
+    msg = encode_data(payload, topic, binary)
     if p_print is True:
-        print(f"data send: {msg}")
-    pub.send(msg.encode())
+        print(f"data send: {topic} {payload if binary else json.dumps(payload)}")
+    pub.send(msg)
+    if telemetry_recorder.RECORDER is not None:
+        telemetry_recorder.RECORDER.record_sent(topic, payload)
 
 
 def receive_data(sub: pynng.Sub0):
@@ -50,13 +111,32 @@ def receive_data(sub: pynng.Sub0):
 
     :param sub: subscriber
     :param timer: timeout timer for max waiting time for new signal
+    :raises WireFormatError: if the message can't be decoded
     """
     msg = sub.recv()
-    data = remove_pynng_topic(msg)
-    data = json.loads(data)
+    _, data = decode_message(msg)
     return data
 
 
+def receive_all_data(sub: pynng.Sub0) -> list:
+    """
+    receives every message that is already queued in the subscriber without blocking and returns their contents,
+    oldest first, messages that can't be decoded are skipped
+
+    :param sub: subscriber
+    """
+    payloads: list = []
+    while True:
+        try:
+            msg = sub.recv(block=False)
+        except pynng.TryAgain:
+            return payloads
+        try:
+            payloads.append(decode_message(msg)[1])
+        except WireFormatError as e:
+            print(f"Skipped a message: {e}")
+
+
 def remove_pynng_topic(data, sign: str = " ") -> str:
     """
     removes the topic from data that got received via pynng and returns a variable that stores the content
@@ -99,6 +179,16 @@ def create_config(config_file_path: str) -> dict:
         "steering_offset": -8.0,
         "straightlinespeed": 0,
         "curvespeed": 0,
+        "config_keep_alive_interval_ms": CONFIG_KEEP_ALIVE_INTERVAL_MS,
+        "speed_update_interval_ms": SPEED_UPDATE_INTERVAL_MS,
+        "config_publish_binary": CONFIG_PUBLISH_BINARY,
+        "latency_tracing": False,
+        "telemetry_recording": False,
+        "telemetry_directory": TELEMETRY_DIRECTORY,
+        "timer_refresh_hz": 0,
+        "lap_history_capacity": 1000,
+        "lap_average_window": 5,
+        "driver_cache_path": DRIVER_CACHE_PATH,
     }
 
     file = json.dumps(template, indent=4)
@@ -114,78 +204,160 @@ def resource_path() -> Path:
 
 
 
-class TimerStates(IntEnum):
-    RESET = 0
-    RUNNING = 1
-    PAUSED = 2
-    STOPPED = 3
+class ConfigPublisher(QObject):
+    """
+    Publishes the "config" topic whenever one of the values it is built from changes.
+
+    The payload is the same one the former 1 ms polling loop sent. While nothing changes,
+    the last payload is repeated every keep_alive_interval_ms so late subscribers still get it.
+    With publish_binary every config is sent twice, as json under "config" and in the binary layout
+    under "bin.config", a subscriber picks its format by the topic it subscribes to.
+    """
+
+    def __init__(
+        self,
+        model: ControlPanelModel,
+        pub: pynng.Pub0,
+        keep_alive_interval_ms: int = CONFIG_KEEP_ALIVE_INTERVAL_MS,
+        publish_binary: bool = CONFIG_PUBLISH_BINARY,
+    ) -> None:
+        QObject.__init__(self)
+        self._model = model
+        self._pub = pub
+        self._publish_binary = publish_binary
+        self._enabled = True
+
+        # the encoded messages are only rebuilt when the model's config version moved
+        self._cached_version = -1
+        self._cached_msgs: tuple = ()
+
+        model.max_throttle_changed.connect(self.publish)
+        model.max_brake_changed.connect(self.publish)
+        model.max_clutch_changed.connect(self.publish)
+        model.max_steering_changed.connect(self.publish)
+        model.steering_offset_changed.connect(self.publish)
+        model.pedal_status_changed.connect(self.publish)
+
+        self._keep_alive_timer = QTimer(self)
+        self._keep_alive_timer.setInterval(keep_alive_interval_ms)
+        self._keep_alive_timer.timeout.connect(self.publish)  # type: ignore
+
+    def build_payload(self) -> dict:
+        if self._model.get_pedal_status():
+            return {
+                "max_throttle": self._model.get_max_throttle(),
+                "max_brake": self._model.get_max_brake(),
+                "max_clutch": self._model.get_max_clutch(),
+                "max_steering": self._model.get_max_steering(),
+                "steering_offset": self._model.get_steering_offset(),
+            }
+
+        return {
+            "throttle": 0,
+            "brake": 0,
+            "clutch": 0,
+            "steering": self._model.get_max_steering(),
+            "steering_offset": self._model.get_steering_offset(),
+        }
+
+    def get_messages(self) -> tuple:
+        """Returns the encoded config, the json message first and the binary one if it is published."""
+        version = self._model.get_config_version()
+        if version != self._cached_version:
+            payload = self.build_payload()
+            json_msg = encode_data(payload, "config")
+            self._cached_msgs = (
+                (json_msg, encode_data(payload, "config", True)) if self._publish_binary else (json_msg,)
+            )
+            self._cached_version = version
+            # keep-alive repeats are not recorded, only the configs that changed
+            if telemetry_recorder.RECORDER is not None:
+                telemetry_recorder.RECORDER.record_sent("config", payload)
+        return self._cached_msgs
+
+    def set_enabled(self, enabled: bool) -> None:
+        """Stops or resumes publishing, resuming publishes the current config right away."""
+        self._enabled = enabled
+        if enabled:
+            self.publish()
+        else:
+            self._keep_alive_timer.stop()
+
+    def publish(self) -> None:
+        if not self._enabled:
+            return
+        for msg in self.get_messages():
+            self._pub.send(msg)
+
+        # a change restarts the keep-alive period, so it only fires while the values are idle
+        if self._keep_alive_timer.interval() > 0:
+            self._keep_alive_timer.start()
 
 
 class ControlPanel:
-    
-    def __init__(self, config_file_path="./control_panel_config.json") -> None:
+    """
+    The control panel backend and, unless headless, its QML UI.
+
+    Args:
+    config_file_path (str): Path of control_panel_config.json.
+    headless (bool): Runs the model and the messaging on a QCoreApplication without loading
+        QtGui or QML, e.g. on machines without a display.
+    """
+
+    def __init__(self, config_file_path="./control_panel_config.json", headless: bool = False) -> None:
         self.config = read_config(config_file_path)
+        self.headless = headless
 
-        self.start_timestamp_ns = time.time_ns()
-        self.diff = 0
         self.t_model = Timer(0, 0, 0)
-        self.timer = QTimer()
-        self.timer.timeout.connect(self.timer_callback)  # type: ignore
 
+        database_request = self.config["pynng"]["requesters"]["database_request"]
         self.database_model = DriverDataPublisher(
             self.config["pynng"]["publishers"]["name_publisher"]["address"],
-            self.config["pynng"]["requesters"]["database_request"]["address"],
+            database_request["address"],
+            database_request.get("timeout_ms", REQUEST_TIMEOUT_MS),
+            database_request.get("retries", REQUEST_RETRIES),
+            self.config.get("driver_cache_path", DRIVER_CACHE_PATH),
         )
 
-        self.timer_state = 0
+        if headless:
+            self.app = QCoreApplication(sys.argv)
+        else:
+            # only imported with a UI, headless runs don't pay for QtGui and QML
+            from PySide6.QtGui import QGuiApplication
 
-        self.app = QGuiApplication(sys.argv)
-        self.engine = QQmlApplicationEngine()
+            self.app = QGuiApplication(sys.argv)
+        self.engine: Optional["QQmlApplicationEngine"] = None
         self.control_panel_model = ControlPanelModel()
-        
-        # and load the QML panel
-        self.engine.load(resource_path() / "frontend/qml/main.qml")
 
-        self.engine.rootContext().setContextProperty("t_model", self.t_model)
-        self.engine.rootContext().setContextProperty("database_model", self.database_model)
-        self.engine.rootContext().setContextProperty("sendValueAndUpdate", ControlPanel.sendValueAndUpdate)
-        self.engine.rootContext().setContextProperty("control_panel_model", self.control_panel_model)
+        # needs the application to look up the screen's refresh rate
+        self.lap_timer = LapTimer(self.t_model, self.config.get("timer_refresh_hz", 0))
 
+        # laps of the selected driver, a stopped run of the timer is a lap
+        self.lap_model = LapListModel(
+            self.config.get("lap_history_capacity", LAP_HISTORY_CAPACITY),
+            self.config.get("lap_average_window", LAP_AVERAGE_WINDOW),
+        )
+        self.lap_timer.lap_completed.connect(self.lap_model.add_lap)
+        self.database_model.currentDriverChanged.connect(self.lap_model.set_driver)
+        # the cached drivers are shown once the event loop runs, then synced with the database service
+        self.database_model.load_cache()
+
+        # authoritative state of the car config, config_selfdriving_car.json is written behind it
+        self.car_config = ConfigStore(CAR_CONFIG_LOCAL_PATH, CAR_CONFIG_DEFAULTS)
+
+        # SSH/SFTP work on the car is blocking, it runs on this worker instead of the GUI thread
+        self.remote_worker = CommandWorker("car_commands")
+        self.remote_worker.command_finished.connect(self.control_panel_model.remote_command_finished)
+        self.remote_worker.command_failed.connect(self.control_panel_model.remote_command_failed)
+
+        # a slider drag emits an update per pixel, only the latest speeds are written and uploaded
+        self.speed_update_coalescer = UpdateCoalescer(
+            self.config.get("speed_update_interval_ms", SPEED_UPDATE_INTERVAL_MS)
+        )
+        self.speed_update_coalescer.flushed.connect(self.flush_speed_updates)
 
-        # connect to the signals from the QML file
-        self.engine.rootObjects()[0].sliderMaxThrottleChanged.connect(self.control_panel_model.set_max_throttle)  # type: ignore
-        self.engine.rootObjects()[0].sliderMaxBrakeChanged.connect(self.control_panel_model.set_max_brake)  # type: ignore
-        self.engine.rootObjects()[0].sliderMaxClutchChanged.connect(self.control_panel_model.set_max_clutch)  # type: ignore
-        self.engine.rootObjects()[0].sliderMaxSteeringChanged.connect(self.control_panel_model.set_max_steering)  # type: ignore
-        self.engine.rootObjects()[0].sliderAllMaxSpeedChanged.connect(self.control_panel_model.set_all_speed_max)  # type: ignore
-        self.engine.rootObjects()[0].sliderCurveSpeedChanged.connect(lambda: self.handle_speed_update("curvespeed"))  # type: ignore
-        self.engine.rootObjects()[0].sliderStraightLineSpeedChanged.connect(lambda: self.handle_speed_update("straightlinespeed"))  # type: ignore
-
-
-        self.engine.rootObjects()[0].sliderSteeringOffsetChanged.connect(self.control_panel_model.set_steering_offset)  # type: ignore
-
-        self.engine.rootObjects()[0].buttonResetHeadTracking.connect(self.handle_head_tracker_reset_request)  # type: ignore
-
-        self.engine.rootObjects()[0].buttonButtonStatusChanged.connect(self.control_panel_model.change_button_status)  # type: ignore
-        self.engine.rootObjects()[0].buttonPlatformStatusChanged.connect(self.change_platform_status)  # type: ignore
-        self.engine.rootObjects()[0].buttonPedalStatusChanged.connect(self.control_panel_model.change_pedal_status)  # type: ignore
-        self.engine.rootObjects()[0].buttonHeadTrackingChanged.connect(self.control_panel_model.change_head_tracking_status) #type: ignore
-        self.engine.rootObjects()[0].buttonStartStatusChanged.connect(self.change_start_status)  # type: ignore
-        self.engine.rootObjects()[0].buttonStreamStatusChanged.connect(self.change_stream_status)  # type: ignore
-        self.engine.rootObjects()[0].buttonMotorStatusChanged.connect(self.change_motor_status)  # type: ignore
-        self.engine.rootObjects()[0].buttonDebugStatusChanged.connect(self.change_debug_status)  # type: ignore
-        self.engine.rootObjects()[0].buttonProcessStatusChanged.connect(self.change_process_status)  # type: ignore
-
-        self.engine.rootObjects()[0].timerStart.connect(self.timer_start)  # type: ignore
-        self.engine.rootObjects()[0].timerPause.connect(self.timer_pause)  # type: ignore
-        self.engine.rootObjects()[0].timerStop.connect(self.timer_stop)  # type: ignore
-        self.engine.rootObjects()[0].timerReset.connect(self.timer_reset)  # type: ignore
-        self.engine.rootObjects()[0].timerResetFull.connect(self.timer_reset_full)  # type: ignore
-        self.engine.rootObjects()[0].timerIgnore.connect(self.timer_ignore)  # type: ignore
-
-        self.driver_input_timer = QTimer()
-        self.driver_input_timer.timeout.connect(self.send_driver_throttle_data)  # type: ignore
-        self.driver_input_timer.start(1)
+        if not headless:
+            self.attach_ui()
 
         self.control_panel_model.set_steering_offset(self.config["steering_offset"])
 
@@ -210,6 +382,23 @@ class ControlPanel:
 
         self.sent_center_request = False
 
+        # a burst of driver input is drained at once, only the newest sample is shown,
+        # listeners (e.g. a recorder) get every sample
+        self.driver_input_listeners: list = []
+        self.driver_input_received = 0
+        self.driver_input_coalesced = 0
+
+        # opt-in, without it the instrumented paths only check latency_tracer.TRACER
+        self.latency_introspection = None
+        if self.config.get("latency_tracing", False):
+            self.latency_introspection = LatencyIntrospection(
+                latency_tracer.enable_tracing(), LATENCY_TRACER_PYNNG_ADDRESS
+            )
+
+        self.telemetry_recorder: Optional[TelemetryRecorder] = None
+        if self.config.get("telemetry_recording", False):
+            self.start_telemetry_recording(self.config.get("telemetry_directory", TELEMETRY_DIRECTORY))
+
         self.max_throttle = self.control_panel_model.get_max_throttle()
         self.max_brake = self.control_panel_model.get_max_brake()
         self.max_clutch = self.control_panel_model.get_max_clutch()
@@ -223,82 +412,200 @@ class ControlPanel:
         self.__pynng_data_publisher = pynng.Pub0()
         self.__pynng_data_publisher.listen(CONTROL_PANEL_PYNNG_ADDRESS)
 
+        self.config_publisher = ConfigPublisher(
+            self.control_panel_model,
+            self.__pynng_data_publisher,
+            self.config.get("config_keep_alive_interval_ms", CONFIG_KEEP_ALIVE_INTERVAL_MS),
+            self.config.get("config_publish_binary", CONFIG_PUBLISH_BINARY),
+        )
+        self.config_publisher.publish()
+
+        car_config_settings = self.config["pynng"]["publishers"].get("car_config", {})
+        self.car_config_channel = CarConfigChannel(
+            car_config_settings.get("address", CAR_CONFIG_PYNNG_ADDRESS),
+            car_config_settings.get("ack_address", CAR_CONFIG_ACK_PYNNG_ADDRESS),
+            self.car_config.snapshot(),
+            car_config_settings.get("ack_timeout_ms", CAR_CONFIG_ACK_TIMEOUT_MS),
+        )
+        self.car_config_channel.ack_timed_out.connect(self.handle_car_config_ack_timeout)
+
         self.__driver_input_receiver = pynng.Sub0()
         self.__driver_input_receiver.subscribe("driver_input")
+        self.__driver_input_receiver.subscribe(binary_topic("driver_input"))
         self.__driver_input_receiver.dial(PLATFORM_CONTROLLER_PYNNG_ADDRESS, block=False)
         self._notifier = QSocketNotifier(self.__driver_input_receiver.recv_fd, QSocketNotifier.Read)
         self._notifier.activated.connect(self.handle_driver_input)  # type: ignore
 
-    def timer_callback(self) -> None:
-        current_timestamp_ns = time.time_ns()
-        self.diff = current_timestamp_ns - self.start_timestamp_ns
-        self.t_model.set_timestamp(self.diff)
+    def ui_signal_handlers(self) -> dict:
+        """Returns the handlers of the signals of main.qml's root object, by signal name."""
+        return {
+            "sliderMaxThrottleChanged": self.control_panel_model.set_max_throttle,
+            "sliderMaxBrakeChanged": self.control_panel_model.set_max_brake,
+            "sliderMaxClutchChanged": self.control_panel_model.set_max_clutch,
+            "sliderMaxSteeringChanged": self.control_panel_model.set_max_steering,
+            "sliderAllMaxSpeedChanged": self.control_panel_model.set_all_speed_max,
+            "sliderCurveSpeedChanged": lambda *_: self.handle_speed_update("curvespeed"),
+            "sliderStraightLineSpeedChanged": lambda *_: self.handle_speed_update("straightlinespeed"),
+            "sliderSteeringOffsetChanged": self.control_panel_model.set_steering_offset,
+            "buttonResetHeadTracking": self.handle_head_tracker_reset_request,
+            "buttonButtonStatusChanged": self.control_panel_model.change_button_status,
+            "buttonPlatformStatusChanged": self.change_platform_status,
+            "buttonPedalStatusChanged": self.control_panel_model.change_pedal_status,
+            "buttonHeadTrackingChanged": self.control_panel_model.change_head_tracking_status,
+            "buttonStartStatusChanged": self.change_start_status,
+            "buttonStreamStatusChanged": self.change_stream_status,
+            "buttonMotorStatusChanged": self.change_motor_status,
+            "buttonDebugStatusChanged": self.change_debug_status,
+            "buttonProcessStatusChanged": self.change_process_status,
+            "timerStart": self.timer_start,
+            "timerPause": self.timer_pause,
+            "timerStop": self.timer_stop,
+            "timerReset": self.timer_reset,
+            "timerResetFull": self.timer_reset_full,
+            "timerIgnore": self.timer_ignore,
+        }
+
+    def attach_ui(self) -> None:
+        """Loads the QML panel and connects it to the models, needs the QGuiApplication of a non-headless panel."""
+        if self.headless:
+            raise RuntimeError("a headless control panel has no QGuiApplication to show the UI with")
+        if self.engine is not None:
+            return
+
+        from PySide6.QtQml import QQmlApplicationEngine
+
+        self.engine = QQmlApplicationEngine()
+
+        # set before loading, the bindings would be evaluated against undefined names otherwise
+        self.engine.rootContext().setContextProperty("t_model", self.t_model)
+        self.engine.rootContext().setContextProperty("database_model", self.database_model)
+        self.engine.rootContext().setContextProperty("sendValueAndUpdate", self.sendValueAndUpdate)
+        self.engine.rootContext().setContextProperty("control_panel_model", self.control_panel_model)
+        self.engine.rootContext().setContextProperty("lap_model", self.lap_model)
+        self.engine.load(resource_path() / "frontend/qml/main.qml")
+
+        # connect to the signals from the QML file
+        root = self.engine.rootObjects()[0]
+        for signal_name, handler in self.ui_signal_handlers().items():
+            getattr(root, signal_name).connect(handler)  # type: ignore
 
     def handle_head_tracker_reset_request(self) -> None:
         pass
 
-    def send_driver_throttle_data(self) -> None:
-        self.max_throttle = self.control_panel_model.get_max_throttle()
-        self.max_brake = self.control_panel_model.get_max_brake()
-        self.max_clutch = self.control_panel_model.get_max_clutch()
-        self.straightlinespeed = self.control_panel_model.get_straightlinespeed()
-        self.curvespeed = self.control_panel_model.get_curvespeed()
-
-        self.max_steering = self.control_panel_model.get_max_steering()
-        self.steering_offset = self.control_panel_model.get_steering_offset()
+    def handle_driver_input(self) -> None:
+        self.handle_driver_input_batch(receive_all_data(self.__driver_input_receiver))
 
-        throttle_payload = {
-            "throttle": 0,
-            "brake": 0,
-            "clutch": 0,
-            "steering": self.max_steering,
-            "steering_offset": self.steering_offset,
-        }
+    def handle_driver_input_batch(self, driver_payloads: list) -> None:
+        """
+        Processes driver input payloads that arrived together, oldest first.
 
-        if self.control_panel_model.get_pedal_status():
-            throttle_payload = {
-                "max_throttle": self.max_throttle,
-                "max_brake": self.max_brake,
-                "max_clutch": self.max_clutch,
-                "max_steering": self.max_steering,
-                "steering_offset": self.steering_offset,
-            }
+        Args:
+        driver_payloads (list): The payloads, from the socket or a replayed session.
+        """
+        if not driver_payloads:
+            return
+        if latency_tracer.TRACER is not None:
+            latency_tracer.TRACER.begin(len(driver_payloads))
 
-        send_data(self.__pynng_data_publisher, throttle_payload, "config", p_print=False)
-        ControlPanel.send_speed_data(self)
+        self.driver_input_received += len(driver_payloads)
+        self.driver_input_coalesced += len(driver_payloads) - 1
 
-    def send_speed_data(self) -> None:
-        self.straightlinespeed = self.control_panel_model.get_straightlinespeed()
-        self.curvespeed = self.control_panel_model.get_curvespeed()
+        for listener in self.driver_input_listeners:
+            listener(driver_payloads)
 
-    def handle_driver_input(self) -> None:
-        driver_payload = receive_data(self.__driver_input_receiver)
+        self.process_driver_input(driver_payloads[-1])
 
+    def process_driver_input(self, driver_payload: dict) -> None:
         throttle = driver_payload["throttle"]
         brake = driver_payload["brake"]
         clutch = driver_payload["clutch"]
         steering = driver_payload["steering"]
-        tilt_x = driver_payload["tilt_x"]
-        tilt_y = driver_payload["tilt_y"]
-        vibration = driver_payload["vibration"]
+        curvespeed = self.control_panel_model.get_curvespeed()
+        straightlinespeed = self.control_panel_model.get_straightlinespeed()
 
-        self.control_panel_model.set_actual_all(throttle, brake, clutch, steering)
+        self.control_panel_model.set_actual_all(throttle, brake, clutch, steering, curvespeed, straightlinespeed)
 
         self.max_throttle = self.control_panel_model.get_max_throttle()
         self.max_brake = self.control_panel_model.get_max_brake()
         self.max_clutch = self.control_panel_model.get_max_clutch()
         self.max_steering = self.control_panel_model.get_max_steering()
 
-        throttle_scaled = throttle * (self.max_throttle / 100)
-        brake_scaled = brake * (self.max_brake / 100)
-        clutch_scaled = clutch * (self.max_clutch / 100)
-        steering_scaled = steering * (self.max_steering / 100)
+        throttle_scaled, brake_scaled, clutch_scaled, steering_scaled = scale_driver_input_sample(
+            driver_payload, self.max_throttle, self.max_brake, self.max_clutch, self.max_steering
+        )
 
-        self.control_panel_model.set_all(throttle_scaled, brake_scaled, clutch_scaled, steering_scaled)
+        self.control_panel_model.set_all(
+            throttle_scaled, brake_scaled, clutch_scaled, steering_scaled, curvespeed, straightlinespeed
+        )
+
+    def start_telemetry_recording(
+        self, directory: str = TELEMETRY_DIRECTORY, segment_records: int = TELEMETRY_SEGMENT_RECORDS
+    ) -> TelemetryRecorder:
+        """Records every received driver input sample and every changed config to directory."""
+        self.stop_telemetry_recording()
+        self.telemetry_recorder = TelemetryRecorder(directory, segment_records)
+        self.driver_input_listeners.append(self.telemetry_recorder.record_driver_input)
+        telemetry_recorder.RECORDER = self.telemetry_recorder
+        print(f"Recording telemetry to {self.telemetry_recorder.segment_path(0)}")
+        return self.telemetry_recorder
+
+    def stop_telemetry_recording(self) -> None:
+        if self.telemetry_recorder is None:
+            return
+
+        # not listening while paused
+        if self.telemetry_recorder.record_driver_input in self.driver_input_listeners:
+            self.driver_input_listeners.remove(self.telemetry_recorder.record_driver_input)
+        if telemetry_recorder.RECORDER is self.telemetry_recorder:
+            telemetry_recorder.RECORDER = None
+        self.telemetry_recorder.close()
+        self.telemetry_recorder = None
+
+    def set_telemetry_recording_paused(self, paused: bool) -> None:
+        """Stops or resumes recording into the running session without closing it, e.g. during a replay."""
+        if self.telemetry_recorder is None:
+            return
+
+        listener = self.telemetry_recorder.record_driver_input
+        if paused:
+            if listener in self.driver_input_listeners:
+                self.driver_input_listeners.remove(listener)
+            if telemetry_recorder.RECORDER is self.telemetry_recorder:
+                telemetry_recorder.RECORDER = None
+        else:
+            if listener not in self.driver_input_listeners:
+                self.driver_input_listeners.append(listener)
+            telemetry_recorder.RECORDER = self.telemetry_recorder
+
+    def set_config_publishing_enabled(self, enabled: bool) -> None:
+        """Stops or resumes publishing the config on control_panel.ipc, e.g. while a replay drives the model."""
+        self.config_publisher.set_enabled(enabled)
+
+    def set_live_driver_input_enabled(self, enabled: bool) -> None:
+        """Stops or resumes reading the platform's driver input, e.g. while a session is replayed."""
+        self._notifier.setEnabled(enabled)
+
+    def get_driver_input_stats(self) -> dict:
+        return {
+            "received": self.driver_input_received,
+            "coalesced": self.driver_input_coalesced,
+            "displayed": self.driver_input_received - self.driver_input_coalesced,
+        }
 
     def start(self):
         self.app.exec()
-
+        # the QML goes first, its bindings would be evaluated against the deleted models otherwise
+        self.engine = None
+
+        self.speed_update_coalescer.flush()
+        self.car_config_channel.close()
+        self.car_config.close()
+        if self.latency_introspection is not None:
+            self.latency_introspection.close()
+        self.stop_telemetry_recording()
+        self.database_model.close()
+        self.remote_worker.stop(timeout=5)
+        SSH_SESSIONS.close_all()
         print("exiting control panel")
 
     # timer is listening to specified port
@@ -315,40 +622,29 @@ class ControlPanel:
         payload = {"signal": string}
         send_data(self.__pynng_data_publisher, payload, topic)
 
-    def timer_start(self) -> None:
-        if self.timer_state == TimerStates.STOPPED:
-            self.diff = 0
-            self.t_model.set_timestamp(0)
+    @property
+    def timer_state(self) -> TimerStates:
+        return self.lap_timer.get_state()
 
-        self.start_timestamp_ns = time.time_ns() - self.diff
-        self.timer.start()
-        self.timer_state = TimerStates.RUNNING
+    def timer_start(self) -> None:
+        self.lap_timer.start()
 
     def timer_pause(self) -> None:
-        if self.timer_state == TimerStates.PAUSED:
-            self.start()
-        else:
-            self.timer.stop()
-            self.timer_state = TimerStates.PAUSED
+        self.lap_timer.pause()
 
     def timer_stop(self) -> None:
-        if self.timer_state == TimerStates.PAUSED:
-            self.start()
-        else:
-            self.timer.stop()
-            self.timer_state = TimerStates.PAUSED
+        self.lap_timer.stop()
 
     def timer_reset(self) -> None:
-        self.timer.stop()
-        self.diff = 0
-        self.t_model.set_timestamp(0)
-        self.timer_state = TimerStates.RESET
+        self.lap_timer.reset()
 
     def timer_reset_full(self) -> None:
         self.send_to_timer("reset full", "timer_signal")
+        self.lap_model.clear()
 
     def timer_ignore(self) -> None:
         self.send_to_timer("ignore", "timer_signal")
+        self.lap_timer.ignore_lap()
 
     def change_platform_status(self) -> None:
         self.control_panel_model.set_platform_status(not self.control_panel_model.get_platform_status())
@@ -361,7 +657,9 @@ class ControlPanel:
     def change_start_status(self) -> None:
         start_status = not self.control_panel_model.get_start_status()
         self.control_panel_model.set_start_status(start_status)
-        
+        self.car_config.set("start", start_status)
+        self.send_car_config_delta({"start": start_status})
+
         if start_status:
             print("on button pressed")
             self.run_start_script()
@@ -385,153 +683,86 @@ class ControlPanel:
         self.control_panel_model.set_process_status(not self.control_panel_model.get_process_status())
         self.sendValueAndUpdate("process")
 
-    @staticmethod
-    def updateJsonFile(json_file_path, key):
-        with open(json_file_path, 'r') as file:
-            data = json.load(file)
-
-        if key in data:
-            data[key] = not data[key]
-            with open(json_file_path, 'w') as file:
-                json.dump(data, file, indent=2)
-        else:
-            print(f"Key {key} nicht in der JSON gefunden.")
+    def submit_remote_command(self, name: str, function, *args) -> None:
+        """
+        Runs a blocking command for the car on the background worker.
 
-    @staticmethod
-    def updateJsonFileFloat(json_file_path, key, new_value):
-        with open(json_file_path, 'r') as file:
-            data = json.load(file)
-
-        if key in data:
-            data[key] = new_value
-            with open(json_file_path, 'w') as file:
-                json.dump(data, file, indent=2)
-        else:
-            print(f"Schlüssel '{key}' nicht in der JSON gefunden.")
+        Args:
+        name (str): The name the command is reported under in the control panel model.
+        function (callable): The blocking function, e.g. an SSH call.
+        args: The arguments passed to the function.
+        """
+        self.control_panel_model.remote_command_submitted(name)
+        self.remote_worker.submit(name, function, *args)
 
+    def send_car_config_delta(self, delta: dict) -> None:
+        """Streams changed car config values to the car, SFTP is only used if the car doesn't acknowledge them."""
+        self.car_config_channel.send_delta(delta)
 
-    @staticmethod
-    def send_json_file_via_ssh(local_path, ssh_host, ssh_port, ssh_username, ssh_password, remote_path):
-        # Read JSON file
-        with open(local_path, 'r') as file:
-            json_data = json.load(file)
-
-        # Establish SSH connection
-        ssh = paramiko.SSHClient()
-        ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-        ssh.connect(ssh_host, port=ssh_port, username=ssh_username, password=ssh_password)
-
-        # Transfer JSON data via SSH
-        sftp = ssh.open_sftp()
-        with sftp.file(remote_path, 'w') as remote_file:
-            remote_file.write(json.dumps(json_data))
-
-        # Close SSH connection
-        sftp.close()
-        ssh.close()
-        print("Erfolgreich gesendet!")
+    def handle_car_config_ack_timeout(self, seq: int) -> None:
+        print(f"Car did not acknowledge config update {seq}, uploading the config file instead")
+        self.push_car_config()
 
-    @staticmethod
-    def sendValueAndUpdate(key):
+    def push_car_config(self) -> None:
+        """Uploads a snapshot of the car config to the car in the background."""
+        json_data = self.car_config.snapshot()
+
+        ssh = SSH_SESSIONS.get(CAR_SSH_HOST, CAR_SSH_PORT, CAR_SSH_USERNAME, CAR_SSH_PASSWORD)
+        self.submit_remote_command("config upload", ssh.write_file, CAR_CONFIG_REMOTE_PATH, json.dumps(json_data))
+
+    def sendValueAndUpdate(self, key):
         print('update ' + key)
-        local_path = 'control_panel_backend/config_selfdriving_car.json'
 
-        control_panel_model = ControlPanelModel()
+        if key in ("straightlinespeed", "curvespeed"):
+            new_value = getattr(self.control_panel_model, f"get_{key}")()
+        else:
+            new_value = getattr(self.control_panel_model, f"get_{key}_status")()
 
+        self.car_config.set(key, new_value)
+        self.send_car_config_delta({key: new_value})
+
+    def handle_speed_update(self, key):
         if key == "straightlinespeed":
-            new_value = control_panel_model.straightlinespeed
-            print(new_value)
-            ControlPanel.updateJsonFileFloat(local_path, key, new_value)
+            new_value = round(self.control_panel_model.get_straightlinespeed(), 1)
         elif key == "curvespeed":
-            new_value = control_panel_model.curvespeed
-            print(new_value)
-            ControlPanel.updateJsonFileFloat(local_path, key, new_value)
+            new_value = round(self.control_panel_model.get_curvespeed(), 1)
         else:
-            ControlPanel.updateJsonFile(local_path, key)
-        
-        ssh_host = '192.168.30.123'
-        ssh_port = 22  # Standard-SSH-Port
-        ssh_username = 'itlab'
-        ssh_password = '1234'
-        remote_path = '/home/itlab/cam/inside-out-server/data.json'
-        ControlPanel.send_json_file_via_ssh(local_path, ssh_host, ssh_port, ssh_username, ssh_password, remote_path)
+            return
 
-    def handle_speed_update(self, key):
-        print(f'Updating {key}')
-        local_path = 'control_panel_backend/config_selfdriving_car.json'
+        self.speed_update_coalescer.submit(key, new_value)
 
-        if key == "straightlinespeed":
-            new_value = self.control_panel_model.get_straightlinespeed()
-            new_value2 = round(new_value, 1)
-            print(f'Straight line speed new value: {new_value2}')
-            self.updateJsonFileFloat(local_path, key, new_value2)
-        elif key == "curvespeed":
-            new_value = self.control_panel_model.get_curvespeed()
-            new_value2 = round(new_value, 1)
-            print(f'Curve speed new value: {new_value2}')
-            self.updateJsonFileFloat(local_path, key, new_value2)
-        
-        ssh_host = '192.168.30.123'
-        ssh_port = 22
-        ssh_username = 'itlab'
-        ssh_password = '1234'
-        remote_path = '/home/itlab/cam/inside-out-server/data.json'
-        self.send_json_file_via_ssh(local_path, ssh_host, ssh_port, ssh_username, ssh_password, remote_path)
+    def flush_speed_updates(self, updates: dict) -> None:
+        for key, new_value in updates.items():
+            print(f'Updating {key}, new value: {new_value}')
+
+        self.car_config.update(updates)
+        self.send_car_config_delta(updates)
 
     def run_start_script(self) -> None:
-        #SSH connection information for the Raspberry Pi
-        ssh_host = '192.168.30.123'
-        ssh_port = 22 
-        ssh_username = 'itlab'
-        ssh_password = '1234'
-        script_path = '/home/itlab/start.sh'
+        self.submit_remote_command("start script", ControlPanel.start_script_on_car)
 
-        try:
-            #SSH connection
-            ssh = paramiko.SSHClient()
-            ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-            ssh.connect(ssh_host, port=ssh_port, username=ssh_username, password=ssh_password)
-            print("SSH connected")
-            
-            #start tmux session and run sh
-            command = f'tmux new-session -d -s my_session "bash {script_path}"'
-            stdin, stdout, stderr = ssh.exec_command(command)
-            print("Script executed within tmux session")
+    def stop_tmux_session(self) -> None:
+        self.submit_remote_command("stop script", ControlPanel.stop_script_on_car)
 
-            ssh.close()
-            print("SSH connection closed")
+    @staticmethod
+    def start_script_on_car() -> None:
+        """Starts the car's start script within a tmux session, blocks until the command is sent."""
+        ssh = SSH_SESSIONS.get(CAR_SSH_HOST, CAR_SSH_PORT, CAR_SSH_USERNAME, CAR_SSH_PASSWORD)
 
-            print("Shell script successfully started within a tmux session.")
-        except Exception as e:
-            print(f"Error executing the shell script over SSH: {e}")
+        #start tmux session and run sh
+        command = f'tmux new-session -d -s {CAR_TMUX_SESSION_NAME} "bash {CAR_START_SCRIPT_PATH}"'
+        stdin, stdout, stderr = ssh.exec_command(command)
+        print("Shell script successfully started within a tmux session.")
 
+    @staticmethod
+    def stop_script_on_car() -> None:
+        """Stops the car's start script and closes its tmux session, blocks until the commands are sent."""
+        ssh = SSH_SESSIONS.get(CAR_SSH_HOST, CAR_SSH_PORT, CAR_SSH_USERNAME, CAR_SSH_PASSWORD)
 
-    def stop_tmux_session(self) -> None:
-        #SSH connection information for the Raspberry Pi
-        ssh_host = '192.168.30.123'
-        ssh_port = 22 
-        ssh_username = 'itlab'
-        ssh_password = '1234'
-        tmux_session_name = 'my_session'  #tmux session name
+        #termination signal to sh script
+        stdin, stdout, stderr = ssh.exec_command(f'tmux send-keys -t {CAR_TMUX_SESSION_NAME} C-c')
+        print("Script terminated")
 
-        try:
-            #SSH connection
-            ssh = paramiko.SSHClient()
-            ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-            ssh.connect(ssh_host, port=ssh_port, username=ssh_username, password=ssh_password)
-            print("SSH connected")
-            
-            #termination signal to sh script
-            stdin, stdout, stderr = ssh.exec_command(f'tmux send-keys -t {tmux_session_name} C-c')
-            print("Script terminated")
-
-            #close tmux session
-            stdin, stdout, stderr = ssh.exec_command(f'tmux kill-session -t {tmux_session_name}')
-            print("Tmux session closed")
-
-            ssh.close()
-            print("SSH connection closed")
-
-            print(f"Tmux session '{tmux_session_name}' successfully stopped.")
-        except Exception as e:
-            print(f"Error stopping the tmux session over SSH: {e}")
\ No newline at end of file
+        #close tmux session
+        stdin, stdout, stderr = ssh.exec_command(f'tmux kill-session -t {CAR_TMUX_SESSION_NAME}')
+        print(f"Tmux session '{CAR_TMUX_SESSION_NAME}' successfully stopped.")
@@ -1,5 +1,7 @@
 # Copyright (C) 2023, NG:ITL
-from PySide6.QtCore import QObject, Signal, Property
+from PySide6.QtCore import QObject, Signal, Slot, Property
+
+from control_panel_backend import latency_tracer
 
 class ControlPanelModel(QObject):
     # --------------- signals ---------------
@@ -43,6 +45,10 @@ class ControlPanelModel(QObject):
     # ---------- head tracking -----------
     head_tracking_yaw_angle_changed = Signal()
 
+    # ---------- remote commands -----------
+    remote_command_status_changed = Signal()
+    remote_commands_pending_changed = Signal()
+
     def __init__(self) -> None:
         QObject.__init__(self)
         # standard, used for sending
@@ -86,6 +92,13 @@ class ControlPanelModel(QObject):
         self._debug_activated = False
         self._process_activated = False
 
+        # bumped by every setter of a value the "config" topic is built from
+        self._config_version = 0
+
+        # commands running in the background on the car, e.g. over SSH
+        self._remote_command_status = ""
+        self._remote_commands_pending = 0
+
     @Property(float)
     def straightlinespeed(self):
         return self._straightlinespeed
@@ -116,6 +129,8 @@ class ControlPanelModel(QObject):
         self.set_steering(steering)
         self.set_cs(cs)
         self.set_sls(sls)
+        if latency_tracer.TRACER is not None:
+            latency_tracer.TRACER.mark(latency_tracer.STAGE_MODEL_SET_ALL)
 
     def set_actual_all(self, throttle: float, brake: float, clutch: float, steering: float, cs: float, sls: float) -> None:
         self.set_actual_throttle(throttle)
@@ -182,6 +197,22 @@ class ControlPanelModel(QObject):
     def change_process_status(self) -> None:
         self.set_process_status(self.get_process_status())
 
+    # ---------- remote commands ----------
+    def remote_command_submitted(self, name: str) -> None:
+        self.set_remote_commands_pending(self._remote_commands_pending + 1)
+        self.set_remote_command_status(f"{name} running")
+
+    @Slot(str, object)
+    def remote_command_finished(self, name: str, result: object) -> None:
+        self.set_remote_commands_pending(self._remote_commands_pending - 1)
+        self.set_remote_command_status(f"{name} done")
+
+    @Slot(str, str)
+    def remote_command_failed(self, name: str, error: str) -> None:
+        self.set_remote_commands_pending(self._remote_commands_pending - 1)
+        self.set_remote_command_status(f"{name} failed: {error}")
+        print(f"Remote command {name} failed: {error}")
+
     # -------------------- getters --------------------
     # ---------- standard ----------
     def get_throttle(self) -> float:
@@ -278,6 +309,16 @@ class ControlPanelModel(QObject):
     def get_head_tracking_yaw_angle(self) -> float:
         return self._head_tracking_yaw_angle
 
+    def get_config_version(self) -> int:
+        return self._config_version
+
+    # ---------- remote commands ----------
+    def get_remote_command_status(self) -> str:
+        return self._remote_command_status
+
+    def get_remote_commands_pending(self) -> int:
+        return self._remote_commands_pending
+
     # -------------------- setters --------------------
     # ---------- standard ----------
     def set_throttle(self, value: float) -> None:
@@ -313,6 +354,7 @@ class ControlPanelModel(QObject):
     def set_steering_offset(self, value: float) -> None:
         if self._steering_offset != value:
             self._steering_offset = value
+            self._config_version += 1
             self.steering_offset_changed.emit()
 
     # ---------- actual values ----------
@@ -350,21 +392,25 @@ class ControlPanelModel(QObject):
     def set_max_throttle(self, value: float) -> None:
         if self._max_throttle != value:
             self._max_throttle = value
+            self._config_version += 1
             self.max_throttle_changed.emit()
 
     def set_max_brake(self, value: float) -> None:
         if self._max_brake != value:
             self._max_brake = value
+            self._config_version += 1
             self.max_brake_changed.emit()
 
     def set_max_clutch(self, value: float) -> None:
         if self._max_clutch != value:
             self._max_clutch = value
+            self._config_version += 1
             self.max_clutch_changed.emit()
 
     def set_max_steering(self, value: float) -> None:
         if self._max_steering != value:
             self._max_steering = value
+            self._config_version += 1
             self.max_steering_changed.emit()
 
     def set_curvespeed(self, value: float) -> None:
@@ -396,6 +442,7 @@ class ControlPanelModel(QObject):
     def set_pedal_status(self, status: bool) -> None:
         if self._pedals_activated != status:
             self._pedals_activated = status
+            self._config_version += 1
             self.pedal_status_changed.emit()
 
     def set_head_tracking_status(self, status: bool) -> None:
@@ -434,6 +481,17 @@ class ControlPanelModel(QObject):
             self._head_tracking_yaw_angle = value
             self.head_tracking_yaw_angle_changed.emit()
 
+    # ---------- remote commands ----------
+    def set_remote_command_status(self, status: str) -> None:
+        if self._remote_command_status != status:
+            self._remote_command_status = status
+            self.remote_command_status_changed.emit()
+
+    def set_remote_commands_pending(self, value: int) -> None:
+        if self._remote_commands_pending != value:
+            self._remote_commands_pending = value
+            self.remote_commands_pending_changed.emit()
+
     # -------------------- properties --------------------
     # ---------- standard ----------
     throttle = Property(float, get_throttle, set_throttle, notify=throttle_changed)  # type: ignore
@@ -478,4 +536,8 @@ class ControlPanelModel(QObject):
     # ---------- head tracking ----------
     head_tracking_yaw_angle = Property(
         float, get_head_tracking_yaw_angle, set_head_tracking_yaw_angle, notify=head_tracking_yaw_angle_changed  # type: ignore
-    )
\ No newline at end of file
+    )
+
+    # ---------- remote commands ----------
+    remote_command_status = Property(str, get_remote_command_status, notify=remote_command_status_changed)  # type: ignore
+    remote_commands_pending = Property(int, get_remote_commands_pending, notify=remote_commands_pending_changed)  # type: ignore
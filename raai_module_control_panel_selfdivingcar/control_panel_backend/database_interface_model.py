@@ -1,33 +1,72 @@
 from PySide6.QtCore import QObject, Signal, Slot, Property
 import pynng
-from time import sleep
 import json
+import threading
+
+from control_panel_backend.request_client import RequestClient, REQUEST_TIMEOUT_MS, REQUEST_RETRIES
+from control_panel_backend.command_worker import CommandWorker
+from control_panel_backend.driver_cache import DriverCache
+from control_panel_backend.driver_index import DriverIndex, driver_id
+from control_panel_backend.driver_list_model import DriverListModel, DriverFilterModel
 
 
 class DriverDataPublisher(QObject):
     driversChanged = Signal()
     statusChanged = Signal()
+    searchChanged = Signal()
+    currentDriverChanged = Signal(str)
+    # from the pynng thread, delivered queued to handle_queued_data_sent
+    queuedDataSent = Signal(str)
 
-    def __init__(self, pub_address, req_address):
+    def __init__(
+        self, pub_address, req_address, timeout_ms=REQUEST_TIMEOUT_MS, retries=REQUEST_RETRIES, cache_path=None
+    ):
         super().__init__()
-        self.__drivers = [
-            {
-                "id": "4823662a-29c5-47d7-bdba-68baa2825990",
-                "name": "Dummy",
-                "email": "example@email.test",
-                "created": "2023-11-02-08-58-03",
-            }
-        ]
+        # filled by load_cache and the database service
+        drivers = []
 
         self.__status = ""
 
+        # drivers shows the results of the search while there is one, __model keeps the full list
+        self.index = DriverIndex(drivers)
+        self.__model = DriverListModel(drivers)
+        self.__view = DriverFilterModel(self.__model)
+        self.__search = ""
+        self.__result_count = 0
+        self.__driver_list = None
+        for signal in (
+            self.__view.rowsInserted,
+            self.__view.rowsRemoved,
+            self.__view.dataChanged,
+            self.__view.modelReset,
+            self.__view.layoutChanged,
+        ):
+            signal.connect(self.handle_view_changed)
+
         self.PUB_ADDRESS = pub_address
         self.pub_socket = pynng.Pub0()
+        # a publish without a subscriber is lost, the latest one waits for the first to attach
+        self.__pub_lock = threading.Lock()
+        self.__subscribers = 0
+        self.__queued_data = None
+        self.queuedDataSent.connect(self.handle_queued_data_sent)
+        self.pub_socket.add_post_pipe_connect_cb(self.handle_subscriber_attached)
+        self.pub_socket.add_post_pipe_remove_cb(self.handle_subscriber_detached)
         self.pub_socket.listen(self.PUB_ADDRESS)
-        sleep(1)
 
-        self.req_socket = pynng.Req0()
-        self.req_socket.dial(req_address, block=False)
+        # the database service may be down, its replies are handled when they arrive
+        self.requests = RequestClient(req_address, timeout_ms, retries, "database_requests")
+        # revision of the service the drivers are synced to, 0 asks for a full snapshot, a revision
+        # only counts within the epoch of the service's run it was handed out by
+        self.__revision = 0
+        self.__epoch = ""
+        self.__delta_sync = True
+
+        # the last synced drivers on disk, read and written on their own thread
+        self.cache = DriverCache(cache_path) if cache_path else None
+        self.cache_worker = CommandWorker("driver_cache")
+        self.cache_worker.command_finished.connect(self.handle_cache_finished)
+        self.cache_worker.command_failed.connect(self.handle_cache_failed)
 
     def sort_drivers(self, drivers):
         """
@@ -45,22 +84,96 @@ class DriverDataPublisher(QObject):
     @Slot(str)
     def send_data(self, driver_name):
         """
-        Sends the current driver name to the publish socket.
+        Sends the current driver name to the publish socket. Without a subscriber it is sent once the
+        first one attaches.
 
         Args:
         driver_name (str): The name of the driver to send.
         """
         data = "current_driver: " + driver_name
-        self.pub_socket.send(data.encode("utf-8"))
+        with self.__pub_lock:
+            queued = not self.__subscribers
+            if queued:
+                # sent by handle_subscriber_attached, a later driver replaces it
+                self.__queued_data = (driver_name, data.encode("utf-8"))
+            else:
+                self.pub_socket.send(data.encode("utf-8"))
+        self.set_status(f"Waiting for a subscriber: {driver_name}" if queued else f"Sent data: {driver_name}")
+        self.currentDriverChanged.emit(driver_name)
+
+    def handle_subscriber_attached(self, pipe):
+        # called on a pynng thread, only touches the socket and the queue
+        with self.__pub_lock:
+            self.__subscribers += 1
+            if self.__queued_data is None:
+                return
+            driver_name, data = self.__queued_data
+            self.__queued_data = None
+            self.pub_socket.send(data)
+        self.queuedDataSent.emit(driver_name)
+
+    def handle_subscriber_detached(self, pipe):
+        with self.__pub_lock:
+            self.__subscribers -= 1
+
+    @Slot(str)
+    def handle_queued_data_sent(self, driver_name):
         self.set_status(f"Sent data: {driver_name}")
 
+    @Slot()
+    def load_cache(self):
+        """
+        Loads the cached drivers in the background and refreshes them from the database service
+        once they are shown. Without a cache this only refreshes.
+        """
+        if self.cache is None:
+            self.refresh_driver()
+            return
+        self.cache_worker.submit("load", self.cache.load)
+        self.set_status("Loading drivers")
+
+    def handle_cache_finished(self, command: str, result):
+        if command != "load":
+            return
+        epoch, revision, drivers = result
+        # a reply of the service that came first is newer than the cache
+        if self.__revision == 0 and not len(self.__model):
+            self.set_drivers(drivers)
+            # a restarted service has another epoch and answers the refresh with a full snapshot
+            self.__revision = revision
+            self.__epoch = epoch
+            print(f"{len(drivers)} cached drivers, revision {revision} of epoch {epoch or '-'}")
+        self.refresh_driver()
+
+    def handle_cache_failed(self, command: str, error: str):
+        print(f"Driver cache {command} failed: {error}")
+        if command == "load":
+            self.refresh_driver()
+
+    def store_drivers(self, revision: int, drivers, deleted=(), full: bool = False):
+        if self.cache is not None:
+            self.cache_worker.submit(
+                "store", self.cache.store, self.__epoch, revision, list(drivers), list(deleted), full
+            )
+
     @Slot()
     def refresh_driver(self):
-        """Sends a request to refresh the driver data and handles the response."""
-        data = "get_drivers"
-        self.req_socket.send(data.encode("utf-8"))
-        response = self.req_socket.recv().decode("utf-8")
+        """
+        Requests the drivers changed since the last refresh, the response is handled by
+        handle_delta_response. A service that doesn't know get_drivers_since is asked for all
+        drivers with get_drivers instead.
+        """
+        if self.__delta_sync:
+            self.requests.request(
+                f"get_drivers_since: {self.__revision} {self.__epoch}".rstrip(),
+                self.handle_delta_response,
+                self.handle_request_failed,
+            )
+        else:
+            self.requests.request("get_drivers", self.handle_drivers_response, self.handle_request_failed)
+        self.set_status("Refreshing drivers")
 
+    def handle_drivers_response(self, response: str):
         if response == "No Driver found":
             self.set_status("No driver found")
         elif response == "Error":
@@ -70,62 +183,176 @@ class DriverDataPublisher(QObject):
             response = self.sort_drivers(response)
 
             self.set_drivers(response)
+            self.store_drivers(self.__revision, response, full=True)
             self.set_status("Refreshed drivers")
-        print(self.drivers)
+        print(f"{len(self.all_drivers())} drivers")
+
+    def handle_delta_response(self, response: str):
+        try:
+            delta = json.loads(response)
+            revision = delta["revision"]
+            epoch = delta["epoch"]
+        except (ValueError, TypeError, KeyError):
+            print(f"Driver database doesn't sync deltas ({response[:40]!r}), falling back to get_drivers")
+            self.__delta_sync = False
+            self.refresh_driver()
+            return
+
+        if not delta.get("full") and epoch != self.__epoch:
+            # changes relative to another run's table, only a full snapshot can be trusted
+            print(f"Driver database epoch changed to {epoch}, requesting all drivers")
+            self.__revision = 0
+            self.__epoch = ""
+            self.refresh_driver()
+            return
+
+        changes = self.merge_drivers(delta)
+        self.__revision = revision
+        self.__epoch = epoch
+        self.store_drivers(revision, delta["drivers"], delta.get("deleted", []), bool(delta.get("full")))
+        self.set_status("Refreshed drivers" if delta.get("full") else f"Refreshed drivers, {changes} changed")
+        print(f"{len(self.all_drivers())} drivers, {changes} changed, revision {revision}")
+
+    def merge_drivers(self, delta: dict) -> int:
+        """
+        Applies a response of get_drivers_since to the drivers.
+
+        Args:
+        delta (dict): {"revision": int, "full": bool, "drivers": [...], "deleted": [ids]}, with full
+            drivers are all drivers, otherwise the added and changed ones.
+
+        Returns:
+        int: The number of added, changed and deleted drivers, for a full snapshot all drivers.
+        """
+        if delta.get("full"):
+            self.set_drivers(delta["drivers"])
+            return len(delta["drivers"])
+
+        for key in delta.get("deleted", []):
+            self.index.remove(key)
+        for driver in delta["drivers"]:
+            self.index.add(driver)
+        if self.__search:
+            # the ranks first, new rows are filtered against them when they are inserted
+            self.update_search()
+        for key in delta.get("deleted", []):
+            self.__model.remove(key)
+        for driver in delta["drivers"]:
+            self.__model.upsert(driver)
+        return len(delta["drivers"]) + len(delta.get("deleted", []))
+
+    def handle_request_failed(self, error: str):
+        print(f"Database request failed: {error}")
+        self.set_status("Database not reachable")
 
     @Slot(str)
     def search_driver(self, name: str):
         """
-        Searches for a driver by name.
+        Shows the drivers whose name matches, meant to be called on every keystroke, an empty name
+        shows all drivers again.
 
         Args:
-        name (str): The name of the driver to search for.
+        name (str): Any part of the name of the driver to search for.
         """
-        result = [driver for driver in self.__drivers if driver["name"] == name]
-        if result:
-            self.set_drivers(result)
-            self.set_status("Found driver " + name)
+        if self.__search == name:
+            return
+        self.__search = name
+        self.searchChanged.emit()
+        self.update_search()
+        if not name:
+            self.set_status("")
+        elif self.__result_count:
+            count = self.__result_count
+            self.set_status(f"Found {count} driver{'s' if count != 1 else ''} for {name}")
         else:
             self.set_status("No driver found")
 
+    def update_search(self):
+        if self.__search:
+            ranks = {driver_id(driver): rank for rank, driver in enumerate(self.index.search(self.__search))}
+            self.__result_count = len(ranks)
+            self.__view.set_ranking(ranks)
+        else:
+            self.__result_count = 0
+            self.__view.set_ranking(None)
+
+    def handle_view_changed(self, *_):
+        self.__driver_list = None
+        self.driversChanged.emit()
+
     @Slot(str)
     def create_driver(self, name: str):
         """
-        Creates a new driver with the given name.
+        Requests a new driver with the given name, a second request for the same name while the
+        first is in flight only creates one driver. It isn't retried, a slow service may have
+        created the driver of an attempt that timed out.
 
         Args:
         name (str): The name of the driver to create.
         """
-        data = f"post_driver: {name}"
-        try:
-            self.req_socket.send(data.encode("utf-8"))
-            response = self.req_socket.recv().decode("utf-8")
-            if response:
-                try:
-                    self.__drivers.append(json.loads(response))
-                    self.__drivers = self.sort_drivers(self.__drivers)
-                    self.driversChanged.emit()
-                    self.set_status("Created driver: " + name)
-                except Exception as e:
-                    print(e)
-                    self.set_status("Driver creation failed")
-            else:
+        self.requests.request(
+            f"post_driver: {name}",
+            lambda response: self.handle_created_driver(name, response),
+            lambda error: self.handle_created_driver(name, ""),
+            retries=0,
+        )
+        self.set_status("Creating driver: " + name)
+
+    def handle_created_driver(self, name: str, response: str):
+        if response:
+            try:
+                driver = json.loads(response)
+                self.index.add(driver)
+                if self.__search:
+                    # the ranks first, the new row is filtered against them when it is inserted
+                    self.update_search()
+                self.__model.upsert(driver)
+                # the revision stays, the next refresh brings the driver again
+                self.store_drivers(self.__revision, [driver])
+                self.set_status("Created driver: " + name)
+            except Exception as e:
+                print(e)
                 self.set_status("Driver creation failed")
-        except:
+        else:
             self.set_status("Driver creation failed")
 
-    @Property(list, notify=driversChanged)  # type: ignore
+    def close(self):
+        self.requests.close(timeout=1)
+        if self.cache is not None:
+            # after the queued writes
+            self.cache_worker.submit("close", self.cache.close)
+        self.cache_worker.stop(timeout=5)
+        self.pub_socket.close()
+
+    @Property(QObject, constant=True)  # type: ignore
     def drivers(self):
-        return self.__drivers
+        """The shown drivers as a list model, with the roles driverId, name, email and created."""
+        return self.__view
+
+    @Property(list, notify=driversChanged)  # type: ignore
+    def driver_list(self):
+        """The shown drivers as a list, built once per change, e.g. for the UI process."""
+        if self.__driver_list is None:
+            self.__driver_list = self.__view.drivers()
+        return self.__driver_list
+
+    @Property(str, notify=searchChanged)  # type: ignore
+    def search_text(self):
+        return self.__search
+
+    def all_drivers(self):
+        return self.__model.drivers()
 
     @Property(str, notify=statusChanged)  # type: ignore
     def status(self):
         return self.__status
 
     def set_drivers(self, drivers):
-        if self.__drivers != drivers:
-            self.__drivers = drivers
-            self.driversChanged.emit()
+        if not self.__model.has_drivers(drivers):
+            self.index.replace(drivers)
+            if self.__search:
+                self.update_search()
+            self.__model.set_drivers(drivers)
 
     def set_status(self, status):
         if self.__status != status:
@@ -0,0 +1,91 @@
+# Copyright (C) 2023, NG:ITL
+import os
+import json
+import sqlite3
+from typing import Optional
+
+from control_panel_backend.driver_index import driver_id
+
+DRIVER_CACHE_PATH = "driver_cache.sqlite"
+
+
+class DriverCache:
+    """
+    The last known drivers and the database epoch and revision they are synced to, in a SQLite file.
+
+    The panel shows the cached drivers at startup, before the database service answered or while it
+    is down, and syncs from the cached revision on. Every driver is a row with its JSON, so a delta
+    only writes the changed rows. The connection is opened by the first call, all calls have to be
+    made from the same thread, e.g. a CommandWorker.
+
+    Args:
+    path (str): The cache file, created if it doesn't exist.
+    """
+
+    def __init__(self, path: str = DRIVER_CACHE_PATH) -> None:
+        self.path = path
+        self._connection: Optional[sqlite3.Connection] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is None:
+            connection = sqlite3.connect(self.path)
+            try:
+                self._create_tables(connection)
+            except sqlite3.DatabaseError as e:
+                print(f"Driver cache {self.path} is damaged ({e}), starting a new one")
+                connection.close()
+                for path in (self.path, self.path + "-wal", self.path + "-shm"):
+                    if os.path.exists(path):
+                        os.remove(path)
+                connection = sqlite3.connect(self.path)
+                self._create_tables(connection)
+            self._connection = connection
+        return self._connection
+
+    @staticmethod
+    def _create_tables(connection: sqlite3.Connection) -> None:
+        # the cache can always be synced again, a lost write after a crash is fine
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.execute("CREATE TABLE IF NOT EXISTS drivers (id TEXT PRIMARY KEY, driver TEXT NOT NULL)")
+        connection.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value)")
+        connection.commit()
+
+    def load(self) -> tuple:
+        """
+        Returns:
+        tuple: The epoch, the revision and the list of cached drivers, ("", 0, []) for a new cache.
+        """
+        connection = self._connect()
+        meta = dict(connection.execute("SELECT key, value FROM meta WHERE key IN ('epoch', 'revision')"))
+        drivers = [json.loads(driver) for (driver,) in connection.execute("SELECT driver FROM drivers")]
+        return meta.get("epoch", ""), meta.get("revision", 0), drivers
+
+    def store(self, epoch: str, revision: int, drivers, deleted=(), full: bool = False) -> None:
+        """
+        Writes synced drivers in one transaction.
+
+        Args:
+        epoch (str): The epoch of the database service the revision belongs to.
+        revision (int): The revision the drivers are synced to.
+        drivers (list): Added and changed drivers, with full all drivers.
+        deleted (list): The ids of deleted drivers.
+        full (bool): If drivers replace the cached ones.
+        """
+        connection = self._connect()
+        with connection:
+            if full:
+                connection.execute("DELETE FROM drivers")
+            connection.executemany("DELETE FROM drivers WHERE id = ?", ((key,) for key in deleted))
+            connection.executemany(
+                "INSERT OR REPLACE INTO drivers (id, driver) VALUES (?, ?)",
+                ((driver_id(driver), json.dumps(driver)) for driver in drivers),
+            )
+            connection.executemany(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (("epoch", epoch), ("revision", revision))
+            )
+
+    def close(self) -> None:
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
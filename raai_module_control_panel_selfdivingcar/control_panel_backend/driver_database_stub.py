@@ -0,0 +1,198 @@
+# Copyright (C) 2023, NG:ITL
+"""
+A stand-in for the driver database service, answers the panel's requests on a pynng Rep socket.
+
+    get_drivers                 every driver as a JSON list, "No Driver found" if there is none
+    post_driver: <name>         creates a driver and returns it as JSON
+    get_drivers_since: <rev> <epoch>
+                                the changes after revision rev of epoch, see drivers_since
+    delete_driver: <id>         deletes a driver, returns "OK" or "Error"
+
+python -m control_panel_backend.driver_database_stub --drivers 5000 serves 5000 generated drivers on
+the panel's database address, so the panel can be run and measured without the real service.
+"""
+import uuid
+import json
+import time
+import bisect
+import random
+import string
+import argparse
+import threading
+import pynng
+
+DRIVER_DATABASE_PYNNG_ADDRESS = "ipc:///tmp/RAAI/rest_api.ipc"
+# changes kept for get_drivers_since, a client further behind gets a full snapshot
+DRIVER_DATABASE_HISTORY_LIMIT = 10000
+
+
+def created_now() -> str:
+    return time.strftime("%Y-%m-%d-%H-%M-%S")
+
+
+class DriverDatabaseStub:
+    """
+    An in-memory driver table with a revision per change.
+
+    The revisions count from the start of the stub, a new epoch id tells a client that synced with
+    an earlier run that its revision means nothing here.
+
+    Args:
+    address (str): Where the Rep socket listens, e.g. DRIVER_DATABASE_PYNNG_ADDRESS.
+    drivers (list): The initial drivers.
+    history_limit (int): Changes at least kept for get_drivers_since.
+    """
+
+    def __init__(self, address: str, drivers=(), history_limit: int = DRIVER_DATABASE_HISTORY_LIMIT) -> None:
+        self.address = address
+        self.history_limit = history_limit
+        self._lock = threading.Lock()
+        self.epoch = uuid.uuid4().hex
+        self._drivers: dict = {}
+        self._revision = 0
+        # revision and id of every change, oldest first, and the revision before the oldest kept one
+        self._log_revisions: list = []
+        self._log_ids: list = []
+        self._horizon = 0
+        for driver in drivers:
+            self._change(driver["id"], driver)
+
+        self.requests_served = 0
+        self._rep = pynng.Rep0()
+        self._rep.listen(address)
+        self._thread = threading.Thread(target=self._run, name="driver_database_stub", daemon=True)
+
+    def start(self) -> "DriverDatabaseStub":
+        self._thread.start()
+        return self
+
+    def _change(self, key: str, driver) -> None:
+        self._revision += 1
+        if driver is None:
+            self._drivers.pop(key, None)
+        else:
+            self._drivers[key] = driver
+        self._log_revisions.append(self._revision)
+        self._log_ids.append(key)
+        if len(self._log_ids) > 2 * self.history_limit:
+            # trimmed in halves, not one change at a time
+            dropped = len(self._log_ids) - self.history_limit
+            self._horizon = self._log_revisions[dropped - 1]
+            del self._log_revisions[:dropped]
+            del self._log_ids[:dropped]
+
+    def add_driver(self, name: str, created=None) -> dict:
+        driver = {"id": str(uuid.uuid4()), "name": name, "email": "", "created": created or created_now()}
+        with self._lock:
+            self._change(driver["id"], driver)
+        return driver
+
+    def update_driver(self, driver: dict) -> None:
+        with self._lock:
+            self._change(driver["id"], driver)
+
+    def delete_driver(self, key: str) -> bool:
+        with self._lock:
+            if key not in self._drivers:
+                return False
+            self._change(key, None)
+        return True
+
+    def drivers_since(self, revision: int, epoch=None) -> dict:
+        """
+        Returns the changes after a revision.
+
+        Args:
+        revision (int): The revision the client is synced to.
+        epoch (str): The epoch of that revision, None for a client that wasn't synced yet.
+
+        Returns:
+        dict: {"epoch": str, "revision": current revision, "full": bool, "drivers": [...],
+        "deleted": [ids]}, with full every driver, e.g. for revision 0, one older than the kept
+        history or one of another epoch.
+        """
+        with self._lock:
+            if epoch != self.epoch or revision <= self._horizon or revision > self._revision:
+                drivers = list(self._drivers.values())
+                return {
+                    "epoch": self.epoch,
+                    "revision": self._revision,
+                    "full": True,
+                    "drivers": drivers,
+                    "deleted": [],
+                }
+
+            changed = set(self._log_ids[bisect.bisect_right(self._log_revisions, revision) :])
+            return {
+                "epoch": self.epoch,
+                "revision": self._revision,
+                "full": False,
+                "drivers": [self._drivers[key] for key in changed if key in self._drivers],
+                "deleted": [key for key in changed if key not in self._drivers],
+            }
+
+    def handle(self, request: str) -> str:
+        command, _, argument = request.partition(": ")
+        if command == "get_drivers":
+            with self._lock:
+                drivers = list(self._drivers.values())
+            return json.dumps(drivers) if drivers else "No Driver found"
+        if command == "post_driver":
+            return json.dumps(self.add_driver(argument))
+        if command == "get_drivers_since":
+            revision, _, epoch = argument.partition(" ")
+            return json.dumps(self.drivers_since(int(revision), epoch or None))
+        if command == "delete_driver":
+            return "OK" if self.delete_driver(argument) else "Error"
+        return "Error"
+
+    def _run(self) -> None:
+        while True:
+            try:
+                request = self._rep.recv().decode("utf-8")
+            except pynng.Closed:
+                return
+            try:
+                response = self.handle(request)
+            except ValueError:
+                response = "Error"
+            self.requests_served += 1
+            self._rep.send(response.encode("utf-8"))
+
+    def close(self) -> None:
+        self._rep.close()
+
+
+def generate_drivers(count: int) -> list:
+    """Returns count drivers with random names, one second apart."""
+    start = time.time() - count
+    return [
+        {
+            "id": str(uuid.uuid4()),
+            "name": "".join(random.choices(string.ascii_lowercase, k=random.randint(3, 8))).title()
+            + " "
+            + "".join(random.choices(string.ascii_lowercase, k=random.randint(3, 10))).title(),
+            "email": "",
+            "created": time.strftime("%Y-%m-%d-%H-%M-%S", time.localtime(start + i)),
+        }
+        for i in range(count)
+    ]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Stand-in for the driver database service")
+    parser.add_argument("--address", default=DRIVER_DATABASE_PYNNG_ADDRESS)
+    parser.add_argument("--drivers", type=int, default=100, help="generated drivers to start with")
+    args = parser.parse_args()
+
+    stub = DriverDatabaseStub(args.address, generate_drivers(args.drivers)).start()
+    print(f"Serving {args.drivers} drivers on {args.address}, Ctrl+C to stop")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        stub.close()
+
+
+if __name__ == "__main__":
+    main()
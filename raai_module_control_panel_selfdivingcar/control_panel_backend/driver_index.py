@@ -0,0 +1,197 @@
+# Copyright (C) 2023, NG:ITL
+"""
+An in-memory index of the drivers of the database for search-as-you-type.
+
+Names are normalized (case, accents and whitespace) before they are indexed. Queries of one or
+two characters match the prefix of a name or of one of its words through a sorted word list,
+longer queries match anywhere in the name through a trigram index. If nothing contains a longer
+query, the names sharing most of its trigrams are returned, which finds names with a typo.
+"""
+import bisect
+import unicodedata
+
+# share of the query's trigrams a name needs for a fuzzy match
+FUZZY_MIN_SIMILARITY = 0.5
+
+MATCH_EXACT = 0
+MATCH_PREFIX = 1
+MATCH_WORD_PREFIX = 2
+MATCH_SUBSTRING = 3
+
+
+def normalize_name(name: str) -> str:
+    """Returns name case folded, without accents and with single spaces, e.g. " Zoë  Ann" -> "zoe ann"."""
+    decomposed = unicodedata.normalize("NFKD", name)
+    return " ".join("".join(c for c in decomposed if not unicodedata.combining(c)).casefold().split())
+
+
+def trigrams(text: str) -> set:
+    return {text[i : i + 3] for i in range(len(text) - 2)}
+
+
+def driver_id(driver: dict) -> str:
+    # drivers created before the database had ids are told apart by their name
+    return driver.get("id") or driver["name"]
+
+
+class DriverIndex:
+    """
+    Drivers by id, with indexes on their normalized names.
+
+    search narrows the results of the previous query if the new one extends it, so typing a name
+    character by character only checks the shrinking result of the last keystroke.
+    """
+
+    def __init__(self, drivers=()) -> None:
+        self._drivers: dict = {}
+        self._names: dict = {}
+        self._words: list = []
+        self._trigrams: dict = {}
+        self._last_query = ""
+        self._last_ids: list = []
+        self.replace(drivers)
+
+    def __len__(self) -> int:
+        return len(self._drivers)
+
+    def __contains__(self, key) -> bool:
+        return key in self._drivers
+
+    def get(self, key):
+        return self._drivers.get(key)
+
+    def replace(self, drivers) -> None:
+        """Replaces all drivers, e.g. with the response of get_drivers."""
+        self._drivers = {driver_id(driver): driver for driver in drivers}
+        self._names = {key: normalize_name(driver["name"]) for key, driver in self._drivers.items()}
+        self._trigrams = {}
+        words: list = []
+        for key, name in self._names.items():
+            words.extend((word, key) for word in self._name_words(name))
+            for trigram in trigrams(name):
+                self._trigrams.setdefault(trigram, set()).add(key)
+        # sorted once instead of an insort per driver
+        words.sort()
+        self._words = words
+        self._reset_search()
+
+    def add(self, driver: dict) -> None:
+        """Adds a driver or updates the one with its id."""
+        key = driver_id(driver)
+        if key in self._drivers:
+            self._remove_from_indexes(key)
+        self._drivers[key] = driver
+        name = normalize_name(driver["name"])
+        self._names[key] = name
+        for word in self._name_words(name):
+            bisect.insort(self._words, (word, key))
+        for trigram in trigrams(name):
+            self._trigrams.setdefault(trigram, set()).add(key)
+        self._reset_search()
+
+    def remove(self, key) -> None:
+        if key in self._drivers:
+            self._remove_from_indexes(key)
+            del self._drivers[key]
+            self._reset_search()
+
+    @staticmethod
+    def _name_words(name: str) -> set:
+        # the full name too, so "ann m" is a prefix of "ann marie"
+        return set(name.split()) | {name}
+
+    def _remove_from_indexes(self, key) -> None:
+        name = self._names.pop(key)
+        for word in self._name_words(name):
+            i = bisect.bisect_left(self._words, (word, key))
+            if i < len(self._words) and self._words[i] == (word, key):
+                del self._words[i]
+        for trigram in trigrams(name):
+            ids = self._trigrams[trigram]
+            ids.discard(key)
+            if not ids:
+                del self._trigrams[trigram]
+
+    def _reset_search(self) -> None:
+        self._last_query = ""
+        self._last_ids = []
+
+    def _prefix_ids(self, query: str) -> set:
+        ids = set()
+        i = bisect.bisect_left(self._words, (query,))
+        while i < len(self._words) and self._words[i][0].startswith(query):
+            ids.add(self._words[i][1])
+            i += 1
+        return ids
+
+    def _substring_ids(self, query: str) -> set:
+        postings = sorted((self._trigrams.get(trigram, set()) for trigram in trigrams(query)), key=len)
+        if not postings or not postings[0]:
+            return set()
+        candidates = set(postings[0]).intersection(*postings[1:])
+        # all trigrams present doesn't mean in that order, e.g. "anna" for "nnan"
+        return {key for key in candidates if query in self._names[key]}
+
+    def _fuzzy_ids(self, query: str) -> dict:
+        query_trigrams = trigrams(query)
+        shared: dict = {}
+        for trigram in query_trigrams:
+            for key in self._trigrams.get(trigram, ()):
+                shared[key] = shared.get(key, 0) + 1
+        needed = FUZZY_MIN_SIMILARITY * len(query_trigrams)
+        return {key: count for key, count in shared.items() if count >= needed}
+
+    def match(self, key, query: str) -> int:
+        """Returns how the driver matches a normalized query, one of the MATCH_ constants, or -1."""
+        name = self._names[key]
+        if name == query:
+            return MATCH_EXACT
+        if name.startswith(query):
+            return MATCH_PREFIX
+        if any(word.startswith(query) for word in name.split()):
+            return MATCH_WORD_PREFIX
+        if len(query) >= 3 and query in name:
+            return MATCH_SUBSTRING
+        return -1
+
+    def search(self, query: str, limit=None) -> list:
+        """
+        Searches the drivers by name.
+
+        Args:
+        query (str): Any part of a name, normalized like the names.
+        limit (int): The most results to return, all if None.
+
+        Returns:
+        list: The matching drivers, exact matches first, then prefix, word prefix, substring and
+        fuzzy matches, within those the newest first.
+        """
+        query = normalize_name(query)
+        if not query:
+            self._reset_search()
+            return []
+
+        fuzzy: dict = {}
+        narrows = query.startswith(self._last_query) and (len(query) >= 3) == (len(self._last_query) >= 3)
+        if self._last_query and narrows:
+            # a longer query only matches names the shorter one matched
+            ids = [key for key in self._last_ids if self.match(key, query) >= 0]
+        else:
+            ids = list(self._prefix_ids(query) if len(query) < 3 else self._substring_ids(query))
+        if ids:
+            self._last_query = query
+            self._last_ids = ids
+        else:
+            # no narrowing from fuzzy results, they don't contain the query
+            self._reset_search()
+            if len(query) >= 3:
+                fuzzy = self._fuzzy_ids(query)
+
+        if fuzzy:
+            ranked = sorted(fuzzy, key=lambda key: -fuzzy[key])
+            results = [self._drivers[key] for key in ranked]
+        else:
+            results = [self._drivers[key] for key in ids]
+            results.sort(key=lambda driver: driver.get("created", ""), reverse=True)
+            results.sort(key=lambda driver: self.match(driver_id(driver), query))
+        return results if limit is None else results[:limit]
@@ -0,0 +1,87 @@
+# Copyright (C) 2023, NG:ITL
+"""
+Scaling of raw driver input by the max values of the control panel.
+
+The live path in ControlPanel.process_driver_input scales one sample with scale_driver_input_sample,
+replay and the offline analysis of recordings scale whole batches with scale_driver_input. Both use
+scaling_factor, so a recorded session scales exactly like it did on the panel.
+"""
+import numpy as np
+
+from control_panel_backend.wire_format import DRIVER_INPUT_FIELDS
+
+# one raw "driver_input" sample as the platform sends it
+DRIVER_INPUT_DTYPE = np.dtype([(field, np.float64) for field in DRIVER_INPUT_FIELDS])
+
+SCALED_FIELDS = ("throttle", "brake", "clutch", "steering")
+SCALED_DTYPE = np.dtype([(field, np.float64) for field in SCALED_FIELDS])
+
+
+def scaling_factor(max_percent: float) -> float:
+    return max_percent / 100
+
+
+def scale_driver_input_sample(
+    payload: dict,
+    max_throttle: float,
+    max_brake: float,
+    max_clutch: float,
+    max_steering: float,
+    steering_offset: float = 0.0,
+) -> tuple:
+    """
+    Scales one driver_input payload, plain float math, a batch of one through NumPy costs 100x more.
+
+    Returns:
+    tuple: The scaled throttle, brake, clutch and steering.
+    """
+    return (
+        payload["throttle"] * scaling_factor(max_throttle),
+        payload["brake"] * scaling_factor(max_brake),
+        payload["clutch"] * scaling_factor(max_clutch),
+        payload["steering"] * scaling_factor(max_steering) + steering_offset,
+    )
+
+
+def driver_input_to_array(payloads: list) -> np.ndarray:
+    """
+    Converts received driver_input payloads to a structured array.
+
+    Args:
+    payloads (list): The payloads as returned by receive_all_data, missing fields become 0.0.
+    """
+    samples = np.zeros(len(payloads), dtype=DRIVER_INPUT_DTYPE)
+    values = samples.view(np.float64).reshape(len(payloads), len(DRIVER_INPUT_FIELDS))
+    for i, payload in enumerate(payloads):
+        values[i] = [payload.get(field, 0.0) for field in DRIVER_INPUT_FIELDS]
+    return samples
+
+
+def scale_driver_input(
+    samples: np.ndarray,
+    max_throttle: float,
+    max_brake: float,
+    max_clutch: float,
+    max_steering: float,
+    steering_offset: float = 0.0,
+) -> np.ndarray:
+    """
+    Scales throttle, brake, clutch and steering by max_*/100 in one operation.
+
+    Args:
+    samples (np.ndarray): Raw samples with DRIVER_INPUT_DTYPE.
+    max_throttle, max_brake, max_clutch, max_steering (float): The max values in percent.
+    steering_offset (float): Added to the scaled steering. The live path leaves it at 0.0, there
+        the offset is sent along in the config and applied by the receiver.
+
+    Returns:
+    np.ndarray: The scaled values with SCALED_DTYPE, one row per sample.
+    """
+    samples = np.ascontiguousarray(samples, dtype=DRIVER_INPUT_DTYPE)
+    raw = samples.view(np.float64).reshape(len(samples), len(DRIVER_INPUT_FIELDS))
+    factors = np.array([scaling_factor(value) for value in (max_throttle, max_brake, max_clutch, max_steering)])
+
+    scaled = raw[:, : len(SCALED_FIELDS)] * factors
+    if steering_offset:
+        scaled[:, SCALED_FIELDS.index("steering")] += steering_offset
+    return scaled.view(SCALED_DTYPE).reshape(len(samples))
@@ -0,0 +1,180 @@
+# Copyright (C) 2023, NG:ITL
+import bisect
+
+from typing import Optional, cast
+
+from PySide6.QtCore import QAbstractListModel, QByteArray, QModelIndex, QSortFilterProxyModel, Qt
+
+from control_panel_backend.driver_index import driver_id
+
+DRIVER_ID_ROLE = Qt.ItemDataRole.UserRole + 1
+DRIVER_NAME_ROLE = Qt.ItemDataRole.UserRole + 2
+DRIVER_EMAIL_ROLE = Qt.ItemDataRole.UserRole + 3
+DRIVER_CREATED_ROLE = Qt.ItemDataRole.UserRole + 4
+# "id" is reserved in QML, the id role is driverId
+DRIVER_ROLES = {
+    DRIVER_ID_ROLE: ("driverId", "id"),
+    DRIVER_NAME_ROLE: ("name", "name"),
+    DRIVER_EMAIL_ROLE: ("email", "email"),
+    DRIVER_CREATED_ROLE: ("created", "created"),
+}
+
+
+def sort_key(driver: dict) -> tuple:
+    return driver.get("created", ""), driver_id(driver)
+
+
+class DriverListModel(QAbstractListModel):
+    """
+    The drivers for QML, the newest first.
+
+    The drivers are kept in ascending order of their sort keys, row 0 is the last one, so a new
+    driver is placed with a binary search and inserted as a single row. Updating a driver only
+    changes its row, or moves it if its created time changed.
+
+    Args:
+    drivers (list): The initial drivers, in any order.
+    """
+
+    def __init__(self, drivers=()) -> None:
+        super().__init__()
+        self.__keys: list = []
+        self.__drivers: list = []
+        self.__by_id: dict = {}
+        self._load(drivers)
+
+    def _load(self, drivers) -> None:
+        by_id = {driver_id(driver): driver for driver in drivers}
+        self.__drivers = sorted(by_id.values(), key=sort_key)
+        self.__keys = [sort_key(driver) for driver in self.__drivers]
+        self.__by_id = by_id
+
+    def _row(self, position: int) -> int:
+        return len(self.__drivers) - 1 - position
+
+    def roleNames(self) -> dict:
+        return {role: QByteArray(name.encode()) for role, (name, _) in DRIVER_ROLES.items()}
+
+    def rowCount(self, parent=QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self.__drivers)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or not 0 <= index.row() < len(self.__drivers):
+            return None
+        driver = self.__drivers[self._row(index.row())]
+        if role == Qt.DisplayRole:
+            role = DRIVER_NAME_ROLE
+        if role in DRIVER_ROLES:
+            return driver.get(DRIVER_ROLES[role][1], "")
+        return None
+
+    def driver(self, row: int) -> dict:
+        return self.__drivers[self._row(row)]
+
+    def drivers(self) -> list:
+        """Returns the drivers, the newest first."""
+        return self.__drivers[::-1]
+
+    def get(self, key):
+        return self.__by_id.get(key)
+
+    def __len__(self) -> int:
+        return len(self.__drivers)
+
+    def has_drivers(self, drivers) -> bool:
+        """Returns if drivers are the drivers of the model, in any order."""
+        return {driver_id(driver): driver for driver in drivers} == self.__by_id
+
+    def row_of(self, key) -> int:
+        """Returns the row of a driver, -1 if there is none with the id."""
+        driver = self.__by_id.get(key)
+        if driver is None:
+            return -1
+        return self._row(bisect.bisect_left(self.__keys, sort_key(driver)))
+
+    def set_drivers(self, drivers) -> None:
+        """Replaces all drivers, e.g. after a full refresh, this resets the model."""
+        self.beginResetModel()
+        self._load(drivers)
+        self.endResetModel()
+
+    def upsert(self, driver: dict) -> None:
+        """Inserts a driver at its row or updates the one with its id."""
+        key = driver_id(driver)
+        old = self.__by_id.get(key)
+        if old is not None and sort_key(old) == sort_key(driver):
+            position = bisect.bisect_left(self.__keys, sort_key(old))
+            self.__drivers[position] = driver
+            self.__by_id[key] = driver
+            index = self.index(self._row(position))
+            self.dataChanged.emit(index, index)
+            return
+
+        if old is not None:
+            self.remove(key)
+        position = bisect.bisect_left(self.__keys, sort_key(driver))
+        # the row after the insert, counted from the end like all rows
+        row = len(self.__drivers) - position
+        self.beginInsertRows(QModelIndex(), row, row)
+        self.__keys.insert(position, sort_key(driver))
+        self.__drivers.insert(position, driver)
+        self.__by_id[key] = driver
+        self.endInsertRows()
+
+    def remove(self, key) -> None:
+        driver = self.__by_id.get(key)
+        if driver is None:
+            return
+        position = bisect.bisect_left(self.__keys, sort_key(driver))
+        row = self._row(position)
+        self.beginRemoveRows(QModelIndex(), row, row)
+        del self.__keys[position]
+        del self.__drivers[position]
+        del self.__by_id[key]
+        self.endRemoveRows()
+
+
+class DriverFilterModel(QSortFilterProxyModel):
+    """
+    Shows the drivers of a DriverListModel that match a search, in the order of their rank.
+
+    Without a ranking every driver is shown in the order of the source model. Rows inserted into
+    or removed from the source are forwarded as single rows, the ranking only filters and sorts.
+    """
+
+    def __init__(self, source: DriverListModel) -> None:
+        super().__init__()
+        self.__ranks: Optional[dict] = None
+        self.setSourceModel(source)
+        self.setDynamicSortFilter(True)
+
+    def set_ranking(self, ranks) -> None:
+        """
+        Args:
+        ranks (dict): Rank by driver id of the drivers to show, 0 first, or None to show all.
+        """
+        self.__ranks = ranks
+        self.invalidate()
+        # unsorted the proxy keeps the source order without comparing the rows
+        self.sort(-1 if ranks is None else 0)
+
+    def driver_model(self) -> DriverListModel:
+        return cast(DriverListModel, self.sourceModel())
+
+    def filterAcceptsRow(self, source_row: int, source_parent) -> bool:
+        if self.__ranks is None:
+            return True
+        return driver_id(self.driver_model().driver(source_row)) in self.__ranks
+
+    def lessThan(self, left, right) -> bool:
+        source = self.driver_model()
+        left_rank = self.__ranks.get(driver_id(source.driver(left.row())), 0) if self.__ranks else 0
+        right_rank = self.__ranks.get(driver_id(source.driver(right.row())), 0) if self.__ranks else 0
+        if left_rank != right_rank:
+            return left_rank < right_rank
+        return left.row() < right.row()
+
+    def drivers(self) -> list:
+        """Returns the shown drivers in their order."""
+        source = self.driver_model()
+        return [source.driver(self.mapToSource(self.index(row, 0)).row()) for row in range(self.rowCount())]
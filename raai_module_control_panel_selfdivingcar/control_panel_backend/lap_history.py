@@ -0,0 +1,299 @@
+# Copyright (C) 2023, NG:ITL
+"""
+Keeps the laps timed by the panel per driver and shows the current driver's laps in QML.
+
+Every driver has a LapHistory, a ring of the last LAP_HISTORY_CAPACITY laps. Best lap, last lap,
+rolling average and delta-to-best are kept up to date with every lap, so none of them scans the
+history, also not after thousands of laps on an event day.
+"""
+from PySide6.QtCore import QAbstractListModel, QByteArray, QModelIndex, Qt, Signal, Property
+
+from control_panel_backend.timer_model import format_time
+
+LAP_HISTORY_CAPACITY = 1000
+LAP_AVERAGE_WINDOW = 5
+
+LAP_NUMBER_ROLE = Qt.ItemDataRole.UserRole + 1
+LAP_TIME_ROLE = Qt.ItemDataRole.UserRole + 2
+LAP_DELTA_ROLE = Qt.ItemDataRole.UserRole + 3
+LAP_BEST_ROLE = Qt.ItemDataRole.UserRole + 4
+
+
+def format_lap(lap_ns) -> str:
+    """Formats a lap time like the panel's timer, an empty string for None."""
+    if lap_ns is None:
+        return ""
+    lap_ms = int(lap_ns) // (1000 * 1000)
+    return format_time(lap_ms // (1000 * 60 * 60), (lap_ms // (1000 * 60)) % 60, (lap_ms // 1000) % 60, lap_ms % 1000)
+
+
+def format_delta(delta_ns) -> str:
+    """Formats a delta-to-best as signed seconds, e.g. "+1.204", an empty string for None."""
+    if delta_ns is None:
+        return ""
+    sign = "-" if delta_ns < 0 else "+"
+    delta_ms = abs(int(delta_ns)) // (1000 * 1000)
+    return f"{sign}{delta_ms // 1000}.{delta_ms % 1000:03d}"
+
+
+class Lap:
+    __slots__ = ("number", "lap_ns", "delta_ns")
+
+    def __init__(self, number: int, lap_ns: int, delta_ns) -> None:
+        self.number = number
+        self.lap_ns = lap_ns
+        # to the best lap before this one, None for a driver's first lap
+        self.delta_ns = delta_ns
+
+
+class LapHistory:
+    """
+    The last laps of one driver.
+
+    The laps are stored in a fixed size ring, the oldest is dropped once it is full. The best lap
+    of the ring is the front of a deque of laps ascending in time, a lap that is beaten by a later
+    one can never become the best again and is dropped from it, so adding a lap is amortized O(1).
+    The average of the last average_window laps is a running sum.
+
+    Args:
+    capacity (int): Laps kept, older ones are dropped.
+    average_window (int): Laps the rolling average is taken over.
+    """
+
+    def __init__(self, capacity: int = LAP_HISTORY_CAPACITY, average_window: int = LAP_AVERAGE_WINDOW) -> None:
+        self.capacity = capacity
+        self.average_window = max(1, min(average_window, capacity))
+        self._ring: list = [None] * capacity
+        self._start = 0
+        self._count = 0
+        self._laps_total = 0
+        self._best: list = []
+        self._best_start = 0
+        self._window_sum = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    def lap(self, age: int) -> Lap:
+        """Returns a lap by age, 0 is the last lap."""
+        if not 0 <= age < self._count:
+            raise IndexError(age)
+        return self._ring[(self._start + self._count - 1 - age) % self.capacity]
+
+    def age_of(self, number: int) -> int:
+        """Returns the age of a lap by its number, -1 if it was dropped or doesn't exist yet."""
+        age = self._laps_total - number
+        return age if 0 <= age < self._count else -1
+
+    def drop_oldest(self):
+        """Drops the oldest lap and returns it, None if there are no laps."""
+        if not self._count:
+            return None
+        dropped = self._ring[self._start]
+        self._ring[self._start] = None
+        if self._count <= self.average_window:
+            self._window_sum -= dropped.lap_ns
+        self._start = (self._start + 1) % self.capacity
+        self._count -= 1
+        if self._best[self._best_start] is dropped:
+            self._best_start += 1
+        return dropped
+
+    def add(self, lap_ns: int):
+        """
+        Adds a lap, the oldest one is dropped if the ring is full.
+
+        Returns:
+        tuple: The new Lap and the dropped one, None if the ring wasn't full.
+        """
+        dropped = self.drop_oldest() if self._count == self.capacity else None
+
+        best = self.best()
+        self._laps_total += 1
+        lap = Lap(self._laps_total, lap_ns, lap_ns - best.lap_ns if best is not None else None)
+        self._ring[(self._start + self._count) % self.capacity] = lap
+        self._count += 1
+
+        # an equal later lap doesn't replace the best, the first one to set a time keeps it
+        while len(self._best) > self._best_start and self._best[-1].lap_ns > lap_ns:
+            self._best.pop()
+        self._best.append(lap)
+        if self._best_start > self.capacity:
+            # compacts the consumed front, at most once per capacity laps
+            del self._best[: self._best_start]
+            self._best_start = 0
+
+        self._window_sum += lap_ns
+        if self._count > self.average_window:
+            self._window_sum -= self.lap(self.average_window).lap_ns
+        return lap, dropped
+
+    def best(self):
+        return self._best[self._best_start] if self._count else None
+
+    def last(self):
+        return self.lap(0) if self._count else None
+
+    def average_ns(self):
+        """The average of the last average_window laps, or of all laps while there are fewer."""
+        if not self._count:
+            return None
+        return self._window_sum // min(self._count, self.average_window)
+
+    def delta_ns(self):
+        """The last lap's delta to the best lap before it."""
+        return self.lap(0).delta_ns if self._count else None
+
+    def clear(self) -> None:
+        self._ring = [None] * self.capacity
+        self._start = 0
+        self._count = 0
+        self._laps_total = 0
+        self._best = []
+        self._best_start = 0
+        self._window_sum = 0
+
+
+class LapListModel(QAbstractListModel):
+    """
+    The laps of the current driver for QML, the last lap first.
+
+    A new lap inserts one row and a dropped lap removes one, only the rows whose best flag changed
+    are updated, so a ListView never rebuilds its delegates for a lap. Selecting another driver
+    resets the model.
+
+    Args:
+    capacity (int): Laps kept per driver.
+    average_window (int): Laps the rolling average is taken over.
+    """
+
+    driverChanged = Signal()
+    statsChanged = Signal()
+    # object, lap times in ns overflow an int signal argument after 2 s
+    lapAdded = Signal(object)
+    cleared = Signal()
+
+    def __init__(self, capacity: int = LAP_HISTORY_CAPACITY, average_window: int = LAP_AVERAGE_WINDOW) -> None:
+        super().__init__()
+        self.capacity = capacity
+        self.average_window = average_window
+        self.__histories: dict = {}
+        self.__driver = ""
+        self.__history = self.history("")
+
+    def history(self, driver: str) -> LapHistory:
+        if driver not in self.__histories:
+            self.__histories[driver] = LapHistory(self.capacity, self.average_window)
+        return self.__histories[driver]
+
+    def roleNames(self) -> dict:
+        return {
+            LAP_NUMBER_ROLE: QByteArray(b"lapNumber"),
+            LAP_TIME_ROLE: QByteArray(b"lapTime"),
+            LAP_DELTA_ROLE: QByteArray(b"delta"),
+            LAP_BEST_ROLE: QByteArray(b"isBest"),
+        }
+
+    def rowCount(self, parent=QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self.__history)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or not 0 <= index.row() < len(self.__history):
+            return None
+        lap = self.__history.lap(index.row())
+        if role == LAP_NUMBER_ROLE:
+            return lap.number
+        if role in (LAP_TIME_ROLE, Qt.DisplayRole):
+            return format_lap(lap.lap_ns)
+        if role == LAP_DELTA_ROLE:
+            return format_delta(lap.delta_ns)
+        if role == LAP_BEST_ROLE:
+            return lap is self.__history.best()
+        return None
+
+    def add_lap(self, lap_ns: int) -> None:
+        """Adds a lap of the current driver."""
+        history = self.__history
+        previous_best = history.best()
+
+        if len(history) == history.capacity:
+            # the rows are updated in two steps, Qt doesn't allow a remove inside an insert
+            self.beginRemoveRows(QModelIndex(), len(history) - 1, len(history) - 1)
+            history.drop_oldest()
+            self.endRemoveRows()
+        self.beginInsertRows(QModelIndex(), 0, 0)
+        history.add(lap_ns)
+        self.endInsertRows()
+
+        best = history.best()
+        if previous_best is not None and best is not previous_best:
+            for lap in (previous_best, best):
+                age = history.age_of(lap.number)
+                if age >= 0:
+                    index = self.index(age)
+                    self.dataChanged.emit(index, index, [LAP_BEST_ROLE])
+        self.statsChanged.emit()
+        self.lapAdded.emit(lap_ns)
+
+    def clear(self) -> None:
+        """Drops the laps of the current driver."""
+        self.beginResetModel()
+        self.__history.clear()
+        self.endResetModel()
+        self.statsChanged.emit()
+        self.cleared.emit()
+
+    def lap_times(self) -> list:
+        """Returns the lap times of the current driver in ns, the oldest first."""
+        return [self.__history.lap(age).lap_ns for age in range(len(self.__history) - 1, -1, -1)]
+
+    def set_laps(self, driver: str, laps: list) -> None:
+        """Replaces the laps of a driver and selects it, e.g. with the lap_times of another model."""
+        self.beginResetModel()
+        driver_changed = self.__driver != driver
+        self.__driver = driver
+        self.__history = self.history(driver)
+        self.__history.clear()
+        for lap_ns in laps:
+            self.__history.add(lap_ns)
+        self.endResetModel()
+        if driver_changed:
+            self.driverChanged.emit()
+        self.statsChanged.emit()
+
+    def get_driver(self) -> str:
+        return self.__driver
+
+    def set_driver(self, driver: str) -> None:
+        if self.__driver == driver:
+            return
+        self.beginResetModel()
+        self.__driver = driver
+        self.__history = self.history(driver)
+        self.endResetModel()
+        self.driverChanged.emit()
+        self.statsChanged.emit()
+
+    def get_lap_count(self) -> int:
+        return len(self.__history)
+
+    def get_best_lap(self) -> str:
+        best = self.__history.best()
+        return format_lap(best.lap_ns if best is not None else None)
+
+    def get_last_lap(self) -> str:
+        last = self.__history.last()
+        return format_lap(last.lap_ns if last is not None else None)
+
+    def get_average_lap(self) -> str:
+        return format_lap(self.__history.average_ns())
+
+    def get_last_delta(self) -> str:
+        return format_delta(self.__history.delta_ns())
+
+    driver = Property(str, get_driver, set_driver, notify=driverChanged)  # type: ignore
+    lap_count = Property(int, get_lap_count, notify=statsChanged)  # type: ignore
+    best_lap = Property(str, get_best_lap, notify=statsChanged)  # type: ignore
+    last_lap = Property(str, get_last_lap, notify=statsChanged)  # type: ignore
+    average_lap = Property(str, get_average_lap, notify=statsChanged)  # type: ignore
+    last_delta = Property(str, get_last_delta, notify=statsChanged)  # type: ignore
@@ -0,0 +1,117 @@
+# Copyright (C) 2023, NG:ITL
+import time
+
+from enum import IntEnum
+
+from PySide6.QtCore import QCoreApplication, QObject, QTimer, Qt, Signal
+
+from control_panel_backend.timer_model import Timer
+
+# used when there is no screen to take the refresh rate from, e.g. headless
+LAP_TIMER_DEFAULT_REFRESH_HZ = 60.0
+
+
+class TimerStates(IntEnum):
+    RESET = 0
+    RUNNING = 1
+    PAUSED = 2
+    STOPPED = 3
+
+
+def display_refresh_hz() -> float:
+    """Returns the refresh rate of the primary screen, or LAP_TIMER_DEFAULT_REFRESH_HZ without one."""
+    app = QCoreApplication.instance()
+    if app is None or not app.inherits("QGuiApplication"):
+        return LAP_TIMER_DEFAULT_REFRESH_HZ
+    # only imported with a UI, importing it here would load QtGui in headless runs too
+    from PySide6.QtGui import QGuiApplication
+
+    screen = QGuiApplication.primaryScreen()
+    if screen is not None and screen.refreshRate() > 0:
+        return screen.refreshRate()
+    return LAP_TIMER_DEFAULT_REFRESH_HZ
+
+
+class LapTimer(QObject):
+    """
+    Measures the running time of the panel's timer and shows it in a Timer model.
+
+    The elapsed time is kept as time.monotonic_ns based start and accumulated values, so it is
+    immune to wall clock changes and doesn't need a tick to advance. The Timer model is only updated
+    once per frame while running, at refresh_hz or the screen's refresh rate if refresh_hz is 0.
+
+    Args:
+    t_model (Timer): The model the QML shows the time from.
+    refresh_hz (float): Display updates per second while running, 0 for the screen's refresh rate.
+    """
+
+    # the time of a run that was stopped and not ignored in ns, object as an int would overflow
+    lap_completed = Signal(object)
+
+    def __init__(self, t_model: Timer, refresh_hz: float = 0) -> None:
+        QObject.__init__(self)
+        self._t_model = t_model
+        self._state = TimerStates.RESET
+        self._started_ns = 0
+        self._accumulated_ns = 0
+        self._ignore_lap = False
+
+        self.refresh_hz = refresh_hz or display_refresh_hz()
+        self._frame_timer = QTimer(self)
+        self._frame_timer.setTimerType(Qt.TimerType.PreciseTimer)
+        self._frame_timer.setInterval(max(1, round(1000 / self.refresh_hz)))
+        self._frame_timer.timeout.connect(self.update_display)  # type: ignore
+
+    def get_state(self) -> TimerStates:
+        return self._state
+
+    def elapsed_ns(self) -> int:
+        if self._state == TimerStates.RUNNING:
+            return self._accumulated_ns + time.monotonic_ns() - self._started_ns
+        return self._accumulated_ns
+
+    def update_display(self) -> None:
+        self._t_model.set_timestamp(self.elapsed_ns())
+
+    def start(self) -> None:
+        if self._state == TimerStates.RUNNING:
+            return
+        if self._state in (TimerStates.RESET, TimerStates.STOPPED):
+            self._accumulated_ns = 0
+            self._ignore_lap = False
+
+        self._started_ns = time.monotonic_ns()
+        self._state = TimerStates.RUNNING
+        self._frame_timer.start()
+        self.update_display()
+
+    def _halt(self, state: TimerStates) -> None:
+        self._accumulated_ns = self.elapsed_ns()
+        self._state = state
+        self._frame_timer.stop()
+        self.update_display()
+
+    def pause(self) -> None:
+        """Pauses a running timer, resumes a paused one."""
+        if self._state == TimerStates.PAUSED:
+            self.start()
+        elif self._state == TimerStates.RUNNING:
+            self._halt(TimerStates.PAUSED)
+
+    def stop(self) -> None:
+        """Stops the timer, the time stays visible until the next start begins from zero."""
+        if self._state in (TimerStates.RUNNING, TimerStates.PAUSED):
+            self._halt(TimerStates.STOPPED)
+            if not self._ignore_lap and self._accumulated_ns > 0:
+                self.lap_completed.emit(self._accumulated_ns)
+
+    def ignore_lap(self) -> None:
+        """The running lap isn't completed when the timer is stopped."""
+        if self._state in (TimerStates.RUNNING, TimerStates.PAUSED):
+            self._ignore_lap = True
+
+    def reset(self) -> None:
+        self._state = TimerStates.RESET
+        self._accumulated_ns = 0
+        self._frame_timer.stop()
+        self.update_display()
@@ -0,0 +1,283 @@
+# Copyright (C) 2023, NG:ITL
+"""
+Opt-in latency tracing of the driver input path.
+
+A trace starts when handle_driver_input receives a batch of driver input and every later stage
+(the scaled values reaching the model) is stamped with time.monotonic_ns, once per trace. The stamps
+go into a fixed size ring buffer and the time since the start of the trace into a histogram per
+stage. The sizes of the received batches have a histogram of their own.
+
+Driver input doesn't cause a publish on the control panel socket, the config goes out on changes
+and keep-alives only, so there is no send stage, it would time unrelated messages.
+
+Tracing is off unless enable_tracing is called. The instrumented functions only check
+"if latency_tracer.TRACER is not None", nothing else runs while it is off.
+
+A running control panel answers requests on its introspection address:
+    {"command": "stats"}                  histograms of every stage
+    {"command": "dump", "path": "x.json"} writes the histograms and the ring buffer to a file
+    {"command": "reset"}                  clears everything recorded so far
+
+The same requests can be sent from a shell:
+    python -m control_panel_backend.latency_tracer stats
+    python -m control_panel_backend.latency_tracer dump latency.json
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import pynng
+
+from array import array
+
+from PySide6.QtCore import QObject, QSocketNotifier
+
+LATENCY_TRACER_PYNNG_ADDRESS = "ipc:///tmp/RAAI/control_panel_latency.ipc"
+LATENCY_TRACER_CAPACITY = 4096
+
+STAGE_DRIVER_INPUT = 0
+STAGE_MODEL_SET_ALL = 1
+STAGE_NAMES = ("driver_input", "model_set_all")
+
+# the instrumented code checks this, it is only set while tracing is enabled
+TRACER = None
+
+
+class LatencyHistogram:
+    """
+    Log-linear histogram in the style of HdrHistogram.
+
+    Values below 2 ** sub_bucket_bits are counted exactly, larger values in buckets whose width
+    grows with the magnitude, so every recorded value keeps a relative precision of
+    2 ** -(sub_bucket_bits - 1), with 7 bits better than 1.6 %.
+    """
+
+    def __init__(self, sub_bucket_bits: int = 7) -> None:
+        self._sub_bucket_bits = sub_bucket_bits
+        self._counts: dict[int, int] = {}
+        self.count = 0
+        self.min = 0
+        self.max = 0
+        self.total = 0
+
+    def _index(self, value: int) -> int:
+        shift = value.bit_length() - self._sub_bucket_bits
+        if shift <= 0:
+            return value
+        return (shift << self._sub_bucket_bits) + (value >> shift)
+
+    def _value(self, index: int) -> int:
+        shift = index >> self._sub_bucket_bits
+        if shift == 0:
+            return index
+        return (index & ((1 << self._sub_bucket_bits) - 1)) << shift
+
+    def record(self, value: int) -> None:
+        if value < 0:
+            value = 0
+        index = self._index(value)
+        self._counts[index] = self._counts.get(index, 0) + 1
+        if self.count == 0 or value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+        self.count += 1
+        self.total += value
+
+    def percentile(self, p: float) -> int:
+        """Returns the lower bound of the bucket holding the p-th percentile."""
+        if self.count == 0:
+            return 0
+        rank = max(1, int(p / 100 * self.count + 0.5))
+        seen = 0
+        for index in sorted(self._counts):
+            seen += self._counts[index]
+            if seen >= rank:
+                return self._value(index)
+        return self.max
+
+    def summary(self) -> dict:
+        """The percentiles of recorded latencies, see summary_values for other values."""
+        return {
+            "count": self.count,
+            "min_ns": self.min,
+            "mean_ns": self.total / self.count if self.count else 0,
+            "p50_ns": self.percentile(50),
+            "p99_ns": self.percentile(99),
+            "p99.9_ns": self.percentile(99.9),
+            "max_ns": self.max,
+        }
+
+    def summary_values(self) -> dict:
+        return {
+            "count": self.count,
+            "min": self.min,
+            "mean": self.total / self.count if self.count else 0,
+            "p50": self.percentile(50),
+            "p99": self.percentile(99),
+            "max": self.max,
+        }
+
+
+class LatencyTracer:
+    """
+    Records the stages of driver input traces.
+
+    Only the GUI thread writes, the ring buffer is a set of preallocated arrays indexed by an
+    ever growing counter, so recording never takes a lock or allocates.
+    """
+
+    def __init__(self, capacity: int = LATENCY_TRACER_CAPACITY) -> None:
+        self.capacity = capacity
+        self._trace_ids = array("q", bytes(8 * capacity))
+        self._stages = array("q", bytes(8 * capacity))
+        self._timestamps = array("q", bytes(8 * capacity))
+        self._next = 0
+
+        # latency since receipt per stage, the driver_input stage starts the trace and has none
+        self._histograms = [LatencyHistogram() for _ in STAGE_NAMES]
+        self._batch_sizes = LatencyHistogram()
+        self._trace_id = 0
+        self._trace_start_ns = 0
+        # bit per stage already stamped in the current trace
+        self._marked = 0
+
+    def _append(self, stage: int, timestamp_ns: int) -> None:
+        slot = self._next % self.capacity
+        self._trace_ids[slot] = self._trace_id
+        self._stages[slot] = stage
+        self._timestamps[slot] = timestamp_ns
+        self._next += 1
+
+    def begin(self, batch_size: int = 1) -> None:
+        """Starts a trace, called when a batch of driver input arrives."""
+        now = time.monotonic_ns()
+        self._trace_id += 1
+        self._trace_start_ns = now
+        self._marked = 1 << STAGE_DRIVER_INPUT
+        self._append(STAGE_DRIVER_INPUT, now)
+        self._batch_sizes.record(batch_size)
+
+    def mark(self, stage: int) -> None:
+        """Stamps stage of the current trace, only the first time it is reached in the trace."""
+        if self._trace_id == 0 or self._marked & (1 << stage):
+            return
+        self._marked |= 1 << stage
+
+        now = time.monotonic_ns()
+        self._append(stage, now)
+        self._histograms[stage].record(now - self._trace_start_ns)
+
+    def reset(self) -> None:
+        self._next = 0
+        self._histograms = [LatencyHistogram() for _ in STAGE_NAMES]
+        self._batch_sizes = LatencyHistogram()
+
+    def stats(self) -> dict:
+        stats: dict = {
+            name: histogram.summary()
+            for stage, (name, histogram) in enumerate(zip(STAGE_NAMES, self._histograms))
+            if stage != STAGE_DRIVER_INPUT
+        }
+        stats["batch_size"] = self._batch_sizes.summary_values()
+        stats["traces"] = self._trace_id
+        return stats
+
+    def events(self) -> list:
+        """Returns the events still held by the ring buffer, oldest first."""
+        first = max(0, self._next - self.capacity)
+        events = []
+        for i in range(first, self._next):
+            slot = i % self.capacity
+            events.append((self._trace_ids[slot], STAGE_NAMES[self._stages[slot]], self._timestamps[slot]))
+        return events
+
+    def dump(self, path: str) -> None:
+        with open(path, "w") as file:
+            json.dump({"stats": self.stats(), "events": self.events()}, file, indent=2)
+
+
+class LatencyIntrospection(QObject):
+    """Answers stats, dump and reset requests for a tracer on a Rep socket, in the GUI thread."""
+
+    def __init__(self, tracer: LatencyTracer, address: str = LATENCY_TRACER_PYNNG_ADDRESS) -> None:
+        QObject.__init__(self)
+        self._tracer = tracer
+        self._rep = pynng.Rep0()
+        self._rep.listen(address)
+        self._notifier = QSocketNotifier(self._rep.recv_fd, QSocketNotifier.Type.Read)
+        self._notifier.activated.connect(self.handle_requests)  # type: ignore
+
+    def handle_requests(self) -> None:
+        while True:
+            try:
+                request = json.loads(self._rep.recv(block=False))
+            except pynng.TryAgain:
+                return
+            except json.JSONDecodeError:
+                request = {}
+
+            self._rep.send(json.dumps(self.handle_request(request)).encode())
+
+    def handle_request(self, request: dict) -> dict:
+        command = request.get("command")
+        if command == "stats":
+            return self._tracer.stats()
+        if command == "dump":
+            try:
+                self._tracer.dump(request["path"])
+            except (KeyError, OSError) as e:
+                return {"error": f"dump failed: {e}"}
+            return {"path": request["path"]}
+        if command == "reset":
+            self._tracer.reset()
+            return {}
+        return {"error": f"unknown command {command}"}
+
+    def close(self) -> None:
+        self._notifier.setEnabled(False)
+        self._rep.close()
+
+
+def enable_tracing(capacity: int = LATENCY_TRACER_CAPACITY) -> LatencyTracer:
+    global TRACER
+    TRACER = LatencyTracer(capacity)
+    return TRACER
+
+
+def disable_tracing() -> None:
+    global TRACER
+    TRACER = None
+
+
+def request(command: dict, address: str = LATENCY_TRACER_PYNNG_ADDRESS, timeout_ms: int = 2000) -> dict:
+    with pynng.Req0(recv_timeout=timeout_ms, send_timeout=timeout_ms) as req:
+        req.dial(address, block=True)
+        req.send(json.dumps(command).encode())
+        return json.loads(req.recv())
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Query the latency tracer of a running control panel")
+    parser.add_argument("command", choices=("stats", "dump", "reset"))
+    parser.add_argument("path", nargs="?", help="file the control panel writes the dump to")
+    parser.add_argument("--address", default=LATENCY_TRACER_PYNNG_ADDRESS)
+    args = parser.parse_args()
+
+    command: dict = {"command": args.command}
+    if args.command == "dump":
+        if not args.path:
+            parser.error("dump needs a path")
+        # the control panel writes the file, its working directory may differ
+        command["path"] = os.path.abspath(args.path)
+
+    try:
+        reply = request(command, args.address)
+    except pynng.NNGException as e:
+        sys.exit(f"control panel not reachable on {args.address}: {e}")
+    print(json.dumps(reply, indent=2))
+
+
+if __name__ == "__main__":
+    main()
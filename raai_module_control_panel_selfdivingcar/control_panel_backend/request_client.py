@@ -0,0 +1,99 @@
+# Copyright (C) 2023, NG:ITL
+import pynng
+
+from PySide6.QtCore import QObject, Signal
+
+from control_panel_backend.command_worker import CommandWorker
+
+REQUEST_TIMEOUT_MS = 2000
+REQUEST_RETRIES = 2
+
+
+class RequestTimeout(Exception):
+    pass
+
+
+class RequestClient(QObject):
+    """
+    Sends requests over a pynng Req socket without blocking the GUI thread.
+
+    The requests are sent one after another on a CommandWorker thread, every attempt waits at most
+    timeout_ms for the reply and a request is tried 1 + retries times, only retry requests that can
+    safely run twice, a timed out attempt may still have been executed. A request that is already
+    queued or in flight isn't sent again, the reply is only handled by the callbacks of the first
+    one. The callbacks are called in the thread the client lives in, usually the GUI thread.
+
+    Args:
+    address (str): The address of the Rep socket.
+    timeout_ms (int): How long an attempt waits for the reply.
+    retries (int): Attempts after the first one before a request fails.
+    """
+
+    replied = Signal(str, str)
+    failed = Signal(str, str)
+
+    def __init__(
+        self, address: str, timeout_ms: int = REQUEST_TIMEOUT_MS, retries: int = REQUEST_RETRIES, name="requests"
+    ) -> None:
+        QObject.__init__(self)
+        self.timeout_ms = timeout_ms
+        self.retries = retries
+        # redials every 100 ms instead of nng's 1 s, a service that comes up is used by the next attempt
+        self._req = pynng.Req0(send_timeout=timeout_ms, recv_timeout=timeout_ms, reconnect_time_min=100)
+        self._req.dial(address, block=False)
+
+        self._pending: dict = {}
+        self._worker = CommandWorker(name)
+        self._worker.command_finished.connect(self._finished)
+        self._worker.command_failed.connect(self._failed)
+
+    def request(self, message: str, on_reply=None, on_error=None, retries=None) -> bool:
+        """
+        Queues a request, this never blocks.
+
+        Args:
+        message (str): The request, also the key it is de-duplicated by.
+        on_reply (callable): Called with the reply as str.
+        on_error (callable): Called with the error as str after the last attempt failed.
+        retries (int): Overrides the client's retries, 0 for a request that must not be sent twice.
+
+        Returns:
+        bool: False if the same request was already pending, on_reply and on_error are not used then.
+        """
+        if message in self._pending:
+            return False
+
+        self._pending[message] = (on_reply, on_error)
+        self._worker.submit(message, self._send, message, self.retries if retries is None else retries)
+        return True
+
+    def is_pending(self, message: str) -> bool:
+        return message in self._pending
+
+    def _send(self, message: str, retries: int) -> str:
+        # runs on the worker thread, the socket isn't touched anywhere else after the dial
+        for attempt in range(1 + retries):
+            try:
+                # a new send abandons the previous attempt, a late reply to it is dropped by nng
+                self._req.send(message.encode("utf-8"))
+                return self._req.recv().decode("utf-8")
+            except pynng.Timeout:
+                print(f"Request {message!r} timed out, attempt {attempt + 1} of {1 + retries}")
+        raise RequestTimeout(f"no reply within {self.timeout_ms} ms")
+
+    def _finished(self, message: str, reply: str) -> None:
+        on_reply, _ = self._pending.pop(message, (None, None))
+        if on_reply is not None:
+            on_reply(reply)
+        self.replied.emit(message, reply)
+
+    def _failed(self, message: str, error: str) -> None:
+        _, on_error = self._pending.pop(message, (None, None))
+        if on_error is not None:
+            on_error(error)
+        self.failed.emit(message, error)
+
+    def close(self, timeout: float | None = None) -> None:
+        """Closes the socket, which fails the queued and in flight requests, and stops the worker."""
+        self._req.close()
+        self._worker.stop(timeout)
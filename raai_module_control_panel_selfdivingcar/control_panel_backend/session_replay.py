@@ -0,0 +1,301 @@
+# Copyright (C) 2023, NG:ITL
+"""
+Replays a recorded telemetry session through ControlPanel.handle_driver_input_batch.
+
+The samples are fed in the batches they were received in, at their original inter-arrival times
+divided by speed, speed 0 replays as fast as possible. Recorded configs are applied to the model
+at their point in the session, so the samples are scaled with the max values of the recording.
+The same session always produces the same sequence of batches, independent of the speed.
+
+While a replay runs the panel doesn't publish its config, so the replayed configs never reach the
+car, and a running telemetry recording is paused, so the replay isn't recorded again. The config
+of the panel is restored when the replay ends.
+
+python -m control_panel_backend.session_replay telemetry <session> --speed 0 replays a session
+without platform or car and prints how fast the panel processed it. With --scaled the session isn't
+replayed, every recorded sample is scaled with scale_recorded_driver_input and saved for analysis.
+"""
+import time
+import argparse
+import numpy as np
+
+from PySide6.QtCore import QObject, QTimer, Qt, Signal
+
+from control_panel_backend.driver_input_scaling import DRIVER_INPUT_DTYPE, SCALED_DTYPE, scale_driver_input
+from control_panel_backend.telemetry_recorder import (
+    DRIVER_INPUT_FLAG_IN_BATCH,
+    RECORD_DTYPE,
+    TELEMETRY_DIRECTORY,
+    TOPIC_CONFIG,
+    TOPIC_DRIVER_INPUT,
+    load_session,
+    list_sessions,
+)
+from control_panel_backend.wire_format import (
+    DRIVER_INPUT_FIELDS,
+    CONFIG_FIELDS_PEDALS_ACTIVE,
+    CONFIG_FIELDS_PEDALS_INACTIVE,
+    CONFIG_FLAG_PEDALS_ACTIVE,
+)
+
+# batches processed between returns to the event loop when replaying as fast as possible
+REPLAY_CHUNK_SIZE = 1000
+
+# the model values a recorded config sets, restored after the replay
+REPLAYED_CONFIG_PROPERTIES = (
+    "pedal_status",
+    "max_throttle",
+    "max_brake",
+    "max_clutch",
+    "max_steering",
+    "steering_offset",
+)
+
+# max_throttle, max_brake, max_clutch and max_steering for samples recorded before the first config
+UNSCALED_MAX_VALUES = (100.0, 100.0, 100.0, 100.0)
+
+
+def recorded_config(flags: int, values: np.ndarray) -> dict:
+    """Returns the config payload of a recorded config record."""
+    fields = CONFIG_FIELDS_PEDALS_ACTIVE if flags & CONFIG_FLAG_PEDALS_ACTIVE else CONFIG_FIELDS_PEDALS_INACTIVE
+    return dict(zip(fields, values.tolist()))
+
+
+def build_timeline(records: np.ndarray) -> list:
+    """
+    Groups recorded records into the steps of a replay.
+
+    Returns:
+    list: (timestamp_ns, topic_id, flags, values) tuples, for driver_input values is the list of
+    payloads received together and timestamp_ns the time of the last one, when the batch was
+    drained, for config the payload.
+    """
+    timeline: list = []
+    for timestamp_ns, topic_id, flags, values in zip(
+        records["timestamp_ns"].tolist(), records["topic_id"].tolist(), records["flags"].tolist(), records["values"]
+    ):
+        if topic_id == TOPIC_DRIVER_INPUT:
+            payload = dict(zip(DRIVER_INPUT_FIELDS, values.tolist()))
+            # sessions recorded before DRIVER_INPUT_FLAG_IN_BATCH share one timestamp per batch
+            previous = timeline[-1] if timeline and timeline[-1][1] == TOPIC_DRIVER_INPUT else None
+            if previous is not None and (flags & DRIVER_INPUT_FLAG_IN_BATCH or previous[0] == timestamp_ns):
+                previous[3].append(payload)
+                timeline[-1] = (timestamp_ns, topic_id, previous[2], previous[3])
+            else:
+                timeline.append((timestamp_ns, topic_id, flags, [payload]))
+        elif topic_id == TOPIC_CONFIG:
+            timeline.append((timestamp_ns, topic_id, flags, recorded_config(flags, values)))
+    return timeline
+
+
+def scale_recorded_driver_input(records: np.ndarray, max_values: tuple = UNSCALED_MAX_VALUES) -> np.ndarray:
+    """
+    Scales every recorded driver_input sample with the max values of the config it was received under.
+
+    The samples between two recorded configs are scaled with one scale_driver_input call. Like
+    apply_recorded_config, a config without pedals only changes max_steering. The steering offset
+    isn't added, the panel sends it along in the config.
+
+    Args:
+    records (np.ndarray): Records as returned by load_segment, or the concatenated segments.
+    max_values (tuple): max_throttle, max_brake, max_clutch and max_steering before the first config.
+
+    Returns:
+    np.ndarray: The scaled values with SCALED_DTYPE, one row per recorded sample, coalesced ones included.
+    """
+    is_driver_input = records["topic_id"] == TOPIC_DRIVER_INPUT
+    values = np.ascontiguousarray(records["values"][is_driver_input, : len(DRIVER_INPUT_FIELDS)])
+    samples = values.view(DRIVER_INPUT_DTYPE).reshape(len(values))
+    # the number of samples recorded before each record
+    samples_before = np.cumsum(is_driver_input) - is_driver_input
+
+    scaled = np.empty(len(samples), dtype=SCALED_DTYPE)
+    start = 0
+    for index in np.flatnonzero(records["topic_id"] == TOPIC_CONFIG).tolist():
+        end = int(samples_before[index])
+        scaled[start:end] = scale_driver_input(samples[start:end], *max_values)
+        payload = recorded_config(int(records["flags"][index]), records["values"][index])
+        if "max_throttle" in payload:
+            max_values = tuple(payload[name] for name in ("max_throttle", "max_brake", "max_clutch", "max_steering"))
+        else:
+            max_values = max_values[:3] + (payload["steering"],)
+        start = end
+    scaled[start:] = scale_driver_input(samples[start:], *max_values)
+    return scaled
+
+
+class SessionReplay(QObject):
+    """
+    Drives a ControlPanel from a recorded session.
+
+    Args:
+    control_panel (ControlPanel): The panel the samples are fed into.
+    records (np.ndarray): Records as returned by load_segment, or the concatenated segments.
+    speed (float): 1.0 for real time, 10.0 for ten times faster, 0 for as fast as possible.
+    apply_config (bool): Applies recorded configs to the model before the samples after them.
+    """
+
+    finished = Signal(dict)
+
+    def __init__(self, control_panel, records: np.ndarray, speed: float = 1.0, apply_config: bool = True) -> None:
+        QObject.__init__(self)
+        self._control_panel = control_panel
+        self._timeline = build_timeline(records)
+        self.speed = speed
+        self.apply_config = apply_config
+
+        self._running = False
+        self._index = 0
+        self._start_ns = 0
+        self._samples = 0
+        self._batches = 0
+        self._max_lag_ns = 0
+        self._processing_ns = 0
+        self._saved_config: dict = {}
+
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setTimerType(Qt.TimerType.PreciseTimer)
+        self._timer.timeout.connect(self._step)  # type: ignore
+
+    def start(self) -> None:
+        model = self._control_panel.control_panel_model
+        self._saved_config = {name: getattr(model, "get_" + name)() for name in REPLAYED_CONFIG_PROPERTIES}
+        self._control_panel.set_live_driver_input_enabled(False)
+        self._control_panel.set_config_publishing_enabled(False)
+        self._control_panel.set_telemetry_recording_paused(True)
+        self._running = True
+        self._index = 0
+        self._samples = 0
+        self._batches = 0
+        self._max_lag_ns = 0
+        self._processing_ns = 0
+        self._start_ns = time.monotonic_ns()
+        self._timer.start(0)
+
+    def stop(self) -> None:
+        self._timer.stop()
+        if self._running:
+            self._finish()
+
+    def _due_ns(self, index: int) -> int:
+        return self._start_ns + int((self._timeline[index][0] - self._timeline[0][0]) / self.speed)
+
+    def _step(self) -> None:
+        chunk_end = len(self._timeline)
+        if self.speed <= 0:
+            chunk_end = min(chunk_end, self._index + REPLAY_CHUNK_SIZE)
+
+        while self._index < chunk_end:
+            if self.speed > 0:
+                now = time.monotonic_ns()
+                due = self._due_ns(self._index)
+                if due > now:
+                    self._timer.start((due - now) // 1_000_000)
+                    return
+                self._max_lag_ns = max(self._max_lag_ns, now - due)
+
+            self._replay(self._timeline[self._index])
+            self._index += 1
+
+        if self._index < len(self._timeline):
+            # give the event loop, and with it the UI, a turn between chunks
+            self._timer.start(0)
+        else:
+            self._finish()
+
+    def _replay(self, step: tuple) -> None:
+        _, topic_id, _, values = step
+        if topic_id == TOPIC_CONFIG:
+            if self.apply_config:
+                self.apply_recorded_config(values)
+            return
+
+        t = time.perf_counter_ns()
+        self._control_panel.handle_driver_input_batch(values)
+        self._processing_ns += time.perf_counter_ns() - t
+        self._samples += len(values)
+        self._batches += 1
+
+    def apply_recorded_config(self, payload: dict) -> None:
+        model = self._control_panel.control_panel_model
+        model.set_pedal_status("max_throttle" in payload)
+        if "max_throttle" in payload:
+            model.set_max_throttle(payload["max_throttle"])
+            model.set_max_brake(payload["max_brake"])
+            model.set_max_clutch(payload["max_clutch"])
+            model.set_max_steering(payload["max_steering"])
+        else:
+            model.set_max_steering(payload["steering"])
+        model.set_steering_offset(payload["steering_offset"])
+
+    def get_stats(self) -> dict:
+        wall_s = (time.monotonic_ns() - self._start_ns) / 1e9
+        session_s = (self._timeline[-1][0] - self._timeline[0][0]) / 1e9 if self._timeline else 0.0
+        return {
+            "samples": self._samples,
+            # only the newest sample of a batch is processed, the others are coalesced like live
+            "processed": self._batches,
+            "session_s": session_s,
+            "wall_s": wall_s,
+            "processing_s": self._processing_ns / 1e9,
+            # throughput of handle_driver_input_batch alone, without waiting for due times
+            "processed_per_s": self._batches / (self._processing_ns / 1e9) if self._processing_ns else 0.0,
+            "max_lag_ms": self._max_lag_ns / 1e6,
+        }
+
+    def _finish(self) -> None:
+        self._running = False
+        model = self._control_panel.control_panel_model
+        for name, value in self._saved_config.items():
+            getattr(model, "set_" + name)(value)
+        self._control_panel.set_telemetry_recording_paused(False)
+        self._control_panel.set_config_publishing_enabled(True)
+        self._control_panel.set_live_driver_input_enabled(True)
+        self.finished.emit(self.get_stats())
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Replay a recorded telemetry session through the control panel")
+    parser.add_argument("directory", nargs="?", default=TELEMETRY_DIRECTORY)
+    parser.add_argument("session", nargs="?", help="the latest session if omitted")
+    parser.add_argument("--speed", type=float, default=1.0, help="1 for real time, 0 for as fast as possible")
+    parser.add_argument("--keep-open", action="store_true", help="keep the panel open after the replay")
+    parser.add_argument("--headless", action="store_true", help="replay without loading the UI")
+    parser.add_argument("--scaled", metavar="PATH", help="save the scaled samples to PATH.npy instead of replaying")
+    args = parser.parse_args()
+
+    sessions = list_sessions(args.directory)
+    session = args.session or (sessions[-1] if sessions else None)
+    if session is None or session not in sessions:
+        parser.error(f"no session {session} in {args.directory}")
+    segments = load_session(args.directory, session)
+    records = np.concatenate(segments) if segments else np.zeros(0, dtype=RECORD_DTYPE)
+
+    if args.scaled:
+        t = time.perf_counter()
+        scaled = scale_recorded_driver_input(records)
+        print(f"Scaled {len(scaled)} samples of {session} in {(time.perf_counter() - t) * 1000:.1f} ms")
+        np.save(args.scaled, scaled)
+        return
+
+    # imported here, the rest of the module is usable without the UI
+    from control_panel_backend.control_panel import ControlPanel
+
+    control_panel = ControlPanel(headless=args.headless)
+    replay = SessionReplay(control_panel, records, args.speed)
+
+    def report(stats: dict) -> None:
+        for key, value in stats.items():
+            print(f"{key:<16}{value:>16.3f}" if isinstance(value, float) else f"{key:<16}{value:>16}")
+        if not args.keep_open:
+            control_panel.app.quit()
+
+    replay.finished.connect(report)
+    print(f"Replaying {session}, {len(records)} records at speed {args.speed or 'max'}")
+    replay.start()
+    control_panel.start()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+# Copyright (C) 2023, NG:ITL
+import time
+import threading
+import paramiko
+
+
+class SshSession:
+    """
+    Keeps one authenticated SSH transport to a host and reuses it for every operation.
+
+    The SFTP channel is opened once and kept, exec commands get a cheap new channel on the
+    already authenticated transport. If the connection breaks, it is re-established on the
+    next call, failed connection attempts are spaced out with an exponential backoff.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        username: str,
+        password: str,
+        connect_timeout_s: float = 5.0,
+        keep_alive_interval_s: int = 15,
+        min_backoff_s: float = 0.5,
+        max_backoff_s: float = 30.0,
+    ) -> None:
+        self.host = host
+        self.port = port
+        self.username = username
+        self.__password = password
+
+        self.connect_timeout_s = connect_timeout_s
+        self.keep_alive_interval_s = keep_alive_interval_s
+        self.min_backoff_s = min_backoff_s
+        self.max_backoff_s = max_backoff_s
+
+        self._lock = threading.RLock()
+        self._client: paramiko.SSHClient | None = None
+        self._sftp: paramiko.SFTPClient | None = None
+        self._backoff_s = 0.0
+        self._next_attempt = 0.0
+
+    def is_connected(self) -> bool:
+        if self._client is None:
+            return False
+        transport = self._client.get_transport()
+        return transport is not None and transport.is_active()
+
+    def _connect(self) -> paramiko.SSHClient:
+        if self._client is not None and self.is_connected():
+            return self._client
+
+        self._drop()
+
+        now = time.monotonic()
+        if now < self._next_attempt:
+            raise ConnectionError(
+                f"SSH connection to {self.host} failed recently, retrying in {self._next_attempt - now:.1f}s"
+            )
+
+        client = paramiko.SSHClient()
+        client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+        try:
+            client.connect(
+                self.host,
+                port=self.port,
+                username=self.username,
+                password=self.__password,
+                timeout=self.connect_timeout_s,
+                banner_timeout=self.connect_timeout_s,
+                auth_timeout=self.connect_timeout_s,
+            )
+        except Exception:
+            client.close()
+            self._backoff_s = min(max(self._backoff_s * 2, self.min_backoff_s), self.max_backoff_s)
+            self._next_attempt = time.monotonic() + self._backoff_s
+            raise
+
+        transport = client.get_transport()
+        if transport is not None:
+            transport.set_keepalive(self.keep_alive_interval_s)
+
+        self._backoff_s = 0.0
+        self._next_attempt = 0.0
+        self._client = client
+        print(f"SSH connected to {self.host}")
+        return client
+
+    def _drop(self) -> None:
+        if self._sftp is not None:
+            try:
+                self._sftp.close()
+            except Exception:
+                pass
+            self._sftp = None
+
+        if self._client is not None:
+            try:
+                self._client.close()
+            except Exception:
+                pass
+            self._client = None
+
+    def _run(self, operation):
+        """
+        Runs operation(client) on the shared connection.
+
+        A connection that turns out to be dead is dropped and the operation is retried once on a
+        fresh connection.
+        """
+        with self._lock:
+            client = self._connect()
+            try:
+                return operation(client)
+            except (paramiko.SSHException, EOFError, OSError):
+                self._drop()
+                return operation(self._connect())
+
+    def _get_sftp(self, client: paramiko.SSHClient) -> paramiko.SFTPClient:
+        if self._sftp is None:
+            self._sftp = client.open_sftp()
+        return self._sftp
+
+    def exec_command(self, command: str):
+        """
+        Executes a command on the remote host and returns the (stdin, stdout, stderr) channel files.
+
+        Args:
+        command (str): The command to execute.
+        """
+        return self._run(lambda client: client.exec_command(command))
+
+    def write_file(self, remote_path: str, data: str) -> None:
+        """
+        Writes data to a file on the remote host.
+
+        Args:
+        remote_path (str): The path of the file on the remote host.
+        data (str): The content to write.
+        """
+
+        def write(client: paramiko.SSHClient) -> None:
+            with self._get_sftp(client).file(remote_path, "w") as remote_file:
+                remote_file.write(data)
+
+        self._run(write)
+
+    def put_file(self, local_path: str, remote_path: str) -> None:
+        """
+        Copies a local file to the remote host.
+
+        Args:
+        local_path (str): The path of the local file.
+        remote_path (str): The path of the file on the remote host.
+        """
+        self._run(lambda client: self._get_sftp(client).put(local_path, remote_path))
+
+    def close(self) -> None:
+        with self._lock:
+            self._drop()
+
+
+class SshSessionManager:
+    """Hands out one shared SshSession per host, port and user."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._sessions: dict[tuple[str, int, str], SshSession] = {}
+
+    def get(self, host: str, port: int, username: str, password: str) -> SshSession:
+        key = (host, port, username)
+        with self._lock:
+            session = self._sessions.get(key)
+            if session is None:
+                session = SshSession(host, port, username, password)
+                self._sessions[key] = session
+            return session
+
+    def close_all(self) -> None:
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions.clear()
+
+
+SSH_SESSIONS = SshSessionManager()
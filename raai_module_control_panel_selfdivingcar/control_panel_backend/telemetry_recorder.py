@@ -0,0 +1,254 @@
+# Copyright (C) 2023, NG:ITL
+"""
+Records the driver input the panel receives and the configs it publishes to memory-mapped log files.
+
+A session is a series of segment files "<session>_<index>.tlm" in the telemetry directory. Every
+segment is preallocated for segment_records records and the next one is started once it is full.
+A segment starts with a HEADER_SIZE byte header, followed by fixed size records:
+
+    timestamp_ns  int64    time.monotonic_ns when the panel received or sent the values
+    topic_id      uint32   TOPIC_DRIVER_INPUT or TOPIC_CONFIG
+    flags         uint32   for config, CONFIG_FLAG_PEDALS_ACTIVE like in wire_format, for driver_input
+                           DRIVER_INPUT_FLAG_IN_BATCH
+    values        7 x f8   the payload fields in the order of TOPIC_FIELDS, unused ones are 0
+
+The panel drains all queued driver input at once and only learns when the batch was drained, not
+when each sample arrived. The last sample of a batch gets the drain time, the ones before it are
+spread evenly over the time since the previous drain, at most DRIVER_INPUT_MAX_SPREAD_NS apart, so
+a burst keeps the spacing of its samples instead of sharing one timestamp. Every sample but the
+first of a batch has DRIVER_INPUT_FLAG_IN_BATCH, so a replay can feed the same batches again.
+
+Records are written with struct.pack_into straight into the mapping, the record count in the header
+is updated with every append, so a segment can be read while the panel is still writing it.
+load_segment and load_session return NumPy views on the files without copying them.
+"""
+import os
+import sys
+import glob
+import mmap
+import time
+import struct
+import argparse
+import numpy as np
+
+from typing import BinaryIO, Optional
+
+from control_panel_backend.wire_format import (
+    DRIVER_INPUT_FIELDS,
+    CONFIG_FIELDS_PEDALS_ACTIVE,
+    CONFIG_FIELDS_PEDALS_INACTIVE,
+    CONFIG_FLAG_PEDALS_ACTIVE,
+)
+
+TELEMETRY_DIRECTORY = "telemetry"
+TELEMETRY_SEGMENT_RECORDS = 1 << 20
+TELEMETRY_FILE_SUFFIX = ".tlm"
+
+TELEMETRY_MAGIC = b"RAAITLM\0"
+TELEMETRY_VERSION = 1
+
+DRIVER_INPUT_FLAG_IN_BATCH = 0x01
+# the platform sends every 1 ms, a longer gap before a batch is idle time, not spacing within it
+DRIVER_INPUT_MAX_SPREAD_NS = 10_000_000
+
+TOPIC_DRIVER_INPUT = 1
+TOPIC_CONFIG = 2
+TOPIC_IDS = {"driver_input": TOPIC_DRIVER_INPUT, "config": TOPIC_CONFIG}
+TOPIC_FIELDS = {
+    TOPIC_DRIVER_INPUT: DRIVER_INPUT_FIELDS,
+    # both config shapes have five values, the flag tells which one it is
+    TOPIC_CONFIG: CONFIG_FIELDS_PEDALS_ACTIVE,
+}
+VALUE_COUNT = 7
+
+# magic, version, record size, capacity, count, session start as wall clock time in ns
+HEADER_STRUCT = struct.Struct("<8sIIQQq")
+HEADER_SIZE = 64
+HEADER_COUNT_OFFSET = 24
+RECORD_STRUCT = struct.Struct("<qII7d")
+RECORD_DTYPE = np.dtype(
+    [("timestamp_ns", "<i8"), ("topic_id", "<u4"), ("flags", "<u4"), ("values", "<f8", (VALUE_COUNT,))]
+)
+assert RECORD_DTYPE.itemsize == RECORD_STRUCT.size
+
+# send_data and the config publisher record into this while a recording runs
+RECORDER: Optional["TelemetryRecorder"] = None
+
+
+class TelemetryRecorder:
+    """
+    Appends records to the segments of one session.
+
+    Args:
+    directory (str): Where the segments are written, created if missing.
+    segment_records (int): Records per segment, 1 << 20 records are 72 MiB.
+    session (str): Name of the session, the start time if omitted.
+    """
+
+    def __init__(
+        self, directory: str = TELEMETRY_DIRECTORY, segment_records: int = TELEMETRY_SEGMENT_RECORDS, session=None
+    ) -> None:
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.segment_records = segment_records
+        self.session = session or time.strftime("%Y%m%d_%H%M%S")
+        self.start_time_ns = time.time_ns()
+
+        self.records_written = 0
+        self._last_driver_input_ns = 0
+        self._segment_index = -1
+        self._file: Optional[BinaryIO] = None
+        self._map: Optional[mmap.mmap] = None
+        self._count = 0
+        self._open_next_segment()
+
+    def segment_path(self, index: int) -> str:
+        return os.path.join(self.directory, f"{self.session}_{index:04d}{TELEMETRY_FILE_SUFFIX}")
+
+    def _open_next_segment(self) -> None:
+        self._close_segment()
+        self._segment_index += 1
+
+        size = HEADER_SIZE + self.segment_records * RECORD_STRUCT.size
+        file = open(self.segment_path(self._segment_index), "w+b")
+        file.truncate(size)
+        self._file = file
+        self._map = mmap.mmap(file.fileno(), size)
+        HEADER_STRUCT.pack_into(
+            self._map,
+            0,
+            TELEMETRY_MAGIC,
+            TELEMETRY_VERSION,
+            RECORD_STRUCT.size,
+            self.segment_records,
+            0,
+            self.start_time_ns,
+        )
+        self._count = 0
+
+    def _close_segment(self) -> None:
+        if self._map is None or self._file is None:
+            return
+
+        self._map.flush()
+        self._map.close()
+        # the unused preallocated records are cut off, capacity in the header stays as it was
+        self._file.truncate(HEADER_SIZE + self._count * RECORD_STRUCT.size)
+        self._file.close()
+        self._map = None
+        self._file = None
+
+    def append(self, timestamp_ns: int, topic_id: int, flags: int, values) -> None:
+        if self._count == self.segment_records:
+            self._open_next_segment()
+        assert self._map is not None, "the recorder is closed"
+
+        RECORD_STRUCT.pack_into(
+            self._map, HEADER_SIZE + self._count * RECORD_STRUCT.size, timestamp_ns, topic_id, flags, *values
+        )
+        self._count += 1
+        self.records_written += 1
+        struct.pack_into("<Q", self._map, HEADER_COUNT_OFFSET, self._count)
+
+    def record_driver_input(self, payloads: list) -> None:
+        """Records a batch of driver_input payloads, meant as a ControlPanel.driver_input_listeners entry."""
+        now = time.monotonic_ns()
+        count = len(payloads)
+        span = min(now - self._last_driver_input_ns, count * DRIVER_INPUT_MAX_SPREAD_NS)
+        self._last_driver_input_ns = now
+        for i, payload in enumerate(payloads):
+            self.append(
+                now - span * (count - 1 - i) // count,
+                TOPIC_DRIVER_INPUT,
+                DRIVER_INPUT_FLAG_IN_BATCH if i else 0,
+                [payload.get(field, 0.0) for field in DRIVER_INPUT_FIELDS],
+            )
+
+    def record_sent(self, topic: str, payload: dict) -> None:
+        """Records a published payload, topics without a record layout are ignored."""
+        if topic == "config":
+            if "max_throttle" in payload:
+                flags = CONFIG_FLAG_PEDALS_ACTIVE
+                fields = CONFIG_FIELDS_PEDALS_ACTIVE
+            else:
+                flags = 0
+                fields = CONFIG_FIELDS_PEDALS_INACTIVE
+            values = [payload[field] for field in fields] + [0.0, 0.0]
+            self.append(time.monotonic_ns(), TOPIC_CONFIG, flags, values)
+        elif topic == "driver_input":
+            self.record_driver_input([payload])
+
+    def close(self) -> None:
+        self._close_segment()
+
+
+def load_segment(path: str) -> np.ndarray:
+    """
+    Maps a segment read-only.
+
+    Returns:
+    np.ndarray: The written records with RECORD_DTYPE, a view on the file.
+    """
+    with open(path, "rb") as file:
+        magic, version, record_size, capacity, count, _ = HEADER_STRUCT.unpack(file.read(HEADER_STRUCT.size))
+    if magic != TELEMETRY_MAGIC or version != TELEMETRY_VERSION or record_size != RECORD_DTYPE.itemsize:
+        raise ValueError(f"{path} is not a version {TELEMETRY_VERSION} telemetry segment")
+    if count == 0:
+        return np.zeros(0, dtype=RECORD_DTYPE)
+    return np.memmap(path, dtype=RECORD_DTYPE, mode="r", offset=HEADER_SIZE, shape=(count,))
+
+
+def session_segments(directory: str, session: str) -> list:
+    pattern = f"{glob.escape(session)}_[0-9][0-9][0-9][0-9]{TELEMETRY_FILE_SUFFIX}"
+    return sorted(glob.glob(os.path.join(glob.escape(directory), pattern)))
+
+
+def list_sessions(directory: str = TELEMETRY_DIRECTORY) -> list:
+    paths = glob.glob(os.path.join(glob.escape(directory), f"*_[0-9][0-9][0-9][0-9]{TELEMETRY_FILE_SUFFIX}"))
+    return sorted({os.path.basename(path)[: -len(TELEMETRY_FILE_SUFFIX) - 5] for path in paths})
+
+
+def load_session(directory: str, session: str) -> list:
+    """Returns one view per segment of a session, oldest first."""
+    return [load_segment(path) for path in session_segments(directory, session)]
+
+
+def topic_values(records: np.ndarray, topic_id: int) -> np.ndarray:
+    """
+    Selects the records of one topic.
+
+    Returns:
+    np.ndarray: A structured array with timestamp_ns and the named fields of the topic.
+    """
+    selected = records[records["topic_id"] == topic_id]
+    fields = TOPIC_FIELDS[topic_id]
+    result = np.empty(len(selected), dtype=[("timestamp_ns", "<i8")] + [(field, "<f8") for field in fields])
+    result["timestamp_ns"] = selected["timestamp_ns"]
+    for i, field in enumerate(fields):
+        result[field] = selected["values"][:, i]
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="List recorded telemetry sessions")
+    parser.add_argument("directory", nargs="?", default=TELEMETRY_DIRECTORY)
+    args = parser.parse_args()
+
+    sessions = list_sessions(args.directory)
+    if not sessions:
+        sys.exit(f"no sessions in {args.directory}")
+
+    print(f"{'session':<24}{'segments':>10}{'driver_input':>14}{'config':>10}{'duration s':>12}")
+    for session in sessions:
+        segments = load_session(args.directory, session)
+        topic_ids = np.concatenate([segment["topic_id"] for segment in segments])
+        timestamps = [segment["timestamp_ns"] for segment in segments if len(segment)]
+        duration = (timestamps[-1][-1] - timestamps[0][0]) / 1e9 if timestamps else 0.0
+        print(
+            f"{session:<24}{len(segments):>10}{np.count_nonzero(topic_ids == TOPIC_DRIVER_INPUT):>14}"
+            f"{np.count_nonzero(topic_ids == TOPIC_CONFIG):>10}{duration:>12.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
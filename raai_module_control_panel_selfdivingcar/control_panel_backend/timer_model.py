@@ -6,27 +6,75 @@ def pad_left(string: str, length: int, padchar: str = "0") -> str:
     return string
 
 
+# the zero padded fields, looked up instead of formatted on every frame
+TWO_DIGITS = tuple(pad_left(str(i), 2) for i in range(100))
+THREE_DIGITS = tuple(pad_left(str(i), 3) for i in range(1000))
+
+
+def format_time(hours: int, minutes: int, seconds: int, millis: int) -> str:
+    """Returns "mm:ss.zzz", or "h:mm:ss.zzz" from the first hour on."""
+    text = TWO_DIGITS[minutes] + ":" + TWO_DIGITS[seconds] + "." + THREE_DIGITS[millis]
+    if hours:
+        return str(hours) + ":" + text
+    return text
+
+
 class Timer(QObject):
+    """
+    The time shown by the panel's timer.
+
+    set_timestamp updates all fields at once, each field signal is only emitted if the field
+    changed, followed by a single timestampChanged with the time formatted by format_time. QML binds
+    to timestamp and does no string work of its own.
+    """
+
     millis_changed = Signal(name="millisChanged")
     seconds_changed = Signal(name="secondsChanged")
     minutes_changed = Signal(name="minutesChanged")
+    hours_changed = Signal(name="hoursChanged")
+    timestamp_changed = Signal(str, name="timestampChanged")
 
-    def __init__(self, millis: int, seconds: int, minutes: int) -> None:
+    def __init__(self, millis: int, seconds: int, minutes: int, hours: int = 0) -> None:
         QObject.__init__(self)
         self._millis = millis
         self._seconds = seconds
         self._minutes = minutes
+        self._hours = hours
+        self._timestamp = format_time(hours, minutes, seconds, millis)
 
     def set_timestamp(self, timestamp_ns: int) -> None:
-        timestamp_ms = timestamp_ns // (1000 * 1000)
+        # the timestamp_ns property is a float in QML
+        timestamp_ms = int(timestamp_ns) // (1000 * 1000)
 
         millis = timestamp_ms % 1000
         seconds = (timestamp_ms // 1000) % 60
         minutes = (timestamp_ms // (1000 * 60)) % 60
+        hours = timestamp_ms // (1000 * 60 * 60)
+
+        self.set_fields(hours, minutes, seconds, millis)
+
+    def set_fields(self, hours: int, minutes: int, seconds: int, millis: int) -> None:
+        """Sets all fields, emits the signals of the changed ones and one timestampChanged."""
+        changed = []
+        if self._millis != millis:
+            self._millis = millis
+            changed.append(self.millis_changed)
+        if self._seconds != seconds:
+            self._seconds = seconds
+            changed.append(self.seconds_changed)
+        if self._minutes != minutes:
+            self._minutes = minutes
+            changed.append(self.minutes_changed)
+        if self._hours != hours:
+            self._hours = hours
+            changed.append(self.hours_changed)
+        if not changed:
+            return
 
-        self.set_millis(millis)
-        self.set_seconds(seconds)
-        self.set_minutes(minutes)
+        self._timestamp = format_time(hours, minutes, seconds, millis)
+        for signal in changed:
+            signal.emit()
+        self.timestamp_changed.emit(self._timestamp)
 
     def get_millis(self) -> int:
         return self._millis
@@ -37,18 +85,31 @@ class Timer(QObject):
     def get_minutes(self) -> int:
         return self._minutes
 
+    def get_hours(self) -> int:
+        return self._hours
+
+    def get_timestamp(self) -> str:
+        return self._timestamp
+
+    def get_timestamp_ns(self) -> float:
+        return (((self._hours * 60 + self._minutes) * 60 + self._seconds) * 1000 + self._millis) * 1000 * 1000
+
     def set_millis(self, millis: int) -> None:
-        self._millis = millis
-        self.millis_changed.emit()
+        self.set_fields(self._hours, self._minutes, self._seconds, millis)
 
     def set_seconds(self, seconds: int) -> None:
-        self._seconds = seconds
-        self.seconds_changed.emit()
+        self.set_fields(self._hours, self._minutes, seconds, self._millis)
 
     def set_minutes(self, minutes: int) -> None:
-        self._minutes = minutes
-        self.minutes_changed.emit()
+        self.set_fields(self._hours, minutes, self._seconds, self._millis)
+
+    def set_hours(self, hours: int) -> None:
+        self.set_fields(hours, self._minutes, self._seconds, self._millis)
 
     millis = Property(int, get_millis, set_millis, notify=millis_changed)  # type: ignore
     seconds = Property(int, get_seconds, set_seconds, notify=seconds_changed)  # type: ignore
     minutes = Property(int, get_minutes, set_minutes, notify=minutes_changed)  # type: ignore
+    hours = Property(int, get_hours, set_hours, notify=hours_changed)  # type: ignore
+    timestamp = Property(str, get_timestamp, notify=timestamp_changed)  # type: ignore
+    # float, a QML int would overflow after 2 s, a double is exact in ns for months
+    timestamp_ns = Property(float, get_timestamp_ns, set_timestamp, notify=timestamp_changed)  # type: ignore
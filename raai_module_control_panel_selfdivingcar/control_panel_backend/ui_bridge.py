@@ -0,0 +1,381 @@
+# Copyright (C) 2023, NG:ITL
+"""
+Runs the QML UI in its own process, connected to a headless control panel backend over pynng.
+
+The backend owns the models and all sockets of the panel. UiStateServer publishes the properties of
+the models the QML uses on UI_STATE_PYNNG_ADDRESS, every interval_ms only the ones that changed:
+
+    ui_state {"seq": 12, "diff": {"control_panel_model.throttle": 7.5, "t_model.millis": 120}}
+    ui_state {"seq": 13, "state": {...every property...}}
+
+A full state is sent once a second and on request, a UI that notices a gap in seq asks for one.
+The lap list isn't a property, a new lap is sent as it happens, a new driver or cleared laps as
+the driver's lap times, the full state has them too:
+
+    ui_state {"seq": 14, "lap": 61234000000}
+    ui_state {"seq": 15, "laps": {"driver": "Max", "laps": [62015000000, 61234000000]}}
+
+The UI process sends what the user does on UI_COMMAND_PYNNG_ADDRESS (Push/Pull, fire and forget):
+
+    {"signal": "sliderMaxThrottleChanged", "args": [42.0]}   a signal of main.qml's root object
+    {"set": {"control_panel_model.curvespeed": 30.0}}         a property QML assigned directly
+    {"call": "database_model.create_driver", "args": ["x"]}  a slot of the driver database model
+    {"snapshot": true}                                        asks for a full state
+
+The 1 kHz driver input path never waits for the UI, a slow or crashed UI only misses diffs.
+"""
+import sys
+import json
+import pynng
+
+from PySide6.QtCore import QObject, QSocketNotifier, QTimer, Signal, Slot, Property
+
+from control_panel_backend.control_panel_model import ControlPanelModel
+from control_panel_backend.timer_model import Timer
+from control_panel_backend.lap_history import LapListModel
+from control_panel_backend.driver_index import driver_id
+from control_panel_backend.driver_list_model import DriverListModel, DriverFilterModel
+
+UI_STATE_PYNNG_ADDRESS = "ipc:///tmp/RAAI/control_panel_ui_state.ipc"
+UI_COMMAND_PYNNG_ADDRESS = "ipc:///tmp/RAAI/control_panel_ui_command.ipc"
+UI_STATE_TOPIC = "ui_state"
+UI_STATE_INTERVAL_MS = 16
+UI_STATE_FULL_INTERVAL_MS = 1000
+
+# the QML writes these properties itself before it emits the matching signal
+UI_WRITABLE_PROPERTIES = ("control_panel_model.curvespeed", "control_panel_model.straightlinespeed")
+DATABASE_MODEL_SLOTS = ("send_data", "refresh_driver", "search_driver", "create_driver")
+# objects whose other properties are derived from these, all properties are mirrored for the rest
+UI_MIRRORED_PROPERTIES = {
+    "t_model": ("timestamp_ns",),
+    # drivers is a list model, driver_list has the same rows as plain data
+    "database_model": ("driver_list", "status", "search_text"),
+}
+
+
+def object_properties(obj: QObject) -> list:
+    """Returns the names of the properties obj's class declares, without the inherited QObject ones."""
+    meta = obj.metaObject()
+    return [meta.property(i).name() for i in range(meta.propertyOffset(), meta.propertyCount())]
+
+
+def set_object_property(obj: QObject, name: str, value) -> None:
+    # the python setters also cover read-only properties, e.g. set_remote_command_status
+    setter = getattr(obj, f"set_{name}", None)
+    if setter is not None:
+        setter(value)
+    else:
+        obj.setProperty(name, value)
+
+
+class UiStateServer(QObject):
+    """
+    The backend side, publishes the state of the control panel's models and executes UI commands.
+
+    Args:
+    control_panel (ControlPanel): A panel, usually headless.
+    """
+
+    def __init__(
+        self,
+        control_panel,
+        state_address: str = UI_STATE_PYNNG_ADDRESS,
+        command_address: str = UI_COMMAND_PYNNG_ADDRESS,
+        interval_ms: int = UI_STATE_INTERVAL_MS,
+    ) -> None:
+        QObject.__init__(self)
+        self._control_panel = control_panel
+        self._objects = {
+            "control_panel_model": control_panel.control_panel_model,
+            "t_model": control_panel.t_model,
+            "database_model": control_panel.database_model,
+        }
+        self._keys = [
+            (f"{object_name}.{name}", obj, name)
+            for object_name, obj in self._objects.items()
+            for name in UI_MIRRORED_PROPERTIES.get(object_name, object_properties(obj))
+        ]
+        self._signal_handlers = control_panel.ui_signal_handlers()
+        self._lap_model = control_panel.lap_model
+        self._sent: dict = {}
+        self._seq = 0
+
+        self._pub = pynng.Pub0()
+        self._pub.listen(state_address)
+        self._pull = pynng.Pull0()
+        self._pull.listen(command_address)
+        self._notifier = QSocketNotifier(self._pull.recv_fd, QSocketNotifier.Type.Read)
+        self._notifier.activated.connect(self.handle_commands)  # type: ignore
+
+        # polled instead of connected to every notify signal, so the driver input path doesn't run
+        # an extra slot per change, it's at most one diff per interval no matter the input rate
+        self._timer = QTimer(self)
+        self._timer.timeout.connect(self.publish_diff)  # type: ignore
+        self._timer.start(interval_ms)
+        self._full_timer = QTimer(self)
+        self._full_timer.timeout.connect(self.publish_state)  # type: ignore
+        self._full_timer.start(UI_STATE_FULL_INTERVAL_MS)
+
+        self._lap_model.lapAdded.connect(lambda lap_ns: self._send({"lap": lap_ns}))
+        self._lap_model.driverChanged.connect(self.publish_laps)
+        self._lap_model.cleared.connect(self.publish_laps)
+
+    def get_state(self) -> dict:
+        return {key: obj.property(name) for key, obj, name in self._keys}
+
+    def _send(self, message: dict) -> None:
+        self._seq += 1
+        message["seq"] = self._seq
+        self._pub.send((UI_STATE_TOPIC + " " + json.dumps(message)).encode())
+
+    def publish_diff(self) -> None:
+        diff = {}
+        for key, obj, name in self._keys:
+            value = obj.property(name)
+            if self._sent.get(key) != value:
+                diff[key] = value
+        if not diff:
+            return
+
+        self._sent.update(diff)
+        self._send({"diff": diff})
+
+    def publish_state(self) -> None:
+        self._sent = self.get_state()
+        self._send({"state": self._sent, "laps": self.get_laps()})
+
+    def get_laps(self) -> dict:
+        return {"driver": self._lap_model.get_driver(), "laps": self._lap_model.lap_times()}
+
+    def publish_laps(self) -> None:
+        self._send({"laps": self.get_laps()})
+
+    def handle_commands(self) -> None:
+        while True:
+            try:
+                command = json.loads(self._pull.recv(block=False))
+            except pynng.TryAgain:
+                return
+            except json.JSONDecodeError:
+                continue
+
+            try:
+                self.handle_command(command)
+            except (KeyError, TypeError, AttributeError) as e:
+                print(f"Invalid UI command {command}: {e}")
+
+    def handle_command(self, command: dict) -> None:
+        if command.get("snapshot"):
+            self.publish_state()
+        for key, value in command.get("set", {}).items():
+            if key in UI_WRITABLE_PROPERTIES:
+                object_name, name = key.split(".", 1)
+                set_object_property(self._objects[object_name], name, value)
+        if "signal" in command:
+            self._signal_handlers[command["signal"]](*command.get("args", []))
+        if "call" in command:
+            object_name, name = command["call"].split(".", 1)
+            if object_name != "database_model" or name not in DATABASE_MODEL_SLOTS:
+                raise KeyError(command["call"])
+            getattr(self._objects[object_name], name)(*command.get("args", []))
+
+    def close(self) -> None:
+        self._timer.stop()
+        self._full_timer.stop()
+        self._notifier.setEnabled(False)
+        self._pub.close()
+        self._pull.close()
+
+
+class DriverDataMirror(QObject):
+    """Stands in for DriverDataPublisher in the UI process, its slots are executed by the backend."""
+
+    driversChanged = Signal()
+    statusChanged = Signal()
+    searchChanged = Signal()
+
+    def __init__(self, client: "UiStateClient") -> None:
+        super().__init__()
+        self._client = client
+        self.__model = DriverListModel()
+        self.__view = DriverFilterModel(self.__model)
+        self.__status = ""
+        self.__search = ""
+
+    @Slot(str)
+    def send_data(self, driver_name):
+        self._client.call("database_model.send_data", driver_name)
+
+    @Slot()
+    def refresh_driver(self):
+        self._client.call("database_model.refresh_driver")
+
+    @Slot(str)
+    def search_driver(self, name: str):
+        self._client.call("database_model.search_driver", name)
+
+    @Slot(str)
+    def create_driver(self, name: str):
+        self._client.call("database_model.create_driver", name)
+
+    @Property(QObject, constant=True)  # type: ignore
+    def drivers(self):
+        return self.__view
+
+    @Property(str, notify=statusChanged)  # type: ignore
+    def status(self):
+        return self.__status
+
+    @Property(str, notify=searchChanged)  # type: ignore
+    def search_text(self):
+        return self.__search
+
+    def set_driver_list(self, drivers):
+        if drivers == self.__view.drivers():
+            return
+        self.__model.set_drivers(drivers)
+        # search results come in the backend's order of their rank, which the view then keeps
+        if [driver_id(driver) for driver in drivers] == [driver_id(driver) for driver in self.__model.drivers()]:
+            self.__view.set_ranking(None)
+        else:
+            self.__view.set_ranking({driver_id(driver): rank for rank, driver in enumerate(drivers)})
+        self.driversChanged.emit()
+
+    def set_status(self, status):
+        if self.__status != status:
+            self.__status = status
+            self.statusChanged.emit()
+
+    def set_search_text(self, search):
+        if self.__search != search:
+            self.__search = search
+            self.searchChanged.emit()
+
+
+class UiStateClient(QObject):
+    """
+    The UI side, mirrors the backend's models into local ones and forwards commands to it.
+    """
+
+    def __init__(
+        self, state_address: str = UI_STATE_PYNNG_ADDRESS, command_address: str = UI_COMMAND_PYNNG_ADDRESS
+    ) -> None:
+        QObject.__init__(self)
+        self.control_panel_model = ControlPanelModel()
+        self.t_model = Timer(0, 0, 0)
+        self.database_model = DriverDataMirror(self)
+        self.lap_model = LapListModel()
+        self._objects = {
+            "control_panel_model": self.control_panel_model,
+            "t_model": self.t_model,
+            "database_model": self.database_model,
+        }
+        self._seq = -1
+        self._applying = False
+
+        self._push = pynng.Push0(send_timeout=100)
+        self._push.dial(command_address, block=False)
+        self._sub = pynng.Sub0()
+        self._sub.subscribe(UI_STATE_TOPIC)
+        self._sub.dial(state_address, block=False)
+        self._notifier = QSocketNotifier(self._sub.recv_fd, QSocketNotifier.Type.Read)
+        self._notifier.activated.connect(self.handle_state)  # type: ignore
+
+        for key in UI_WRITABLE_PROPERTIES:
+            object_name, name = key.split(".", 1)
+            changed = getattr(self._objects[object_name], f"{name}_changed")
+            changed.connect(lambda key=key, obj=self._objects[object_name], name=name: self.forward_set(key, obj, name))
+
+        self.send({"snapshot": True})
+
+    def send(self, command: dict) -> None:
+        try:
+            self._push.send(json.dumps(command).encode())
+        except pynng.Timeout:
+            print(f"Control panel backend not reachable, dropped {command}")
+
+    def call(self, name: str, *args) -> None:
+        self.send({"call": name, "args": list(args)})
+
+    def forward_signal(self, name: str, *args) -> None:
+        self.send({"signal": name, "args": list(args)})
+
+    def forward_set(self, key: str, obj: QObject, name: str) -> None:
+        if not self._applying:
+            self.send({"set": {key: obj.property(name)}})
+
+    def handle_state(self) -> None:
+        while True:
+            try:
+                msg = self._sub.recv(block=False)
+            except pynng.TryAgain:
+                return
+            self.apply(json.loads(msg[len(UI_STATE_TOPIC) + 1 :]))
+
+    def apply(self, message: dict) -> None:
+        seq = message["seq"]
+        if "state" in message:
+            values = message["state"]
+        elif seq == self._seq + 1:
+            values = message.get("diff", {})
+        else:
+            # missed a diff or the backend restarted
+            self._seq = -1
+            self.send({"snapshot": True})
+            return
+        self._seq = seq
+
+        self._applying = True
+        try:
+            for key, value in values.items():
+                object_name, name = key.split(".", 1)
+                set_object_property(self._objects[object_name], name, value)
+        finally:
+            self._applying = False
+
+        if "laps" in message:
+            laps = message["laps"]
+            # the full state repeats them every second, the rows are only reset if they differ
+            if laps["driver"] != self.lap_model.get_driver() or laps["laps"] != self.lap_model.lap_times():
+                self.lap_model.set_laps(laps["driver"], laps["laps"])
+        if "lap" in message:
+            self.lap_model.add_lap(message["lap"])
+
+    def connect_root(self, root: QObject) -> None:
+        """Forwards every signal main.qml's root object declares to the backend."""
+        meta = root.metaObject()
+        for i in range(meta.methodOffset(), meta.methodCount()):
+            method = meta.method(i)
+            if method.methodType() != method.MethodType.Signal:
+                continue
+            name = bytes(method.name().data()).decode()
+            getattr(root, name).connect(lambda *args, name=name: self.forward_signal(name, *args))
+
+    def close(self) -> None:
+        self._notifier.setEnabled(False)
+        self._sub.close()
+        self._push.close()
+
+
+def run_ui_process(qml_path) -> None:
+    """Shows the QML UI for a backend started with UiStateServer, returns when the window is closed."""
+    from PySide6.QtGui import QGuiApplication
+    from PySide6.QtQml import QQmlApplicationEngine
+
+    app = QGuiApplication(sys.argv)
+    client = UiStateClient()
+
+    engine = QQmlApplicationEngine()
+    engine.rootContext().setContextProperty("t_model", client.t_model)
+    engine.rootContext().setContextProperty("database_model", client.database_model)
+    engine.rootContext().setContextProperty("control_panel_model", client.control_panel_model)
+    engine.rootContext().setContextProperty("lap_model", client.lap_model)
+    engine.load(qml_path)
+    if not engine.rootObjects():
+        sys.exit(f"Loading {qml_path} failed")
+    client.connect_root(engine.rootObjects()[0])
+
+    app.exec()
+    # the QML goes before the models it binds to
+    del engine
+    client.close()
@@ -0,0 +1,55 @@
+# Copyright (C) 2023, NG:ITL
+import time
+
+from PySide6.QtCore import QObject, QTimer, Signal
+
+
+class UpdateCoalescer(QObject):
+    """
+    Collapses bursts of keyed updates into the latest value per key.
+
+    The first update after a quiet period is flushed right away, further updates are collected
+    and flushed at most every interval_ms. The final value of a burst is always flushed.
+    """
+
+    flushed = Signal(dict)
+
+    def __init__(self, interval_ms: int) -> None:
+        QObject.__init__(self)
+        self.interval_ms = interval_ms
+
+        self._pending: dict = {}
+        self._last_flush_ms = -float(interval_ms)
+
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.timeout.connect(self.flush)  # type: ignore
+
+    def submit(self, key: str, value) -> None:
+        """
+        Records the newest value for key and flushes it once the interval allows it.
+
+        Args:
+        key (str): The key of the value, e.g. "curvespeed".
+        value: The new value, replaces a pending value of the same key.
+        """
+        self._pending[key] = value
+
+        if self._timer.isActive():
+            return
+
+        since_last_flush_ms = time.monotonic() * 1000 - self._last_flush_ms
+        if since_last_flush_ms >= self.interval_ms:
+            self.flush()
+        else:
+            self._timer.start(int(self.interval_ms - since_last_flush_ms))
+
+    def flush(self) -> None:
+        """Emits all pending updates now."""
+        self._timer.stop()
+        if not self._pending:
+            return
+
+        updates, self._pending = self._pending, {}
+        self._last_flush_ms = time.monotonic() * 1000
+        self.flushed.emit(updates)
@@ -0,0 +1,109 @@
+# Copyright (C) 2023, NG:ITL
+"""
+Compact binary encoding for the high rate "config" and "driver_input" topics.
+
+A binary message carries the topic with BINARY_TOPIC_PREFIX in front, e.g. "bin.config ", followed
+by a fixed little-endian layout that starts with a version byte. pynng subscriptions match by prefix,
+so a subscriber of "config" never gets the binary messages, one that understands them subscribes to
+binary_topic("config") instead. Messages without the prefix are the usual "topic json" messages,
+decode_message handles both, so receivers don't need to know in advance which format a publisher uses.
+"""
+import json
+import struct
+
+BINARY_TOPIC_PREFIX = "bin."
+_BINARY_TOPIC_PREFIX_BYTES = BINARY_TOPIC_PREFIX.encode()
+WIRE_FORMAT_VERSION = 1
+
+# version, flags, max_throttle/throttle, max_brake/brake, max_clutch/clutch, max_steering/steering, steering_offset
+CONFIG_STRUCT = struct.Struct("<BB5d")
+CONFIG_FLAG_PEDALS_ACTIVE = 0x01
+CONFIG_FIELDS_PEDALS_ACTIVE = ("max_throttle", "max_brake", "max_clutch", "max_steering", "steering_offset")
+CONFIG_FIELDS_PEDALS_INACTIVE = ("throttle", "brake", "clutch", "steering", "steering_offset")
+
+# version, throttle, brake, clutch, steering, tilt_x, tilt_y, vibration
+DRIVER_INPUT_STRUCT = struct.Struct("<B7d")
+DRIVER_INPUT_FIELDS = ("throttle", "brake", "clutch", "steering", "tilt_x", "tilt_y", "vibration")
+
+
+class WireFormatError(ValueError):
+    """A message that can't be decoded, e.g. an unknown binary topic, a short frame or broken json."""
+
+
+def binary_topic(topic: str) -> str:
+    return BINARY_TOPIC_PREFIX + topic
+
+
+def _check_version(version: int) -> None:
+    if version != WIRE_FORMAT_VERSION:
+        raise WireFormatError(f"unsupported wire format version {version}")
+
+
+def encode_config(payload: dict) -> bytes:
+    if "max_throttle" in payload:
+        flags = CONFIG_FLAG_PEDALS_ACTIVE
+        fields = CONFIG_FIELDS_PEDALS_ACTIVE
+    else:
+        flags = 0
+        fields = CONFIG_FIELDS_PEDALS_INACTIVE
+    return CONFIG_STRUCT.pack(WIRE_FORMAT_VERSION, flags, *[payload[field] for field in fields])
+
+
+def decode_config(buffer, offset: int = 0) -> dict:
+    version, flags, *values = CONFIG_STRUCT.unpack_from(buffer, offset)
+    _check_version(version)
+    fields = CONFIG_FIELDS_PEDALS_ACTIVE if flags & CONFIG_FLAG_PEDALS_ACTIVE else CONFIG_FIELDS_PEDALS_INACTIVE
+    return dict(zip(fields, values))
+
+
+def encode_driver_input(payload: dict) -> bytes:
+    return DRIVER_INPUT_STRUCT.pack(WIRE_FORMAT_VERSION, *[payload[field] for field in DRIVER_INPUT_FIELDS])
+
+
+def decode_driver_input(buffer, offset: int = 0) -> dict:
+    version, *values = DRIVER_INPUT_STRUCT.unpack_from(buffer, offset)
+    _check_version(version)
+    return dict(zip(DRIVER_INPUT_FIELDS, values))
+
+
+BINARY_CODECS = {
+    "config": (encode_config, decode_config),
+    "driver_input": (encode_driver_input, decode_driver_input),
+}
+
+
+def encode_message(topic: str, payload: dict) -> bytes:
+    """
+    Encodes payload with the binary layout of topic.
+
+    Args:
+    topic (str): The plain topic, e.g. "config".
+    payload (dict): The data in the same form as for the json format.
+    """
+    encode, _ = BINARY_CODECS[topic]
+    return (binary_topic(topic) + " ").encode() + encode(payload)
+
+
+def decode_message(msg: bytes) -> tuple[str, dict]:
+    """
+    Decodes a json or binary message, the body is never decoded to an intermediate string.
+
+    Returns:
+    tuple: The plain topic and the payload.
+
+    Raises:
+    WireFormatError: If the message can't be decoded.
+    """
+    i = msg.find(b" ")
+    if i < 0:
+        raise WireFormatError(f"message without a topic: {bytes(msg[:40])!r}")
+    try:
+        if msg.startswith(_BINARY_TOPIC_PREFIX_BYTES):
+            topic = msg[len(_BINARY_TOPIC_PREFIX_BYTES) : i].decode()
+            if topic not in BINARY_CODECS:
+                raise WireFormatError(f"no binary layout for topic {topic!r}")
+            _, decode = BINARY_CODECS[topic]
+            return topic, decode(msg, i + 1)
+        return msg[:i].decode(), json.loads(msg[i + 1 :])
+    except (struct.error, UnicodeDecodeError, json.JSONDecodeError) as e:
+        raise WireFormatError(f"can't decode {bytes(msg[:i])!r} message: {e}") from e
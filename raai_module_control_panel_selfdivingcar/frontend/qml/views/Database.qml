@@ -44,6 +44,7 @@ Item {
             width: 400
             font.pixelSize: 18
             padding: 10
+            onTextChanged: database_model.search_driver(text)
             background: Rectangle {
                 color: "lightgrey"
                 radius: 10
@@ -97,53 +98,52 @@ Item {
             clip: true
             ScrollBar.horizontal.policy: ScrollBar.AlwaysOff
 
-            Column {
+            // only the visible rows have delegates, a new driver creates one
+            ListView {
+                id: driverList
                 width: scrollView.width
                 spacing: 5
+                model: database_model.drivers
 
-                Repeater {
-                    model: database_model.drivers
+                delegate: Rectangle {
+                    width: content.width
+                    height: content.height / 15
+                    opacity: mouseHandler.containsMouse ? 1 : 0.5
+                    color: index % 2 === 0 ? "#ffffff" : "#e0e0e0"
+                    radius: 5
 
-                    delegate: Rectangle {
-                        width: content.width
-                        height: content.height / 15
-                        opacity: mouseHandler.containsMouse ? 1 : 0.5
-                        color: index % 2 === 0 ? "#ffffff" : "#e0e0e0"
-                        radius: 5
+                    Row {
+                        anchors.fill: parent
+                        spacing: 10
 
-                        Row {
+                        MouseArea {
+                            id: mouseHandler
                             anchors.fill: parent
-                            spacing: 10
-
-                            MouseArea {
-                                id: mouseHandler
-                                anchors.fill: parent
-                                hoverEnabled: true
-                                onClicked: database_model.send_data(modelData.name)
-                            }
-
-                            Text {
-                                color: "black"
-                                text: modelData.name
-                                anchors.verticalCenter: parent.verticalCenter
-                                font.pixelSize: 16
-                            }
-
-                            Text {
-                                color: "black"
-                                text: modelData.created
-                                anchors.horizontalCenter: parent.horizontalCenter
-                                anchors.verticalCenter: parent.verticalCenter
-                                font.pixelSize: 16
-                            }
-
-                            Text {
-                                anchors.right: parent.right
-                                anchors.verticalCenter: parent.verticalCenter
-                                color: "black"
-                                text: modelData.id
-                                font.pixelSize: 16
-                            }
+                            hoverEnabled: true
+                            onClicked: database_model.send_data(model.name)
+                        }
+
+                        Text {
+                            color: "black"
+                            text: model.name
+                            anchors.verticalCenter: parent.verticalCenter
+                            font.pixelSize: 16
+                        }
+
+                        Text {
+                            color: "black"
+                            text: model.created
+                            anchors.horizontalCenter: parent.horizontalCenter
+                            anchors.verticalCenter: parent.verticalCenter
+                            font.pixelSize: 16
+                        }
+
+                        Text {
+                            anchors.right: parent.right
+                            anchors.verticalCenter: parent.verticalCenter
+                            color: "black"
+                            text: model.driverId
+                            font.pixelSize: 16
                         }
                     }
                 }
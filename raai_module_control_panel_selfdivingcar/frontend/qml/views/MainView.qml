@@ -194,7 +194,7 @@ Item {
 
         Text {
             id: timer
-            text: String(t_model.minutes).padStart(2, '0') + ":" + String(t_model.seconds).padStart(2, '0') + "." + String(t_model.millis).padStart(3, '0')
+            text: t_model.timestamp
             anchors.verticalCenter: timerBackground.verticalCenter
             anchors.horizontalCenter: timerBackground.horizontalCenter
             color: window.dark_blue_text_color
@@ -203,4 +203,45 @@ Item {
         }
     }
 
+    Rectangle {
+        id: lapBackground
+        x: timerBackground.x + timerBackground.width + window.width * 0.02
+        y: window.height * 0.9
+        radius: 10
+        color: window.light_grey
+        width: window.width * 0.18
+        height: timerBackground.height
+        border.color: "white"
+        border.width: 5
+        visible: lap_model.lap_count > 0
+
+        Text {
+            id: bestLap
+            text: "Best " + lap_model.best_lap + "  Avg " + lap_model.average_lap
+            anchors.horizontalCenter: parent.horizontalCenter
+            y: parent.border.width
+            color: window.dark_blue_text_color
+            font.bold: true
+        }
+
+        ListView {
+            id: lapList
+            anchors.top: bestLap.bottom
+            anchors.bottom: parent.bottom
+            anchors.left: parent.left
+            anchors.right: parent.right
+            anchors.margins: parent.border.width
+            clip: true
+            model: lap_model
+
+            delegate: Text {
+                width: lapList.width
+                horizontalAlignment: Text.AlignHCenter
+                text: lapNumber + "  " + lapTime + "  " + delta
+                color: isBest ? "#326ecf" : window.dark_blue_text_color
+                font.bold: isBest
+            }
+        }
+    }
+
 }
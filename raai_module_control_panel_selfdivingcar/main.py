@@ -1,6 +1,11 @@
 import json
-import paramiko
+import argparse
 from control_panel_backend.control_panel import ControlPanel
+from control_panel_backend.control_panel import CAR_SSH_HOST, CAR_SSH_PORT, CAR_SSH_USERNAME, CAR_SSH_PASSWORD
+from control_panel_backend.control_panel import CAR_CONFIG_REMOTE_PATH
+from control_panel_backend.control_panel import resource_path
+from control_panel_backend.ui_bridge import UiStateServer, run_ui_process
+from control_panel_backend.ssh_session import SSH_SESSIONS
 
 def load_config(filename):
     try:
@@ -29,34 +34,44 @@ def load_config(filename):
     return config
 
 def send_config_via_ssh(local_path, ssh_host, ssh_port, ssh_username, ssh_password, remote_path):
-    # Establish SSH connection
-    ssh = paramiko.SSHClient()
-    ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-    ssh.connect(ssh_host, port=ssh_port, username=ssh_username, password=ssh_password)
-
-    # Transfer local file to remote path via SSH
-    sftp = ssh.open_sftp()
-    sftp.put(local_path, remote_path)
-
-    # Close SSH connection
-    sftp.close()
-    ssh.close()
+    # Transfer local file to remote path over the shared SSH connection,
+    # the control panel reuses it afterwards
+    ssh = SSH_SESSIONS.get(ssh_host, ssh_port, ssh_username, ssh_password)
+    ssh.put_file(local_path, remote_path)
     print("Erfolgreich gesendet!")
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="RaceAgainstAI control panel for the self-driving car")
+    parser.add_argument("--headless", action="store_true", help="run without UI, e.g. on machines without a display")
+    parser.add_argument(
+        "--mode",
+        choices=("combined", "backend", "ui"),
+        default="combined",
+        help="combined runs backend and UI in this process, backend and ui run them as two processes",
+    )
+    args = parser.parse_args()
+
+    if args.mode == "ui":
+        # the backend process owns the car and all sockets, the UI only mirrors it
+        run_ui_process(str(resource_path() / "frontend/qml/main.qml"))
+        raise SystemExit
+
     config = load_config('config_selfdriving_car.json')
     print("Geladene Konfiguration:", config)
     
-    ssh_host = '192.168.30.123'
-    ssh_port = 22  # Standard-SSH-Port
-    ssh_username = 'itlab'
-    ssh_password = '1234'
-    remote_path = '/home/itlab/cam/inside-out-server/data.json'
+    ssh_host = CAR_SSH_HOST
+    ssh_port = CAR_SSH_PORT
+    ssh_username = CAR_SSH_USERNAME
+    ssh_password = CAR_SSH_PASSWORD
+    remote_path = CAR_CONFIG_REMOTE_PATH
     local_path = 'control_panel_backend/config_selfdriving_car.json'
     with open(local_path, 'w') as file:
         json.dump(config, file)
         
     send_config_via_ssh(local_path, ssh_host, ssh_port, ssh_username, ssh_password, remote_path)
     
-    vehicle_control = ControlPanel()
+    vehicle_control = ControlPanel(headless=args.headless or args.mode == "backend")
+    ui_server = UiStateServer(vehicle_control) if args.mode == "backend" else None
     vehicle_control.start()
+    if ui_server is not None:
+        ui_server.close()
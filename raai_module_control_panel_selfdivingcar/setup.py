@@ -20,5 +20,5 @@ setup(
     url="https://github.com/vw-wob-it-edu-ngitl/raai_module_control_panel",
     packages=find_packages(),
     long_description=read("README.md"),
-    install_requires=["pyside6==6.3.1", "inkscape_svg_layer_extractor~=0.0.2", "pynng~=0.7.2"],
+    install_requires=["pyside6==6.3.1", "inkscape_svg_layer_extractor~=0.0.2", "pynng~=0.7.2", "numpy~=1.24"],
 )
@@ -0,0 +1,84 @@
+# Copyright (C) 2023, NG:ITL
+"""
+Helpers shared by the tests.
+
+Only QtCore is imported here, so a test can still check what a headless import of the backend loads.
+"""
+import time
+import pynng
+
+from PySide6.QtCore import QCoreApplication, QEventLoop, QSocketNotifier
+
+from control_panel_backend.control_panel import ConfigPublisher, ControlPanel
+from control_panel_backend.control_panel_model import ControlPanelModel
+from control_panel_backend.wire_format import binary_topic
+
+WAIT_TIMEOUT_S = 5.0
+
+
+def qt_application() -> QCoreApplication:
+    """Returns the running application, a QCoreApplication is created for tests that need an event loop."""
+    return QCoreApplication.instance() or QCoreApplication([])
+
+
+def process_events(duration_s: float) -> None:
+    """Runs the event loop of the running application for duration_s, sleeps without one."""
+    app = QCoreApplication.instance()
+    deadline = time.monotonic() + duration_s
+    while True:
+        remaining_s = deadline - time.monotonic()
+        if remaining_s <= 0:
+            return
+        if app is None:
+            time.sleep(remaining_s)
+        else:
+            app.processEvents(QEventLoop.ProcessEventsFlag.AllEvents, max(1, int(remaining_s * 1000)))
+            time.sleep(min(remaining_s, 0.005))
+
+
+def wait_for(condition, timeout_s: float = WAIT_TIMEOUT_S) -> bool:
+    """
+    Waits until condition() is true, queued signals and timers are handled meanwhile.
+
+    Returns:
+    bool: If condition() became true within timeout_s.
+    """
+    deadline = time.monotonic() + timeout_s
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        process_events(0.01)
+    return condition()
+
+
+def driver_input_panel(directory: str) -> ControlPanel:
+    """
+    Builds a ControlPanel with only its driver input path, the config publisher and telemetry recording.
+
+    ControlPanel() creates the application and binds the fixed addresses of a running panel, this one
+    publishes the config on ipc://<directory>/control_panel.ipc and reads driver input from
+    ipc://<directory>/driver_input_reader.ipc. close_driver_input_panel releases the sockets.
+    """
+    panel = ControlPanel.__new__(ControlPanel)
+    panel.control_panel_model = ControlPanelModel()
+    panel.driver_input_listeners = []
+    panel.driver_input_received = 0
+    panel.driver_input_coalesced = 0
+    panel.telemetry_recorder = None
+
+    pub = pynng.Pub0(listen=f"ipc://{directory}/control_panel.ipc")
+    panel.config_publisher = ConfigPublisher(panel.control_panel_model, pub, keep_alive_interval_ms=0)
+
+    receiver = pynng.Sub0(topics=["driver_input", binary_topic("driver_input")])
+    receiver.dial(f"ipc://{directory}/driver_input_reader.ipc", block=False)
+    setattr(panel, "_ControlPanel__driver_input_receiver", receiver)
+    panel._notifier = QSocketNotifier(receiver.recv_fd, QSocketNotifier.Type.Read)
+    panel._notifier.activated.connect(panel.handle_driver_input)  # type: ignore
+    return panel
+
+
+def close_driver_input_panel(panel: ControlPanel) -> None:
+    panel.stop_telemetry_recording()
+    panel._notifier.setEnabled(False)
+    panel.config_publisher._pub.close()
+    getattr(panel, "_ControlPanel__driver_input_receiver").close()
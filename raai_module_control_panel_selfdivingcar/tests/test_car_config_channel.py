@@ -0,0 +1,218 @@
+# Copyright (C) 2023, NG:ITL
+import json
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import pynng
+
+from control_panel_backend.car_config_channel import CarConfigChannel
+from control_panel_backend.car_config_receiver import CAR_CONFIG_TOPIC, CarConfigReceiver, LocalCarStandIn
+
+from tests.helpers import qt_application, wait_for
+
+APP = qt_application()
+
+STATE = {
+    "start": False,
+    "stream": False,
+    "motor": False,
+    "process": False,
+    "debug": False,
+    "curvespeed": 10,
+    "straightlinespeed": 20,
+}
+
+
+def delta_message(epoch: str, seq: int, delta: dict) -> bytes:
+    return (CAR_CONFIG_TOPIC + " " + json.dumps({"epoch": epoch, "seq": seq, "delta": delta})).encode()
+
+
+class TestCarConfigChannel(unittest.TestCase):
+    def setUp(self) -> None:
+        self.directory = tempfile.mkdtemp(prefix="raai_test_")
+        self.pub_address = f"ipc://{self.directory}/car_config.ipc"
+        self.ack_address = f"ipc://{self.directory}/car_config_ack.ipc"
+        self.channels: list = []
+        self.cars: list = []
+        self.timeouts: list = []
+
+    def tearDown(self) -> None:
+        for car in self.cars:
+            car.stop()
+        for channel in self.channels:
+            channel.close()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def start_channel(self, state=STATE) -> CarConfigChannel:
+        channel = CarConfigChannel(self.pub_address, self.ack_address, state, ack_timeout_ms=2000)
+        channel.ack_timed_out.connect(self.timeouts.append)
+        self.channels.append(channel)
+        return channel
+
+    def stop_channel(self, channel: CarConfigChannel) -> None:
+        channel.close()
+        self.channels.remove(channel)
+
+    def start_car(self) -> LocalCarStandIn:
+        car = LocalCarStandIn(self.pub_address, self.ack_address)
+        car.start()
+        self.cars.append(car)
+        return car
+
+    def wait_connected(self, channel: CarConfigChannel, car: LocalCarStandIn) -> None:
+        # deltas published before the car's subscriber is connected are lost
+        self.assertTrue(wait_for(lambda: car.receiver.epoch == channel.epoch and len(channel._pub.pipes) == 1))
+
+    def test_deltas_are_applied_and_acknowledged(self):
+        channel = self.start_channel()
+        car = self.start_car()
+        self.wait_connected(channel, car)
+        self.assertEqual(car.receiver.state, STATE)
+
+        channel.send_delta({"motor": True})
+        self.assertEqual(channel.send_delta({"curvespeed": 15, "debug": True}), 2)
+        self.assertTrue(wait_for(lambda: channel.get_acked_seq() == 2))
+        self.assertEqual(car.receiver.state, channel.get_state())
+        self.assertEqual(car.changes[-2:], [{"motor": True}, {"curvespeed": 15, "debug": True}])
+        self.assertEqual(car.receiver.resyncs, 1)
+        self.assertEqual(self.timeouts, [])
+
+    def test_unacknowledged_delta_times_out(self):
+        channel = self.start_channel()
+        channel.ack_timeout_ms = 50
+        channel.send_delta({"motor": True})
+        self.assertTrue(wait_for(lambda: self.timeouts == [1]))
+
+    def request(self, req: pynng.Req0, message: dict) -> dict:
+        """Sends a request to the channel, its replies are only sent while the event loop runs."""
+        req.send(json.dumps(message).encode())
+        replies: list = []
+
+        def received() -> bool:
+            try:
+                replies.append(json.loads(req.recv(block=False)))
+            except pynng.TryAgain:
+                return False
+            return True
+
+        self.assertTrue(wait_for(received))
+        return replies[0]
+
+    def test_ack_of_another_epoch_is_ignored(self):
+        channel = self.start_channel()
+        channel.send_delta({"motor": True})
+        with pynng.Req0(dial=self.ack_address) as req:
+            # a car that was synced with the panel before its restart
+            self.assertEqual(self.request(req, {"epoch": "old", "ack": 1}), {"epoch": channel.epoch, "seq": 1})
+            self.assertEqual(channel.get_acked_seq(), 0)
+
+            self.request(req, {"epoch": channel.epoch, "ack": 1})
+            self.assertEqual(channel.get_acked_seq(), 1)
+            self.assertEqual(self.request(req, {"snapshot": True})["state"], channel.get_state())
+
+    def test_restarted_panel_resyncs_the_car(self):
+        channel = self.start_channel()
+        car = self.start_car()
+        self.wait_connected(channel, car)
+        for speed in (11, 12, 13):
+            channel.send_delta({"curvespeed": speed})
+        self.assertTrue(wait_for(lambda: channel.get_acked_seq() == 3))
+        self.stop_channel(channel)
+
+        # the restarted panel counts from 1 again, with a state the car doesn't have yet
+        restarted = self.start_channel(dict(STATE, motor=True, straightlinespeed=30))
+        self.assertNotEqual(restarted.epoch, channel.epoch)
+        self.assertTrue(wait_for(lambda: len(restarted._pub.pipes) == 1))
+        self.assertEqual(restarted.send_delta({"stream": True}), 1)
+
+        self.assertTrue(wait_for(lambda: restarted.get_acked_seq() == 1))
+        self.assertEqual(car.receiver.state, restarted.get_state())
+        self.assertEqual(car.receiver.epoch, restarted.epoch)
+        self.assertEqual(car.receiver.resyncs, 2)
+
+        # the new sequence is followed as deltas again
+        restarted.send_delta({"curvespeed": 4})
+        self.assertTrue(wait_for(lambda: restarted.get_acked_seq() == 2))
+        self.assertEqual(car.receiver.state, restarted.get_state())
+        self.assertEqual(car.receiver.resyncs, 2)
+        self.assertEqual(self.timeouts, [])
+
+
+class TestCarConfigReceiver(unittest.TestCase):
+    def setUp(self) -> None:
+        self.directory = tempfile.mkdtemp(prefix="raai_test_")
+        self.changes: list = []
+        self.receiver = CarConfigReceiver(
+            f"ipc://{self.directory}/car_config.ipc",
+            f"ipc://{self.directory}/car_config_ack.ipc",
+            on_change=self.changes.append,
+        )
+        # the panel's answers, a snapshot of epoch "a" at seq 3
+        self.requests: list = []
+        self.snapshot = {"epoch": "a", "seq": 3, "state": dict(STATE)}
+        request = mock.patch.object(self.receiver, "_request", side_effect=self.answer)
+        request.start()
+        self.addCleanup(request.stop)
+        self.assertTrue(self.receiver.resync())
+        del self.requests[:], self.changes[:]
+
+    def tearDown(self) -> None:
+        self.receiver.close()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def answer(self, request: dict) -> dict:
+        self.requests.append(request)
+        if request.get("snapshot"):
+            return self.snapshot
+        return {"epoch": self.snapshot["epoch"], "seq": self.snapshot["seq"]}
+
+    def test_next_delta_is_applied_and_acknowledged(self):
+        self.receiver.handle_message(delta_message("a", 4, {"motor": True}))
+        self.assertEqual(self.receiver.seq, 4)
+        self.assertTrue(self.receiver.state["motor"])
+        self.assertEqual(self.changes, [{"motor": True}])
+        self.assertEqual(self.requests, [{"epoch": "a", "ack": 4}])
+
+    def test_delta_contained_in_the_snapshot_is_skipped(self):
+        self.receiver.handle_message(delta_message("a", 3, {"motor": True}))
+        self.assertEqual(self.receiver.seq, 3)
+        self.assertFalse(self.receiver.state["motor"])
+        self.assertEqual(self.requests, [])
+
+    def test_gap_resyncs(self):
+        self.snapshot = {"epoch": "a", "seq": 6, "state": dict(STATE, motor=True, debug=True)}
+        self.receiver.handle_message(delta_message("a", 6, {"debug": True}))
+        self.assertEqual(self.receiver.seq, 6)
+        self.assertEqual(self.receiver.state, self.snapshot["state"])
+        self.assertEqual(self.receiver.resyncs, 2)
+        self.assertEqual(self.requests, [{"snapshot": True}, {"epoch": "a", "ack": 6}])
+
+    def test_another_epoch_resyncs_even_with_a_lower_seq(self):
+        # the panel was restarted and counts from 1 again
+        self.snapshot = {"epoch": "b", "seq": 1, "state": dict(STATE, stream=True, curvespeed=3)}
+        self.receiver.handle_message(delta_message("b", 1, {"stream": True}))
+        self.assertEqual((self.receiver.epoch, self.receiver.seq), ("b", 1))
+        self.assertEqual(self.receiver.state, self.snapshot["state"])
+        self.assertEqual(self.requests, [{"snapshot": True}, {"epoch": "b", "ack": 1}])
+
+        self.receiver.handle_message(delta_message("b", 2, {"motor": True}))
+        self.assertEqual(self.receiver.seq, 2)
+        self.assertTrue(self.receiver.state["motor"])
+
+    def test_unanswered_resync_is_retried_with_the_next_delta(self):
+        self.snapshot = {"epoch": "b", "seq": 1, "state": dict(STATE, stream=True)}
+        with mock.patch.object(self.receiver, "_request", return_value=None):
+            self.receiver.handle_message(delta_message("b", 1, {"stream": True}))
+        self.assertEqual((self.receiver.epoch, self.receiver.seq), ("a", 3))
+        # run keeps asking for the snapshot
+        self.assertFalse(self.receiver.synced)
+
+        self.receiver.handle_message(delta_message("b", 2, {"motor": True}))
+        self.assertEqual(self.receiver.epoch, "b")
+        self.assertEqual(self.receiver.state, self.snapshot["state"])
+
+
+if __name__ == "__main__":
+    unittest.main()
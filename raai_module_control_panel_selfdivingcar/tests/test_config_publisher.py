@@ -0,0 +1,69 @@
+# Copyright (C) 2023, NG:ITL
+import json
+import shutil
+import tempfile
+import unittest
+
+import pynng
+
+from control_panel_backend.control_panel import ConfigPublisher
+from control_panel_backend.control_panel_model import ControlPanelModel
+from control_panel_backend.wire_format import binary_topic, decode_message
+
+from tests.helpers import process_events, qt_application
+
+APP = qt_application()
+
+
+class TestConfigPublisher(unittest.TestCase):
+    def setUp(self) -> None:
+        self.directory = tempfile.mkdtemp(prefix="raai_test_")
+        address = f"ipc://{self.directory}/control_panel.ipc"
+        self.pub = pynng.Pub0(listen=address)
+        # one subscriber per format, like the car and a consumer that understands wire_format
+        self.json_sub = pynng.Sub0(dial=address, topics="config", recv_timeout=1000)
+        self.binary_sub = pynng.Sub0(dial=address, topics=binary_topic("config"), recv_timeout=1000)
+        self.model = ControlPanelModel()
+        # the subscribers have to be attached before anything is published
+        process_events(0.1)
+
+    def tearDown(self) -> None:
+        for socket in (self.json_sub, self.binary_sub, self.pub):
+            socket.close()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_every_config_is_published_in_both_formats(self):
+        publisher = ConfigPublisher(self.model, self.pub, keep_alive_interval_ms=0)
+        publisher.publish()
+        json_msg = self.json_sub.recv()
+        binary_msg = self.binary_sub.recv()
+
+        self.assertTrue(json_msg.startswith(b"config {"))
+        self.assertTrue(binary_msg.startswith(b"bin.config "))
+        topic, payload = decode_message(json_msg)
+        self.assertEqual(topic, "config")
+        self.assertEqual(payload, json.loads(json_msg[len(b"config ") :]))
+        self.assertEqual(decode_message(binary_msg), ("config", payload))
+
+        self.model.add_max_throttle(5)
+        self.assertEqual(decode_message(self.json_sub.recv())[1], decode_message(self.binary_sub.recv())[1])
+
+    def test_json_only(self):
+        publisher = ConfigPublisher(self.model, self.pub, keep_alive_interval_ms=0, publish_binary=False)
+        publisher.publish()
+        self.assertTrue(self.json_sub.recv().startswith(b"config "))
+        self.binary_sub.recv_timeout = 200
+        with self.assertRaises(pynng.Timeout):
+            self.binary_sub.recv()
+
+    def test_messages_are_encoded_once_per_change(self):
+        publisher = ConfigPublisher(self.model, self.pub, keep_alive_interval_ms=0)
+        messages = publisher.get_messages()
+        self.assertEqual(len(messages), 2)
+        self.assertIs(publisher.get_messages(), messages)
+        self.model.add_max_brake(5)
+        self.assertIsNot(publisher.get_messages(), messages)
+
+
+if __name__ == "__main__":
+    unittest.main()
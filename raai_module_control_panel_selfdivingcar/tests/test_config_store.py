@@ -0,0 +1,102 @@
+# Copyright (C) 2023, NG:ITL
+import os
+import json
+import time
+import shutil
+import tempfile
+import threading
+import unittest
+
+from control_panel_backend.config_store import ConfigStore
+
+from tests.helpers import wait_for
+
+
+class CountingConfigStore(ConfigStore):
+    """Counts the writes to disk and can hold the writer thread inside a write."""
+
+    def __init__(self, *args, write_delay_s: float = 0.0, **kwargs) -> None:
+        self.writes = 0
+        self.write_delay_s = write_delay_s
+        super().__init__(*args, **kwargs)
+
+    def _write(self, data: dict) -> None:
+        time.sleep(self.write_delay_s)
+        super()._write(data)
+        self.writes += 1
+
+
+class TestConfigStore(unittest.TestCase):
+    def setUp(self) -> None:
+        self.directory = tempfile.mkdtemp(prefix="raai_test_")
+        self.path = os.path.join(self.directory, "config.json")
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def read_file(self) -> dict:
+        with open(self.path, "r") as file:
+            return json.load(file)
+
+    def test_defaults_and_file_values(self):
+        with open(self.path, "w") as file:
+            json.dump({"motor": True}, file)
+        store = ConfigStore(self.path, {"motor": False, "debug": False})
+        self.assertEqual(store.snapshot(), {"motor": True, "debug": False})
+        store.close()
+
+    def test_damaged_file_uses_defaults(self):
+        with open(self.path, "w") as file:
+            file.write("{not json")
+        store = ConfigStore(self.path, {"motor": False})
+        self.assertEqual(store.get("motor"), False)
+        store.close()
+
+    def test_writes_behind_without_flush(self):
+        store = ConfigStore(self.path, batch_interval_s=0.01)
+        store.set("curvespeed", 0.5)
+        self.assertTrue(wait_for(lambda: os.path.exists(self.path) and self.read_file() == {"curvespeed": 0.5}))
+        store.close()
+
+    def test_burst_is_one_write(self):
+        store = CountingConfigStore(self.path, batch_interval_s=0.1)
+        for i in range(50):
+            store.set("curvespeed", i)
+        self.assertTrue(wait_for(lambda: store.writes == 1))
+        time.sleep(0.2)
+        self.assertEqual(store.writes, 1)
+        self.assertEqual(self.read_file(), {"curvespeed": 49})
+        store.close()
+
+    def test_unchanged_value_is_not_written(self):
+        store = CountingConfigStore(self.path, batch_interval_s=0.01)
+        store.set("motor", True)
+        self.assertTrue(wait_for(lambda: store.writes == 1))
+        store.set("motor", True)
+        time.sleep(0.1)
+        self.assertEqual(store.writes, 1)
+        store.close()
+
+    def test_change_during_write_is_written(self):
+        # the writer clears its wake-up before the write, a change arriving meanwhile wakes it again
+        store = CountingConfigStore(self.path, batch_interval_s=0.01, write_delay_s=0.2)
+        store.set("curvespeed", 1)
+        self.assertTrue(wait_for(lambda: store._write_lock.locked()))
+        store.set("curvespeed", 2)
+        self.assertTrue(wait_for(lambda: store.writes == 2 and self.read_file() == {"curvespeed": 2}))
+        store.close()
+
+    def test_close_during_batch_sleep(self):
+        store = ConfigStore(self.path, batch_interval_s=0.2)
+        store.set("motor", True)
+        # the writer is in its batch sleep when close() wakes it, the wake-up must not be cleared away
+        time.sleep(0.05)
+        closing = threading.Thread(target=store.close, daemon=True)
+        closing.start()
+        closing.join(2.0)
+        self.assertFalse(closing.is_alive(), "close() hangs")
+        self.assertEqual(self.read_file(), {"motor": True})
+
+
+if __name__ == "__main__":
+    unittest.main()
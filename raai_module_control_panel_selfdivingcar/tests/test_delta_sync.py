@@ -0,0 +1,157 @@
+# Copyright (C) 2023, NG:ITL
+import os
+import json
+import shutil
+import tempfile
+import unittest
+
+from control_panel_backend.database_interface_model import DriverDataPublisher
+from control_panel_backend.driver_database_stub import DriverDatabaseStub, generate_drivers
+from control_panel_backend.driver_index import driver_id
+
+from tests.helpers import qt_application, wait_for
+
+APP = qt_application()
+
+
+class LegacyDatabaseStub(DriverDatabaseStub):
+    """A service from before get_drivers_since."""
+
+    def handle(self, request: str) -> str:
+        if request.startswith("get_drivers_since"):
+            return "Error"
+        return super().handle(request)
+
+
+class TestDeltaSync(unittest.TestCase):
+    def setUp(self) -> None:
+        self.directory = tempfile.mkdtemp(prefix="raai_test_")
+        self.req_address = f"ipc://{self.directory}/rest_api.ipc"
+        self.pub_address = f"ipc://{self.directory}/driver_data.ipc"
+        self.cache_path = os.path.join(self.directory, "driver_cache.sqlite")
+        self.stubs: list = []
+        self.publishers: list = []
+
+    def tearDown(self) -> None:
+        for publisher in self.publishers:
+            publisher.close()
+        for stub in self.stubs:
+            stub.close()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def start_stub(self, drivers=(), stub_type=DriverDatabaseStub, **kwargs) -> DriverDatabaseStub:
+        stub = stub_type(self.req_address, drivers, **kwargs).start()
+        self.stubs.append(stub)
+        return stub
+
+    def stop_stub(self, stub: DriverDatabaseStub) -> None:
+        stub.close()
+        self.stubs.remove(stub)
+
+    def start_publisher(self, cache_path=None) -> DriverDataPublisher:
+        publisher = DriverDataPublisher(self.pub_address, self.req_address, timeout_ms=500, cache_path=cache_path)
+        self.publishers.append(publisher)
+        return publisher
+
+    def stop_publisher(self, publisher: DriverDataPublisher) -> None:
+        publisher.close()
+        self.publishers.remove(publisher)
+
+    def refresh(self, publisher: DriverDataPublisher) -> None:
+        publisher.refresh_driver()
+        self.assertTrue(wait_for(lambda: str(publisher.status).startswith("Refreshed")), publisher.status)
+
+    def assert_synced(self, publisher: DriverDataPublisher, stub: DriverDatabaseStub) -> None:
+        expected = {driver_id(driver): driver for driver in stub.drivers_since(0)["drivers"]}
+        self.assertEqual({driver_id(driver): driver for driver in publisher.all_drivers()}, expected)
+
+    def test_stub_answers_another_epoch_with_a_snapshot(self):
+        stub = self.start_stub(generate_drivers(3))
+        stub.add_driver("Ann")
+        self.assertFalse(stub.drivers_since(3, stub.epoch)["full"])
+        self.assertEqual(len(stub.drivers_since(3, stub.epoch)["drivers"]), 1)
+        self.assertTrue(stub.drivers_since(3, "other")["full"])
+        self.assertTrue(stub.drivers_since(3)["full"])
+        self.assertTrue(stub.drivers_since(9, stub.epoch)["full"])
+
+    def test_full_snapshot_then_deltas(self):
+        stub = self.start_stub(generate_drivers(20))
+        publisher = self.start_publisher()
+        self.refresh(publisher)
+        self.assertEqual(publisher.status, "Refreshed drivers")
+        self.assert_synced(publisher, stub)
+
+        drivers = publisher.all_drivers()
+        stub.add_driver("Ann")
+        stub.update_driver(dict(drivers[0], name="Renamed"))
+        stub.delete_driver(driver_id(drivers[1]))
+        self.refresh(publisher)
+        self.assertEqual(publisher.status, "Refreshed drivers, 3 changed")
+        self.assert_synced(publisher, stub)
+
+        self.refresh(publisher)
+        self.assertEqual(publisher.status, "Refreshed drivers, 0 changed")
+
+    def test_behind_the_history_gets_a_full_snapshot(self):
+        stub = self.start_stub(generate_drivers(5), history_limit=2)
+        publisher = self.start_publisher()
+        self.refresh(publisher)
+        for i in range(10):
+            stub.add_driver(f"Driver {i}")
+        self.refresh(publisher)
+        self.assertEqual(publisher.status, "Refreshed drivers")
+        self.assert_synced(publisher, stub)
+
+    def test_restarted_service_replaces_the_drivers(self):
+        stub = self.start_stub(generate_drivers(3))
+        publisher = self.start_publisher()
+        self.refresh(publisher)
+        self.stop_stub(stub)
+
+        # a revision the old run already handed out, with other drivers
+        restarted = self.start_stub(generate_drivers(5))
+        self.assertNotEqual(restarted.epoch, stub.epoch)
+        self.refresh(publisher)
+        self.assertEqual(publisher.status, "Refreshed drivers")
+        self.assert_synced(publisher, restarted)
+
+    def test_delta_of_another_epoch_is_not_merged(self):
+        stub = self.start_stub(generate_drivers(3))
+        publisher = self.start_publisher()
+        self.refresh(publisher)
+
+        ghost = {"id": "ghost", "name": "Ghost", "email": "", "created": "2023-01-01-00-00-00"}
+        publisher.handle_delta_response(
+            json.dumps({"epoch": "other", "revision": 99, "full": False, "drivers": [ghost], "deleted": []})
+        )
+        self.assertTrue(wait_for(lambda: publisher.status == "Refreshed drivers"), publisher.status)
+        self.assert_synced(publisher, stub)
+
+    def test_service_without_deltas_falls_back_to_get_drivers(self):
+        stub = self.start_stub(generate_drivers(4), stub_type=LegacyDatabaseStub)
+        publisher = self.start_publisher()
+        publisher.refresh_driver()
+        self.assertTrue(wait_for(lambda: len(publisher.all_drivers()) == 4), publisher.status)
+        self.assert_synced(publisher, stub)
+
+    def test_cache_of_a_restarted_service_is_replaced(self):
+        stub = self.start_stub(generate_drivers(3))
+        publisher = self.start_publisher(self.cache_path)
+        publisher.load_cache()
+        self.assertTrue(wait_for(lambda: publisher.status == "Refreshed drivers"), publisher.status)
+        self.stop_publisher(publisher)
+        self.stop_stub(stub)
+
+        restarted = self.start_stub(generate_drivers(6))
+        publisher = self.start_publisher(self.cache_path)
+        shown: list = []
+        publisher.driversChanged.connect(lambda: shown.append(len(publisher.all_drivers())))
+        publisher.load_cache()
+        self.assertTrue(wait_for(lambda: publisher.status == "Refreshed drivers"), publisher.status)
+        # the cached drivers first, then all drivers of the new run
+        self.assertEqual(shown[0], 3)
+        self.assert_synced(publisher, restarted)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,138 @@
+# Copyright (C) 2023, NG:ITL
+import random
+import unittest
+
+from control_panel_backend.driver_index import (
+    FUZZY_MIN_SIMILARITY,
+    DriverIndex,
+    driver_id,
+    normalize_name,
+    trigrams,
+)
+
+
+def reference_match(name: str, query: str) -> int:
+    if name == query:
+        return 0
+    if name.startswith(query):
+        return 1
+    if any(word.startswith(query) for word in name.split()):
+        return 2
+    if len(query) >= 3 and query in name:
+        return 3
+    return -1
+
+
+def reference_search(drivers: dict, query: str):
+    """
+    Searches by checking every driver.
+
+    Returns:
+    tuple: The matches in their order, or None and the shared trigram count by id of the fuzzy matches.
+    """
+    query = normalize_name(query)
+    if not query:
+        return [], {}
+    names = {key: normalize_name(driver["name"]) for key, driver in drivers.items()}
+    matches = [(reference_match(names[key], query), key) for key in drivers]
+    matches = [(match, key) for match, key in matches if match >= 0]
+    if matches:
+        matches.sort(key=lambda match: (match[0], tuple(-ord(c) for c in drivers[match[1]]["created"])))
+        return [drivers[key] for _, key in matches], {}
+    if len(query) < 3:
+        return [], {}
+    query_trigrams = trigrams(query)
+    shared = {key: len(query_trigrams & trigrams(name)) for key, name in names.items()}
+    return None, {
+        key: count for key, count in shared.items() if count and count >= FUZZY_MIN_SIMILARITY * len(query_trigrams)
+    }
+
+
+class TestDriverIndex(unittest.TestCase):
+    def setUp(self) -> None:
+        self.index = DriverIndex(
+            [
+                {"id": "1", "name": "Ann Marie", "created": "2023-01-01"},
+                {"id": "2", "name": "Zoë  Anders", "created": "2023-01-02"},
+                {"id": "3", "name": "Bob Hannon", "created": "2023-01-03"},
+                {"id": "4", "name": "ann", "created": "2023-01-04"},
+            ]
+        )
+
+    def names(self, query: str, limit=None) -> list:
+        return [driver["name"] for driver in self.index.search(query, limit)]
+
+    def test_normalize_name(self):
+        self.assertEqual(normalize_name(" Zoë  Ann "), "zoe ann")
+
+    def test_exact_prefix_word_prefix_and_substring(self):
+        self.assertEqual(self.names("ann"), ["ann", "Ann Marie", "Bob Hannon"])
+        self.assertEqual(self.names("an"), ["ann", "Ann Marie", "Zoë  Anders"])
+        self.assertEqual(self.names("zoe a"), ["Zoë  Anders"])
+        self.assertEqual(self.names("ANN", limit=1), ["ann"])
+        self.assertEqual(self.names(""), [])
+
+    def test_typo_is_a_fuzzy_match(self):
+        self.assertEqual(self.names("hannen"), ["Bob Hannon"])
+        self.assertEqual(self.names("xyz"), [])
+
+    def test_typing_narrows_and_deleting_widens(self):
+        self.assertEqual(self.names("b"), ["Bob Hannon"])
+        self.assertEqual(self.names("bo"), ["Bob Hannon"])
+        self.assertEqual(self.names("a"), ["ann", "Ann Marie", "Zoë  Anders"])
+
+    def test_add_update_and_remove(self):
+        self.assertEqual(self.names("ma"), ["Ann Marie"])
+        self.index.add({"id": "5", "name": "Mara", "created": "2023-01-05"})
+        self.assertEqual(self.names("ma"), ["Mara", "Ann Marie"])
+        self.index.add({"id": "1", "name": "Ann Lee", "created": "2023-01-01"})
+        self.assertEqual(self.names("ma"), ["Mara"])
+        self.index.remove("5")
+        self.assertEqual(self.names("ma"), [])
+        self.assertNotIn("5", self.index)
+        self.assertEqual(len(self.index), 4)
+
+    def test_driver_without_id(self):
+        index = DriverIndex([{"name": "Ann"}])
+        self.assertEqual(driver_id(index.search("ann")[0]), "Ann")
+
+    def test_random_against_reference(self):
+        rng = random.Random(21)
+        syllables = ["an", "na", "bo", "lé", "ma", "ri", "e", " "]
+        drivers: dict = {}
+        index = DriverIndex()
+        query = ""
+        for step in range(3000):
+            action = rng.random()
+            if action < 0.15 or not drivers:
+                key = str(rng.randint(0, 40))
+                name = "".join(rng.choice(syllables) for _ in range(rng.randint(1, 5))).strip() or "x"
+                drivers[key] = {"id": key, "name": name, "created": f"{step:05d}"}
+                index.add(drivers[key])
+            elif action < 0.2:
+                key = rng.choice(list(drivers))
+                del drivers[key]
+                index.remove(key)
+            elif action < 0.22:
+                index.replace(list(drivers.values()))
+            else:
+                # mostly typing on or deleting from the last query, like in the search field
+                if rng.random() < 0.6 and len(query) < 8:
+                    query += rng.choice(syllables)
+                elif rng.random() < 0.7:
+                    query = query[:-1]
+                else:
+                    query = rng.choice(syllables)
+                expected, fuzzy = reference_search(drivers, query)
+                results = index.search(query)
+                if expected is not None:
+                    self.assertEqual(results, expected, query)
+                else:
+                    self.assertEqual({driver_id(driver) for driver in results}, set(fuzzy), query)
+                    counts = [fuzzy[driver_id(driver)] for driver in results]
+                    self.assertEqual(counts, sorted(counts, reverse=True), query)
+            self.assertEqual(len(index), len(drivers))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,90 @@
+# Copyright (C) 2023, NG:ITL
+import shutil
+import tempfile
+import time
+import unittest
+
+import pynng
+
+from control_panel_backend.control_panel import encode_data
+
+from tests.helpers import close_driver_input_panel, driver_input_panel, qt_application, wait_for
+
+APP = qt_application()
+
+# fewer than the subscriber's receive buffer holds
+QUEUED_SAMPLES = 20
+
+
+def driver_input(i: int) -> dict:
+    return {
+        "throttle": i / 100,
+        "brake": 0.5,
+        "clutch": 0.25,
+        "steering": -i / 100,
+        "tilt_x": 0.0,
+        "tilt_y": 0.0,
+        "vibration": 0.0,
+    }
+
+
+class TestDriverInputCoalescing(unittest.TestCase):
+    def setUp(self) -> None:
+        self.directory = tempfile.mkdtemp(prefix="raai_test_")
+        self.addCleanup(shutil.rmtree, self.directory, True)
+        # the platform's publisher, the panel dials it
+        self.platform = pynng.Pub0(listen=f"ipc://{self.directory}/driver_input_reader.ipc")
+        self.addCleanup(self.platform.close)
+
+        self.panel = driver_input_panel(self.directory)
+        self.addCleanup(close_driver_input_panel, self.panel)
+        self.panel.control_panel_model.set_max_throttle(50)
+        self.panel.control_panel_model.set_max_steering(20)
+        self.batches: list = []
+        self.panel.driver_input_listeners.append(self.batches.append)
+        self.assertTrue(wait_for(lambda: len(self.platform.pipes) == 1))
+
+    def publish(self, samples: list) -> None:
+        """Sends samples without running the event loop, so they queue up in the panel's subscriber."""
+        for i, sample in enumerate(samples):
+            self.platform.send(encode_data(sample, "driver_input", binary=bool(i % 2)))
+        time.sleep(0.1)
+
+    def test_queued_samples_are_handled_at_once(self):
+        samples = [driver_input(i) for i in range(QUEUED_SAMPLES)]
+        self.publish(samples)
+        self.assertTrue(wait_for(lambda: self.batches))
+
+        # one handler call for the whole queue, the listeners get every sample
+        self.assertEqual(self.batches, [samples])
+        stats = self.panel.get_driver_input_stats()
+        self.assertEqual(stats, {"received": QUEUED_SAMPLES, "coalesced": QUEUED_SAMPLES - 1, "displayed": 1})
+
+        # the newest sample is shown
+        model = self.panel.control_panel_model
+        self.assertEqual(model.get_actual_throttle(), samples[-1]["throttle"])
+        self.assertAlmostEqual(model.get_throttle(), samples[-1]["throttle"] * 0.5)
+        self.assertAlmostEqual(model.get_steering(), samples[-1]["steering"] * 0.2)
+
+    def test_every_burst_is_handled(self):
+        self.publish([driver_input(i) for i in range(5)])
+        self.assertTrue(wait_for(lambda: len(self.batches) == 1))
+        self.publish([driver_input(i) for i in range(5, 8)])
+        self.assertTrue(wait_for(lambda: len(self.batches) == 2))
+
+        self.assertEqual([len(batch) for batch in self.batches], [5, 3])
+        self.assertEqual(self.panel.get_driver_input_stats()["coalesced"], 4 + 2)
+        self.assertEqual(self.panel.control_panel_model.get_actual_throttle(), 0.07)
+
+    def test_undecodable_messages_are_skipped(self):
+        self.platform.send(encode_data(driver_input(1), "driver_input"))
+        self.platform.send(b"driver_input {not json")
+        self.platform.send(encode_data(driver_input(2), "driver_input", binary=True))
+        time.sleep(0.1)
+        self.assertTrue(wait_for(lambda: self.batches))
+        self.assertEqual(self.batches, [[driver_input(1), driver_input(2)]])
+        self.assertEqual(self.panel.get_driver_input_stats()["coalesced"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,82 @@
+# Copyright (C) 2023, NG:ITL
+import random
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from control_panel_backend.driver_input_scaling import (
+    driver_input_to_array,
+    scale_driver_input,
+    scale_driver_input_sample,
+)
+from control_panel_backend.session_replay import scale_recorded_driver_input
+from control_panel_backend.telemetry_recorder import TelemetryRecorder, load_session
+from control_panel_backend.wire_format import DRIVER_INPUT_FIELDS
+
+
+class TestDriverInputScaling(unittest.TestCase):
+    def test_sample(self):
+        payload = {"throttle": 1.0, "brake": 0.5, "clutch": 0.0, "steering": -1.0}
+        self.assertEqual(scale_driver_input_sample(payload, 50, 100, 100, 25, 0.1), (0.5, 0.5, 0.0, -0.15))
+
+    def test_sample_scales_like_a_batch(self):
+        rng = random.Random(12)
+        payloads = [{field: rng.uniform(-1, 1) for field in DRIVER_INPUT_FIELDS} for _ in range(200)]
+        for _ in range(20):
+            maxima = [rng.uniform(0, 100) for _ in range(4)]
+            steering_offset = rng.choice([0.0, rng.uniform(-1, 1)])
+            batch = scale_driver_input(driver_input_to_array(payloads), *maxima, steering_offset=steering_offset)
+            for payload, scaled in zip(payloads, batch):
+                # the same float operations, the results are identical and not only close
+                self.assertEqual(scale_driver_input_sample(payload, *maxima, steering_offset), tuple(scaled))
+
+    def test_missing_fields_are_zero(self):
+        samples = driver_input_to_array([{"throttle": 1.0}])
+        self.assertEqual(tuple(scale_driver_input(samples, 100, 100, 100, 100)[0]), (1.0, 0.0, 0.0, 0.0))
+
+    def test_recording_is_scaled_with_the_config_of_each_sample(self):
+        directory = tempfile.mkdtemp(prefix="raai_test_")
+        self.addCleanup(shutil.rmtree, directory, True)
+        rng = random.Random(3)
+        recorder = TelemetryRecorder(directory, segment_records=16, session="scaling")
+
+        # each config with the max values the samples after it are scaled with
+        configs = [
+            (None, (100.0, 100.0, 100.0, 100.0)),
+            (
+                {
+                    "max_throttle": 50.0,
+                    "max_brake": 20.0,
+                    "max_clutch": 80.0,
+                    "max_steering": 40.0,
+                    "steering_offset": 0,
+                },
+                (50.0, 20.0, 80.0, 40.0),
+            ),
+            # without pedals only the steering changes, the pedals keep the max values of the config before
+            (
+                {"throttle": 0.0, "brake": 0.0, "clutch": 0.0, "steering": 10.0, "steering_offset": 0},
+                (50.0, 20.0, 80.0, 10.0),
+            ),
+        ]
+        expected = []
+        for config, maxima in configs:
+            if config is not None:
+                recorder.record_sent("config", config)
+            # several batches, a segment rollover included
+            for _ in range(3):
+                payloads = [{field: rng.uniform(-1, 1) for field in DRIVER_INPUT_FIELDS} for _ in range(3)]
+                recorder.record_driver_input(payloads)
+                expected += [scale_driver_input_sample(payload, *maxima) for payload in payloads]
+        recorder.close()
+
+        records = np.concatenate(load_session(directory, "scaling"))
+        scaled = scale_recorded_driver_input(records)
+        self.assertEqual([tuple(row) for row in scaled], expected)
+        self.assertEqual(len(scale_recorded_driver_input(records[:0])), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,133 @@
+# Copyright (C) 2023, NG:ITL
+import random
+import unittest
+
+from PySide6.QtTest import QAbstractItemModelTester
+
+from control_panel_backend.driver_index import driver_id
+from control_panel_backend.driver_list_model import (
+    DRIVER_ID_ROLE,
+    DRIVER_NAME_ROLE,
+    DriverFilterModel,
+    DriverListModel,
+)
+
+from tests.helpers import qt_application
+
+APP = qt_application()
+
+
+def reference_order(drivers: dict) -> list:
+    """The drivers newest first, by sorting all of them."""
+    return sorted(drivers.values(), key=lambda driver: (driver.get("created", ""), driver_id(driver)), reverse=True)
+
+
+class TestDriverListModel(unittest.TestCase):
+    def setUp(self) -> None:
+        self.model = DriverListModel(
+            [
+                {"id": "1", "name": "Ann", "created": "2023-01-01"},
+                {"id": "3", "name": "Cid", "created": "2023-01-03"},
+                {"id": "2", "name": "Bob", "created": "2023-01-02"},
+            ]
+        )
+        self.tester = QAbstractItemModelTester(self.model, QAbstractItemModelTester.FailureReportingMode.Fatal)
+
+    def names(self) -> list:
+        return [self.model.data(self.model.index(row), DRIVER_NAME_ROLE) for row in range(self.model.rowCount())]
+
+    def test_newest_first(self):
+        self.assertEqual(self.names(), ["Cid", "Bob", "Ann"])
+        self.assertEqual(self.model.data(self.model.index(0), DRIVER_ID_ROLE), "3")
+        self.assertEqual(self.model.row_of("1"), 2)
+        self.assertEqual(self.model.row_of("9"), -1)
+
+    def test_upsert_inserts_one_row(self):
+        inserted: list = []
+        self.model.rowsInserted.connect(lambda parent, first, last: inserted.append((first, last)))
+        self.model.upsert({"id": "4", "name": "Dee", "created": "2023-01-02T12"})
+        self.assertEqual(inserted, [(1, 1)])
+        self.assertEqual(self.names(), ["Cid", "Dee", "Bob", "Ann"])
+
+    def test_upsert_updates_in_place(self):
+        changed: list = []
+        self.model.dataChanged.connect(lambda top, bottom: changed.append(top.row()))
+        self.model.upsert({"id": "2", "name": "Bobby", "created": "2023-01-02"})
+        self.assertEqual(changed, [1])
+        self.assertEqual(self.names(), ["Cid", "Bobby", "Ann"])
+
+    def test_upsert_moves_a_changed_created_time(self):
+        self.model.upsert({"id": "1", "name": "Ann", "created": "2023-01-04"})
+        self.assertEqual(self.names(), ["Ann", "Cid", "Bob"])
+        self.assertEqual(len(self.model), 3)
+
+    def test_remove(self):
+        removed: list = []
+        self.model.rowsRemoved.connect(lambda parent, first, last: removed.append((first, last)))
+        self.model.remove("2")
+        self.model.remove("9")
+        self.assertEqual(removed, [(1, 1)])
+        self.assertEqual(self.names(), ["Cid", "Ann"])
+        self.assertIsNone(self.model.get("2"))
+
+    def test_filter_ranks_and_follows_the_source(self):
+        proxy = DriverFilterModel(self.model)
+        proxy_tester = QAbstractItemModelTester(proxy, QAbstractItemModelTester.FailureReportingMode.Fatal)
+        self.assertEqual([driver["name"] for driver in proxy.drivers()], ["Cid", "Bob", "Ann"])
+        proxy.set_ranking({"1": 0, "3": 1})
+        self.assertEqual([driver["name"] for driver in proxy.drivers()], ["Ann", "Cid"])
+        self.model.remove("1")
+        self.assertEqual([driver["name"] for driver in proxy.drivers()], ["Cid"])
+        proxy.set_ranking(None)
+        self.assertEqual([driver["name"] for driver in proxy.drivers()], ["Cid", "Bob"])
+        del proxy_tester
+
+    def test_random_against_reference(self):
+        rng = random.Random(22)
+        model = DriverListModel()
+        tester = QAbstractItemModelTester(model, QAbstractItemModelTester.FailureReportingMode.Fatal)
+        proxy = DriverFilterModel(model)
+        proxy_tester = QAbstractItemModelTester(proxy, QAbstractItemModelTester.FailureReportingMode.Fatal)
+        drivers: dict = {}
+        ranks = None
+
+        for step in range(1500):
+            action = rng.random()
+            if action < 0.5:
+                key = str(rng.randint(0, 30))
+                # few distinct created times, equal ones are ordered by id
+                driver = {"id": key, "name": f"driver {key} {step}", "created": f"{rng.randint(0, 9)}"}
+                drivers[key] = driver
+                model.upsert(driver)
+            elif action < 0.8:
+                key = str(rng.randint(0, 30))
+                drivers.pop(key, None)
+                model.remove(key)
+            elif action < 0.82:
+                model.set_drivers(list(drivers.values()))
+            else:
+                if rng.random() < 0.2:
+                    ranks = None
+                else:
+                    keys = rng.sample(range(31), rng.randint(0, 10))
+                    ranks = {str(key): rank for rank, key in enumerate(keys)}
+                proxy.set_ranking(ranks)
+
+            expected = reference_order(drivers)
+            self.assertEqual(model.drivers(), expected)
+            self.assertEqual([model.driver(row) for row in range(model.rowCount())], expected)
+            self.assertTrue(all(model.row_of(driver_id(driver)) == row for row, driver in enumerate(expected)))
+            self.assertTrue(model.has_drivers(expected))
+            if ranks is None:
+                self.assertEqual(proxy.drivers(), expected)
+            else:
+                shown = sorted(
+                    (driver for driver in expected if driver_id(driver) in ranks),
+                    key=lambda driver: ranks[driver_id(driver)],
+                )
+                self.assertEqual(proxy.drivers(), shown)
+        del tester, proxy_tester
+
+
+if __name__ == "__main__":
+    unittest.main()
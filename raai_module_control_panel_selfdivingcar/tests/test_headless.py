@@ -0,0 +1,42 @@
+# Copyright (C) 2023, NG:ITL
+import os
+import sys
+import subprocess
+import unittest
+
+PACKAGE_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# imports the backend like main.py --headless and runs the lap timer, then lists the Qt modules loaded
+HEADLESS_SCRIPT = """
+import sys
+from PySide6.QtCore import QCoreApplication
+import main
+from control_panel_backend.lap_timer import LAP_TIMER_DEFAULT_REFRESH_HZ, LapTimer, display_refresh_hz
+from control_panel_backend.timer_model import Timer
+
+app = QCoreApplication([])
+timer = LapTimer(Timer(0, 0, 0))
+assert timer.refresh_hz == display_refresh_hz() == LAP_TIMER_DEFAULT_REFRESH_HZ
+print(" ".join(sorted(name for name in sys.modules if name.startswith("PySide6.Qt"))))
+"""
+
+
+class TestHeadless(unittest.TestCase):
+    def test_headless_import_doesnt_load_qtgui(self):
+        # a fresh interpreter, other tests load QtGui through QtTest
+        result = subprocess.run(
+            [sys.executable, "-c", HEADLESS_SCRIPT],
+            cwd=PACKAGE_DIRECTORY,
+            capture_output=True,
+            text=True,
+            timeout=60,
+        )
+        self.assertEqual(result.returncode, 0, result.stderr)
+        modules = result.stdout.split()
+        self.assertIn("PySide6.QtCore", modules)
+        self.assertNotIn("PySide6.QtGui", modules)
+        self.assertNotIn("PySide6.QtQml", modules)
+
+
+if __name__ == "__main__":
+    unittest.main()
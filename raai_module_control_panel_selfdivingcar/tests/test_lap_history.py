@@ -0,0 +1,190 @@
+# Copyright (C) 2023, NG:ITL
+import random
+import unittest
+
+from PySide6.QtTest import QAbstractItemModelTester
+
+from control_panel_backend.lap_history import (
+    LAP_BEST_ROLE,
+    LAP_DELTA_ROLE,
+    LAP_NUMBER_ROLE,
+    LapHistory,
+    LapListModel,
+    format_delta,
+    format_lap,
+)
+
+from tests.helpers import qt_application
+
+APP = qt_application()
+
+
+class ReferenceHistory:
+    """The laps of a driver in a plain list, every value computed by scanning it."""
+
+    def __init__(self, capacity: int, average_window: int) -> None:
+        self.capacity = capacity
+        self.average_window = max(1, min(average_window, capacity))
+        self.laps: list = []
+        self.deltas: list = []
+        self.numbers: list = []
+        self.total = 0
+
+    def add(self, lap_ns: int) -> None:
+        if len(self.laps) == self.capacity:
+            self.drop_oldest()
+        self.deltas.append(lap_ns - min(self.laps) if self.laps else None)
+        self.laps.append(lap_ns)
+        self.total += 1
+        self.numbers.append(self.total)
+
+    def drop_oldest(self) -> None:
+        if self.laps:
+            del self.laps[0], self.deltas[0], self.numbers[0]
+
+    def best_number(self):
+        if not self.laps:
+            return None
+        # the first lap to set the best time keeps it
+        return self.numbers[self.laps.index(min(self.laps))]
+
+    def average_ns(self):
+        window = self.laps[-self.average_window :]
+        return sum(window) // len(window) if window else None
+
+
+class TestLapHistory(unittest.TestCase):
+    def test_best_average_and_delta(self):
+        history = LapHistory(capacity=10, average_window=3)
+        self.assertIsNone(history.best())
+        self.assertIsNone(history.average_ns())
+        self.assertIsNone(history.delta_ns())
+
+        for lap_ns in (30, 20, 25, 10):
+            history.add(lap_ns)
+        self.assertEqual(history.best().lap_ns, 10)
+        self.assertEqual(history.last().lap_ns, 10)
+        self.assertEqual(history.average_ns(), (20 + 25 + 10) // 3)
+        self.assertEqual(history.delta_ns(), 10 - 20)
+        self.assertEqual([history.lap(age).delta_ns for age in range(4)], [-10, 5, -10, None])
+
+    def test_equal_lap_keeps_the_first_best(self):
+        history = LapHistory()
+        first, _ = history.add(20)
+        history.add(20)
+        self.assertIs(history.best(), first)
+
+    def test_best_is_dropped_with_the_ring(self):
+        history = LapHistory(capacity=3)
+        for lap_ns in (10, 40, 30):
+            history.add(lap_ns)
+        _, dropped = history.add(50)
+        self.assertEqual(dropped.lap_ns, 10)
+        self.assertEqual(history.best().lap_ns, 30)
+        self.assertEqual(history.age_of(dropped.number), -1)
+
+    def test_formatting(self):
+        self.assertEqual(format_lap(None), "")
+        self.assertEqual(format_lap(61_234_000_000), format_lap(61_234_999_999))
+        self.assertEqual(format_delta(1_204_000_000), "+1.204")
+        self.assertEqual(format_delta(-250_000_000), "-0.250")
+        self.assertEqual(format_delta(None), "")
+
+    def test_random_against_reference(self):
+        rng = random.Random(19)
+        for _ in range(50):
+            capacity = rng.randint(1, 12)
+            average_window = rng.randint(1, 15)
+            history = LapHistory(capacity, average_window)
+            reference = ReferenceHistory(capacity, average_window)
+            for _ in range(rng.randint(1, 200)):
+                action = rng.random()
+                if action < 0.05:
+                    history.clear()
+                    reference = ReferenceHistory(capacity, average_window)
+                elif action < 0.15:
+                    history.drop_oldest()
+                    reference.drop_oldest()
+                else:
+                    # a small range for many equal laps
+                    lap_ns = rng.randint(1, 20)
+                    history.add(lap_ns)
+                    reference.add(lap_ns)
+
+                self.assertEqual(len(history), len(reference.laps))
+                self.assertEqual([history.lap(age).lap_ns for age in range(len(history))], reference.laps[::-1])
+                self.assertEqual([history.lap(age).delta_ns for age in range(len(history))], reference.deltas[::-1])
+                best = history.best()
+                self.assertEqual(best.number if best is not None else None, reference.best_number())
+                self.assertEqual(history.average_ns(), reference.average_ns())
+                self.assertEqual(history.delta_ns(), reference.deltas[-1] if reference.laps else None)
+
+
+class TestLapListModel(unittest.TestCase):
+    def assert_rows(self, model: LapListModel, reference: ReferenceHistory) -> None:
+        rows = model.rowCount()
+        self.assertEqual(rows, len(reference.laps))
+        numbers = [model.data(model.index(row), LAP_NUMBER_ROLE) for row in range(rows)]
+        self.assertEqual(numbers, reference.numbers[::-1])
+        best = [model.data(model.index(row), LAP_BEST_ROLE) for row in range(rows)]
+        self.assertEqual(best, [number == reference.best_number() for number in reference.numbers[::-1]])
+        deltas = [model.data(model.index(row), LAP_DELTA_ROLE) for row in range(rows)]
+        self.assertEqual(deltas, [format_delta(delta) for delta in reference.deltas[::-1]])
+
+    def test_rows_follow_the_laps(self):
+        model = LapListModel(capacity=5, average_window=3)
+        tester = QAbstractItemModelTester(model, QAbstractItemModelTester.FailureReportingMode.Fatal)
+        reference = ReferenceHistory(5, 3)
+        model.set_driver("Ann")
+        for lap_ns in (3_000_000_000, 2_000_000_000, 2_500_000_000):
+            model.add_lap(lap_ns)
+            reference.add(lap_ns)
+        self.assert_rows(model, reference)
+        self.assertEqual(model.best_lap, format_lap(2_000_000_000))
+        self.assertEqual(model.last_delta, "+0.500")
+
+        model.set_driver("Bob")
+        self.assertEqual(model.rowCount(), 0)
+        model.set_driver("Ann")
+        self.assert_rows(model, reference)
+
+        model.clear()
+        self.assertEqual(model.rowCount(), 0)
+        self.assertEqual(model.best_lap, "")
+        del tester
+
+    def test_random_against_reference(self):
+        rng = random.Random(23)
+        model = LapListModel(capacity=6, average_window=3)
+        tester = QAbstractItemModelTester(model, QAbstractItemModelTester.FailureReportingMode.Fatal)
+        model.set_driver("Ann")
+        references = {driver: ReferenceHistory(6, 3) for driver in ("Ann", "Bob")}
+        best_changes: list = []
+        model.dataChanged.connect(lambda top, bottom, roles: best_changes.append(top.row()))
+
+        for _ in range(500):
+            action = rng.random()
+            if action < 0.05:
+                model.set_driver(rng.choice(list(references)))
+            elif action < 0.08:
+                model.clear()
+                references[model.driver] = ReferenceHistory(6, 3)
+            else:
+                reference = references[model.driver]
+                previous_best = reference.best_number()
+                del best_changes[:]
+                lap_ns = rng.randint(1, 10) * 1_000_000_000
+                model.add_lap(lap_ns)
+                reference.add(lap_ns)
+                if previous_best != reference.best_number():
+                    # the new lap is inserted as the best, only the old best's row needs an update
+                    self.assertLessEqual(len(best_changes), 2)
+                else:
+                    self.assertEqual(best_changes, [])
+            self.assert_rows(model, references[model.driver])
+            self.assertEqual(model.average_lap, format_lap(references[model.driver].average_ns()))
+        del tester
+
+
+if __name__ == "__main__":
+    unittest.main()
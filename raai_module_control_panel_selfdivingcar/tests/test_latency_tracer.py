@@ -0,0 +1,153 @@
+# Copyright (C) 2023, NG:ITL
+import json
+import os
+import random
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from control_panel_backend import latency_tracer
+from control_panel_backend.latency_tracer import STAGE_MODEL_SET_ALL, LatencyHistogram, LatencyTracer
+
+from tests.helpers import close_driver_input_panel, driver_input_panel, qt_application
+
+APP = qt_application()
+
+
+def bucket_lower_bound(value: int, sub_bucket_bits: int = 7) -> int:
+    histogram = LatencyHistogram(sub_bucket_bits)
+    histogram.record(value)
+    return histogram.percentile(50)
+
+
+class TestLatencyHistogram(unittest.TestCase):
+    def test_small_values_are_exact(self):
+        for value in range(2**7):
+            self.assertEqual(bucket_lower_bound(value), value)
+
+    def test_bucket_bounds(self):
+        values = [2**exponent + offset for exponent in range(7, 41) for offset in (-1, 0, 1)]
+        values += [1000, 1_000_000, 123_456_789]
+        for value in values:
+            lower = bucket_lower_bound(value)
+            # above 2 ** 7 every power of two is split into 64 buckets
+            width = 1 << max(0, value.bit_length() - 7)
+            self.assertLessEqual(lower, value)
+            self.assertLess(value, lower + width)
+            self.assertEqual(lower % width, 0)
+            self.assertLess((value - lower) / value, 2**-6)
+            # the first value of the next bucket starts it
+            self.assertEqual(bucket_lower_bound(lower + width), lower + width)
+            self.assertEqual(bucket_lower_bound(lower + width - 1), lower)
+
+    def test_percentiles_match_numpy(self):
+        rng = random.Random(5)
+        # latencies of a few µs with a long tail up to milliseconds
+        values = [int(rng.lognormvariate(10, 1.2)) for _ in range(20_000)]
+        histogram = LatencyHistogram()
+        for value in values:
+            histogram.record(value)
+
+        for p in (1, 10, 50, 90, 99, 99.9):
+            exact = np.percentile(values, p, method="inverted_cdf")
+            self.assertLessEqual(abs(histogram.percentile(p) - exact) / exact, 2**-6, p)
+        self.assertEqual(histogram.percentile(100), bucket_lower_bound(max(values)))
+        self.assertEqual((histogram.min, histogram.max, histogram.count), (min(values), max(values), len(values)))
+        self.assertAlmostEqual(histogram.summary()["mean_ns"], float(np.mean(values)))
+
+    def test_empty_and_negative(self):
+        histogram = LatencyHistogram()
+        self.assertEqual(histogram.summary()["p99_ns"], 0)
+        histogram.record(-5)
+        self.assertEqual((histogram.min, histogram.max, histogram.percentile(50)), (0, 0, 0))
+
+
+class TestLatencyTracer(unittest.TestCase):
+    def setUp(self) -> None:
+        clock = mock.patch("control_panel_backend.latency_tracer.time.monotonic_ns")
+        self.monotonic_ns = clock.start()
+        self.addCleanup(clock.stop)
+        self.tracer = LatencyTracer(capacity=4)
+
+    def trace(self, start_ns: int, batch_size: int, latency_ns: int) -> None:
+        self.monotonic_ns.return_value = start_ns
+        self.tracer.begin(batch_size)
+        self.monotonic_ns.return_value = start_ns + latency_ns
+        self.tracer.mark(STAGE_MODEL_SET_ALL)
+        # later calls in the same trace don't count again
+        self.monotonic_ns.return_value = start_ns + 10 * latency_ns
+        self.tracer.mark(STAGE_MODEL_SET_ALL)
+
+    def test_stages_and_batch_sizes_are_accounted_separately(self):
+        self.tracer.mark(STAGE_MODEL_SET_ALL)
+        self.trace(1000, batch_size=5, latency_ns=500)
+        self.trace(2000, batch_size=1, latency_ns=64)
+
+        stats = self.tracer.stats()
+        # there is no send stage, driver input doesn't cause a publish, and receipt starts the trace
+        self.assertEqual(set(stats), {"model_set_all", "batch_size", "traces"})
+        self.assertEqual(stats["traces"], 2)
+        self.assertEqual(stats["model_set_all"]["count"], 2)
+        self.assertEqual((stats["model_set_all"]["min_ns"], stats["model_set_all"]["max_ns"]), (64, 500))
+        self.assertEqual(stats["batch_size"]["count"], 2)
+        self.assertEqual((stats["batch_size"]["min"], stats["batch_size"]["max"]), (1, 5))
+        self.assertEqual(stats["batch_size"]["mean"], 3)
+
+    def test_ring_buffer_keeps_the_newest_events(self):
+        self.trace(1000, 1, 100)
+        self.trace(2000, 1, 100)
+        self.trace(3000, 1, 100)
+        self.assertEqual(
+            self.tracer.events(),
+            [
+                (2, "driver_input", 2000),
+                (2, "model_set_all", 2100),
+                (3, "driver_input", 3000),
+                (3, "model_set_all", 3100),
+            ],
+        )
+
+        self.tracer.reset()
+        self.assertEqual(self.tracer.events(), [])
+        self.assertEqual(self.tracer.stats()["model_set_all"]["count"], 0)
+
+    def test_dump(self):
+        directory = tempfile.mkdtemp(prefix="raai_test_")
+        self.addCleanup(shutil.rmtree, directory, True)
+        self.trace(1000, 2, 100)
+        path = os.path.join(directory, "latency.json")
+        self.tracer.dump(path)
+        with open(path) as file:
+            dump = json.load(file)
+        self.assertEqual(dump["stats"]["batch_size"]["max"], 2)
+        self.assertEqual(dump["events"], [[1, "driver_input", 1000], [1, "model_set_all", 1100]])
+
+
+class TestDriverInputTracing(unittest.TestCase):
+    def setUp(self) -> None:
+        self.directory = tempfile.mkdtemp(prefix="raai_test_")
+        self.addCleanup(shutil.rmtree, self.directory, True)
+        self.panel = driver_input_panel(self.directory)
+        self.addCleanup(close_driver_input_panel, self.panel)
+        self.addCleanup(latency_tracer.disable_tracing)
+
+    def test_batches_are_traced_once(self):
+        payload = {"throttle": 0.5, "brake": 0.0, "clutch": 0.0, "steering": 0.0}
+        self.panel.handle_driver_input_batch([payload] * 3)
+        tracer = latency_tracer.enable_tracing()
+        self.panel.handle_driver_input_batch([payload] * 3)
+        self.panel.handle_driver_input_batch([payload])
+        self.panel.handle_driver_input_batch([])
+
+        stats = tracer.stats()
+        self.assertEqual(stats["traces"], 2)
+        self.assertEqual(stats["model_set_all"]["count"], 2)
+        self.assertEqual((stats["batch_size"]["min"], stats["batch_size"]["max"]), (1, 3))
+        self.assertEqual([stage for _, stage, _ in tracer.events()], ["driver_input", "model_set_all"] * 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,95 @@
+# Copyright (C) 2023, NG:ITL
+import time
+import shutil
+import tempfile
+import threading
+import unittest
+
+import pynng
+
+
+from control_panel_backend.request_client import RequestClient
+
+from tests.helpers import process_events, qt_application, wait_for
+
+APP = qt_application()
+
+
+class SlowService:
+    """A Rep socket that answers every request after delay_s and counts them."""
+
+    def __init__(self, address: str, delay_s: float) -> None:
+        self.delay_s = delay_s
+        self.requests: list = []
+        self._rep = pynng.Rep0()
+        self._rep.listen(address)
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            try:
+                request = self._rep.recv().decode("utf-8")
+                self.requests.append(request)
+                time.sleep(self.delay_s)
+                self._rep.send(b"done " + request.encode("utf-8"))
+            except pynng.Closed:
+                return
+
+    def close(self) -> None:
+        self._rep.close()
+
+
+class TestRequestClient(unittest.TestCase):
+    def setUp(self) -> None:
+        self.directory = tempfile.mkdtemp(prefix="raai_test_")
+        self.address = f"ipc://{self.directory}/rest_api.ipc"
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def run_request(self, delay_s: float, **kwargs) -> tuple:
+        service = SlowService(self.address, delay_s)
+        client = RequestClient(self.address, timeout_ms=100, retries=2)
+        replies: list = []
+        errors: list = []
+        try:
+            client.request("post_driver: Ann", replies.append, errors.append, **kwargs)
+            self.assertTrue(wait_for(lambda: replies or errors))
+            # attempts that timed out may still arrive at the service
+            process_events(2 * delay_s)
+        finally:
+            client.close(timeout=1)
+            service.close()
+        return replies, errors, service.requests
+
+    def test_reply(self):
+        replies, errors, requests = self.run_request(0.0)
+        self.assertEqual(replies, ["done post_driver: Ann"])
+        self.assertEqual(requests, ["post_driver: Ann"])
+
+    def test_timed_out_request_is_retried(self):
+        replies, errors, requests = self.run_request(0.15)
+        self.assertEqual(len(errors) + len(replies), 1)
+        self.assertGreater(len(requests), 1)
+
+    def test_request_without_retries_is_sent_once(self):
+        replies, errors, requests = self.run_request(0.15, retries=0)
+        self.assertEqual(len(errors), 1)
+        self.assertEqual(requests, ["post_driver: Ann"])
+
+    def test_duplicate_request_is_not_queued(self):
+        service = SlowService(self.address, 0.05)
+        client = RequestClient(self.address, timeout_ms=500)
+        try:
+            self.assertTrue(client.request("get_drivers"))
+            self.assertFalse(client.request("get_drivers"))
+            self.assertTrue(wait_for(lambda: not client.is_pending("get_drivers")))
+        finally:
+            client.close(timeout=1)
+            service.close()
+        self.assertEqual(service.requests, ["get_drivers"])
+
+
+if __name__ == "__main__":
+    unittest.main()
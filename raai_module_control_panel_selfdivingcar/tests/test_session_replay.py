@@ -0,0 +1,160 @@
+# Copyright (C) 2023, NG:ITL
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+import pynng
+
+from control_panel_backend import telemetry_recorder
+from control_panel_backend.session_replay import SessionReplay, build_timeline
+from control_panel_backend.telemetry_recorder import TOPIC_DRIVER_INPUT, TelemetryRecorder, load_session
+from control_panel_backend.wire_format import decode_message
+
+from tests.helpers import close_driver_input_panel, driver_input_panel, process_events, qt_application, wait_for
+
+APP = qt_application()
+
+PEDALS_CONFIG = {
+    "max_throttle": 50.0,
+    "max_brake": 20.0,
+    "max_clutch": 80.0,
+    "max_steering": 40.0,
+    "steering_offset": 0.2,
+}
+STEERING_CONFIG = {"throttle": 0, "brake": 0, "clutch": 0, "steering": 10.0, "steering_offset": 0.2}
+PANEL_CONFIG = {
+    "max_throttle": 90.0,
+    "max_brake": 91.0,
+    "max_clutch": 92.0,
+    "max_steering": 93.0,
+    "steering_offset": 0.0,
+}
+
+
+def driver_input(throttle: float, steering: float = 0.0) -> dict:
+    return {"throttle": throttle, "brake": 0.5, "clutch": 0.25, "steering": steering}
+
+
+class TestSessionReplay(unittest.TestCase):
+    def setUp(self) -> None:
+        self.directory = tempfile.mkdtemp(prefix="raai_test_")
+        self.addCleanup(shutil.rmtree, self.directory, True)
+
+        # a session with the batches the panel drained and the configs it published in between
+        recorder = TelemetryRecorder(os.path.join(self.directory, "recorded"), session="session")
+        recorder.record_sent("config", PEDALS_CONFIG)
+        for batch in ([driver_input(0.1), driver_input(0.2), driver_input(0.3)], [driver_input(0.4)]):
+            recorder.record_driver_input(batch)
+        recorder.record_sent("config", STEERING_CONFIG)
+        for batch in ([driver_input(0.5, -0.5), driver_input(0.6, 1.0)], [driver_input(0.7, 0.5)]):
+            recorder.record_driver_input(batch)
+        recorder.close()
+        self.records = np.concatenate(load_session(recorder.directory, "session"))
+
+        self.panel = driver_input_panel(self.directory)
+        self.addCleanup(close_driver_input_panel, self.panel)
+        model = self.panel.control_panel_model
+        model.set_pedal_status(True)
+        for name, value in PANEL_CONFIG.items():
+            getattr(model, "set_" + name)(value)
+        self.live_recorder = self.panel.start_telemetry_recording(os.path.join(self.directory, "live"))
+
+        self.config_sub = pynng.Sub0(
+            dial=f"ipc://{self.directory}/control_panel.ipc", topics="config ", recv_timeout=200
+        )
+        self.addCleanup(self.config_sub.close)
+        process_events(0.1)
+
+    def received_configs(self) -> list:
+        configs = []
+        while True:
+            try:
+                configs.append(decode_message(self.config_sub.recv())[1])
+            except pynng.Timeout:
+                return configs
+
+    def test_timeline_keeps_the_batches(self):
+        timeline = build_timeline(self.records)
+        self.assertEqual([len(values) for _, topic_id, _, values in timeline], [5, 3, 1, 5, 2, 1])
+        self.assertEqual(timeline[0][3], PEDALS_CONFIG)
+        self.assertEqual(timeline[1][3][-1], dict(driver_input(0.3), tilt_x=0.0, tilt_y=0.0, vibration=0.0))
+
+    def test_replay_runs_through_the_driver_input_path(self):
+        panel = self.panel
+        model = panel.control_panel_model
+        during: list = []
+
+        def observe(payloads: list) -> None:
+            during.append(
+                {
+                    "samples": len(payloads),
+                    "max_throttle": model.get_max_throttle(),
+                    "max_steering": model.get_max_steering(),
+                    "live_driver_input": panel._notifier.isEnabled(),
+                    "recording": telemetry_recorder.RECORDER is not None
+                    or self.live_recorder.record_driver_input in panel.driver_input_listeners,
+                }
+            )
+
+        panel.driver_input_listeners.append(observe)
+        stats: list = []
+        replay = SessionReplay(panel, self.records, speed=0)
+        replay.finished.connect(stats.append)
+        replay.start()
+        self.assertTrue(wait_for(lambda: stats))
+
+        # every batch went through handle_driver_input_batch, with the max values of its recorded config
+        self.assertEqual([batch["samples"] for batch in during], [3, 1, 2, 1])
+        self.assertEqual([batch["max_throttle"] for batch in during], [50.0] * 4)
+        self.assertEqual([batch["max_steering"] for batch in during], [40.0, 40.0, 10.0, 10.0])
+        self.assertEqual(stats[0]["samples"], 7)
+        self.assertEqual(stats[0]["processed"], 4)
+        self.assertEqual(panel.get_driver_input_stats(), {"received": 7, "coalesced": 3, "displayed": 4})
+        self.assertAlmostEqual(model.get_throttle(), 0.7 * 0.5)
+        self.assertAlmostEqual(model.get_steering(), 0.5 * 0.1)
+
+        # the live input, the config publishing and the recording were off during the replay
+        self.assertFalse(any(batch["live_driver_input"] or batch["recording"] for batch in during))
+        # and on again afterwards, with the config of the panel
+        self.assertTrue(panel._notifier.isEnabled())
+        self.assertIs(telemetry_recorder.RECORDER, self.live_recorder)
+        self.assertIn(self.live_recorder.record_driver_input, panel.driver_input_listeners)
+        self.assertTrue(model.get_pedal_status())
+        self.assertEqual({name: getattr(model, "get_" + name)() for name in PANEL_CONFIG}, PANEL_CONFIG)
+        # only the restored config was published, the replayed ones never reached the car
+        self.assertEqual(self.received_configs(), [PANEL_CONFIG])
+
+        # nothing of the replay was recorded, the restored config is
+        panel.stop_telemetry_recording()
+        (live,) = load_session(self.live_recorder.directory, self.live_recorder.session)
+        self.assertEqual(np.count_nonzero(live["topic_id"] == TOPIC_DRIVER_INPUT), 0)
+        self.assertEqual(live["values"][-1][:5].tolist(), list(PANEL_CONFIG.values()))
+
+    def test_stopped_replay_restores_the_panel(self):
+        stats: list = []
+        replay = SessionReplay(self.panel, self.records, speed=0.001)
+        replay.finished.connect(stats.append)
+        replay.start()
+        self.assertTrue(wait_for(lambda: self.panel.control_panel_model.get_max_throttle() == 50.0))
+        self.assertFalse(self.panel._notifier.isEnabled())
+        self.assertIsNone(telemetry_recorder.RECORDER)
+
+        replay.stop()
+        self.assertEqual(len(stats), 1)
+        self.assertTrue(self.panel._notifier.isEnabled())
+        self.assertIs(telemetry_recorder.RECORDER, self.live_recorder)
+        self.assertEqual(self.panel.control_panel_model.get_max_throttle(), 90.0)
+        self.assertEqual(self.received_configs(), [PANEL_CONFIG])
+
+    def test_paused_recording_can_be_stopped(self):
+        self.panel.set_telemetry_recording_paused(True)
+        self.panel.stop_telemetry_recording()
+        self.assertIsNone(self.panel.telemetry_recorder)
+        self.assertIsNone(telemetry_recorder.RECORDER)
+        self.assertEqual(self.panel.driver_input_listeners, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
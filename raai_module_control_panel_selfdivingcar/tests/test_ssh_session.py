@@ -0,0 +1,135 @@
+# Copyright (C) 2023, NG:ITL
+import unittest
+from unittest import mock
+
+from control_panel_backend.ssh_session import SshSession, SshSessionManager
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class TestSshSession(unittest.TestCase):
+    def setUp(self) -> None:
+        self.clients: list = []
+        self.connect_error: Exception | None = None
+        ssh_client = mock.patch("control_panel_backend.ssh_session.paramiko.SSHClient", side_effect=self.new_client)
+        self.ssh_client = ssh_client.start()
+        self.addCleanup(ssh_client.stop)
+        self.clock = FakeClock()
+        monotonic = mock.patch("control_panel_backend.ssh_session.time.monotonic", self.clock)
+        monotonic.start()
+        self.addCleanup(monotonic.stop)
+        self.session = SshSession("car", 22, "itlab", "secret", min_backoff_s=0.5, max_backoff_s=2.0)
+
+    def new_client(self) -> mock.MagicMock:
+        client = mock.MagicMock(name=f"client{len(self.clients)}")
+        client.get_transport.return_value.is_active.return_value = True
+        if self.connect_error is not None:
+            client.connect.side_effect = self.connect_error
+        self.clients.append(client)
+        return client
+
+    def test_connection_is_reused(self):
+        self.session.exec_command("ls")
+        self.session.exec_command("pwd")
+        self.session.write_file("/tmp/a.json", "{}")
+        self.session.put_file("local.json", "/tmp/b.json")
+
+        self.assertEqual(len(self.clients), 1)
+        client = self.clients[0]
+        client.connect.assert_called_once()
+        self.assertEqual(client.exec_command.call_args_list, [mock.call("ls"), mock.call("pwd")])
+        # the sftp channel is opened once for both transfers
+        client.open_sftp.assert_called_once()
+        client.open_sftp.return_value.put.assert_called_once_with("local.json", "/tmp/b.json")
+        client.get_transport.return_value.set_keepalive.assert_called_once_with(self.session.keep_alive_interval_s)
+
+    def test_dropped_transport_reconnects(self):
+        self.session.write_file("/tmp/a.json", "{}")
+        old_client = self.clients[0]
+        old_client.get_transport.return_value.is_active.return_value = False
+        self.assertFalse(self.session.is_connected())
+
+        self.session.write_file("/tmp/a.json", "{}")
+        self.assertEqual(len(self.clients), 2)
+        old_client.close.assert_called_once()
+        old_client.open_sftp.return_value.close.assert_called_once()
+        # the new connection gets its own sftp channel
+        self.clients[1].open_sftp.assert_called_once()
+        self.assertTrue(self.session.is_connected())
+
+    def test_failed_operation_is_retried_on_a_new_connection(self):
+        self.session.exec_command("ls")
+        self.clients[0].exec_command.side_effect = EOFError()
+
+        self.session.exec_command("pwd")
+        self.assertEqual(len(self.clients), 2)
+        self.clients[0].close.assert_called_once()
+        self.clients[1].exec_command.assert_called_once_with("pwd")
+
+    def assert_connect_fails(self) -> None:
+        attempts = len(self.clients)
+        with self.assertRaisesRegex(OSError, "unreachable"):
+            self.session.exec_command("ls")
+        self.assertEqual(len(self.clients), attempts + 1)
+        self.clients[-1].close.assert_called_once()
+
+    def test_failed_connects_back_off(self):
+        self.connect_error = OSError("unreachable")
+        self.assert_connect_fails()
+
+        # within the backoff no connection is attempted
+        self.clock.now += 0.4
+        with self.assertRaisesRegex(ConnectionError, "retrying"):
+            self.session.exec_command("ls")
+        self.assertEqual(len(self.clients), 1)
+
+        # the backoff doubles after every failed attempt up to max_backoff_s
+        for backoff_s in (1.0, 2.0, 2.0):
+            self.clock.now += 0.1
+            self.assert_connect_fails()
+            attempts = len(self.clients)
+            self.clock.now += backoff_s - 0.01
+            with self.assertRaises(ConnectionError):
+                self.session.exec_command("ls")
+            self.assertEqual(len(self.clients), attempts)
+            self.clock.now += 0.01
+
+        # a successful connect resets the backoff
+        self.connect_error = None
+        self.session.exec_command("ls")
+        self.assertTrue(self.session.is_connected())
+        self.clients[-1].get_transport.return_value.is_active.return_value = False
+        self.connect_error = OSError("unreachable")
+        self.assert_connect_fails()
+        self.clock.now += 0.5
+        self.assert_connect_fails()
+
+    def test_close_drops_the_connection(self):
+        self.session.write_file("/tmp/a.json", "{}")
+        self.session.close()
+        self.clients[0].close.assert_called_once()
+        self.assertFalse(self.session.is_connected())
+
+
+class TestSshSessionManager(unittest.TestCase):
+    def test_one_session_per_host_port_and_user(self):
+        manager = SshSessionManager()
+        session = manager.get("car", 22, "itlab", "secret")
+        self.assertIs(manager.get("car", 22, "itlab", "secret"), session)
+        self.assertIsNot(manager.get("car", 2222, "itlab", "secret"), session)
+        self.assertIsNot(manager.get("car", 22, "root", "secret"), session)
+
+        with mock.patch.object(SshSession, "close") as close:
+            manager.close_all()
+        self.assertEqual(close.call_count, 3)
+        self.assertIsNot(manager.get("car", 22, "itlab", "secret"), session)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,143 @@
+# Copyright (C) 2023, NG:ITL
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from control_panel_backend.telemetry_recorder import (
+    DRIVER_INPUT_FLAG_IN_BATCH,
+    DRIVER_INPUT_MAX_SPREAD_NS,
+    HEADER_SIZE,
+    RECORD_DTYPE,
+    TOPIC_CONFIG,
+    TOPIC_DRIVER_INPUT,
+    TelemetryRecorder,
+    list_sessions,
+    load_segment,
+    load_session,
+    session_segments,
+    topic_values,
+)
+from control_panel_backend.wire_format import CONFIG_FLAG_PEDALS_ACTIVE, DRIVER_INPUT_FIELDS
+
+MS = 1_000_000
+
+
+class TestTelemetryRecorder(unittest.TestCase):
+    def setUp(self) -> None:
+        self.directory = tempfile.mkdtemp(prefix="raai_test_")
+        self.addCleanup(shutil.rmtree, self.directory, True)
+
+    def records(self, count: int) -> np.ndarray:
+        records = np.zeros(count, dtype=RECORD_DTYPE)
+        records["timestamp_ns"] = np.arange(count) * 1000 + 123
+        records["topic_id"] = np.where(np.arange(count) % 3, TOPIC_DRIVER_INPUT, TOPIC_CONFIG)
+        records["flags"] = np.arange(count) % 2
+        records["values"] = np.arange(count * 7).reshape(count, 7) / 8
+        return records
+
+    def append(self, recorder: TelemetryRecorder, records: np.ndarray) -> None:
+        for record in records:
+            recorder.append(
+                int(record["timestamp_ns"]), int(record["topic_id"]), int(record["flags"]), record["values"]
+            )
+
+    def test_records_round_trip(self):
+        recorder = TelemetryRecorder(self.directory, segment_records=64, session="trip")
+        written = self.records(10)
+        self.append(recorder, written)
+
+        # readable while the recorder is still writing
+        self.assertEqual(len(load_segment(recorder.segment_path(0))), 10)
+        recorder.close()
+
+        loaded = load_segment(recorder.segment_path(0))
+        self.assertEqual(loaded.dtype, RECORD_DTYPE)
+        np.testing.assert_array_equal(loaded, written)
+        # the unused preallocated records are cut off
+        self.assertEqual(os.path.getsize(recorder.segment_path(0)), HEADER_SIZE + 10 * RECORD_DTYPE.itemsize)
+
+    def test_payloads_round_trip(self):
+        recorder = TelemetryRecorder(self.directory, session="payloads")
+        config = {"max_throttle": 50.0, "max_brake": 20.0, "max_clutch": 80.0, "max_steering": 40.0}
+        recorder.record_sent("config", dict(config, steering_offset=-0.5))
+        recorder.record_sent("driver_input", {"throttle": 0.25, "steering": -1.0})
+        recorder.record_sent("lap_time", {"time": 1.0})
+        recorder.close()
+
+        (records,) = load_session(self.directory, "payloads")
+        self.assertEqual(records["topic_id"].tolist(), [TOPIC_CONFIG, TOPIC_DRIVER_INPUT])
+        self.assertEqual(records["flags"][0], CONFIG_FLAG_PEDALS_ACTIVE)
+        (recorded_config,) = topic_values(records, TOPIC_CONFIG)
+        self.assertEqual(recorded_config["max_clutch"], 80.0)
+        self.assertEqual(recorded_config["steering_offset"], -0.5)
+        (sample,) = topic_values(records, TOPIC_DRIVER_INPUT)
+        self.assertEqual([sample[field] for field in DRIVER_INPUT_FIELDS], [0.25, 0, 0, -1.0, 0, 0, 0])
+
+    def test_segment_rollover(self):
+        recorder = TelemetryRecorder(self.directory, segment_records=4, session="rollover")
+        written = self.records(10)
+        self.append(recorder, written)
+        self.assertEqual(recorder.records_written, 10)
+        recorder.close()
+
+        self.assertEqual(
+            [os.path.basename(path) for path in session_segments(self.directory, "rollover")],
+            ["rollover_0000.tlm", "rollover_0001.tlm", "rollover_0002.tlm"],
+        )
+        segments = load_session(self.directory, "rollover")
+        self.assertEqual([len(segment) for segment in segments], [4, 4, 2])
+        np.testing.assert_array_equal(np.concatenate(segments), written)
+        self.assertEqual(list_sessions(self.directory), ["rollover"])
+
+    def test_full_segment_rolls_over_on_the_next_record(self):
+        recorder = TelemetryRecorder(self.directory, segment_records=4, session="full")
+        self.append(recorder, self.records(4))
+        recorder.close()
+        self.assertEqual([len(segment) for segment in load_session(self.directory, "full")], [4])
+
+    def test_samples_of_a_batch_are_spread(self):
+        clock = mock.patch("control_panel_backend.telemetry_recorder.time.monotonic_ns")
+        monotonic_ns = clock.start()
+        self.addCleanup(clock.stop)
+        recorder = TelemetryRecorder(self.directory, session="spacing")
+        payloads = [{"throttle": i / 10} for i in range(4)]
+
+        # the first batch is spread over at most DRIVER_INPUT_MAX_SPREAD_NS per sample
+        monotonic_ns.return_value = 1000 * MS
+        recorder.record_driver_input(payloads)
+        # a burst after 2 ms, its samples are spread over the 2 ms since the previous batch
+        monotonic_ns.return_value = 1002 * MS
+        recorder.record_driver_input(payloads)
+        # a gap longer than the spread is idle time, not spacing within the batch
+        monotonic_ns.return_value = 2000 * MS
+        recorder.record_driver_input(payloads[:2])
+        recorder.record_driver_input(payloads[:1])
+        recorder.close()
+
+        (records,) = load_session(self.directory, "spacing")
+        spread = DRIVER_INPUT_MAX_SPREAD_NS
+        self.assertEqual(
+            records["timestamp_ns"].tolist(),
+            [1000 * MS - 3 * spread, 1000 * MS - 2 * spread, 1000 * MS - spread, 1000 * MS]
+            + [1000 * MS + MS // 2, 1001 * MS, 1001 * MS + MS // 2, 1002 * MS]
+            + [2000 * MS - spread, 2000 * MS]
+            + [2000 * MS],
+        )
+        in_batch = DRIVER_INPUT_FLAG_IN_BATCH
+        self.assertEqual(records["flags"].tolist(), [0, in_batch, in_batch, in_batch] * 2 + [0, in_batch, 0])
+        self.assertEqual(records["values"][:4, 0].tolist(), [0.0, 0.1, 0.2, 0.3])
+
+    def test_other_files_are_rejected(self):
+        path = os.path.join(self.directory, "other_0000.tlm")
+        with open(path, "wb") as file:
+            file.write(b"\0" * HEADER_SIZE)
+        with self.assertRaises(ValueError):
+            load_segment(path)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,56 @@
+# Copyright (C) 2023, NG:ITL
+import unittest
+
+from control_panel_backend.timer_model import Timer, format_time
+
+MS = 1000 * 1000
+
+
+class TestTimer(unittest.TestCase):
+    def setUp(self) -> None:
+        self.timer = Timer(0, 0, 0)
+        self.signals: list = []
+        self.timestamps: list = []
+        for name in ("millis", "seconds", "minutes", "hours"):
+            getattr(self.timer, f"{name}_changed").connect(lambda name=name: self.signals.append(name))
+        self.timer.timestamp_changed.connect(self.timestamps.append)
+
+    def test_format_time(self):
+        self.assertEqual(format_time(0, 1, 2, 3), "01:02.003")
+        self.assertEqual(format_time(2, 0, 59, 999), "2:00:59.999")
+
+    def test_only_changed_fields_emit(self):
+        self.timer.set_fields(0, 0, 0, 5)
+        self.assertEqual(self.signals, ["millis"])
+        self.assertEqual(self.timestamps, ["00:00.005"])
+
+        del self.signals[:], self.timestamps[:]
+        self.timer.set_fields(1, 2, 3, 5)
+        self.assertEqual(self.signals, ["seconds", "minutes", "hours"])
+        self.assertEqual(self.timestamps, ["1:02:03.005"])
+
+    def test_unchanged_fields_dont_emit(self):
+        self.timer.set_fields(0, 0, 0, 0)
+        self.timer.set_timestamp(MS - 1)
+        self.assertEqual(self.signals, [])
+        self.assertEqual(self.timestamps, [])
+
+    def test_one_timestamp_changed_per_tick(self):
+        # ticks of a 60 Hz display across a second, a minute and an hour boundary
+        for start_ms in (900, 59_900, 3_599_900):
+            for tick in range(12):
+                del self.timestamps[:]
+                timestamp_ns = (start_ms + tick * 17) * MS
+                self.timer.set_timestamp(timestamp_ns)
+                self.assertEqual(len(self.timestamps), 1)
+                self.assertEqual(self.timer.timestamp, self.timestamps[0])
+                self.assertEqual(self.timer.timestamp_ns, timestamp_ns)
+
+    def test_field_setters(self):
+        self.timer.minutes = 4
+        self.assertEqual(self.signals, ["minutes"])
+        self.assertEqual(self.timestamps, ["04:00.000"])
+
+
+if __name__ == "__main__":
+    unittest.main()
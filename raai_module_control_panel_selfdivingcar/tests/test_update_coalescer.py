@@ -0,0 +1,55 @@
+# Copyright (C) 2023, NG:ITL
+import time
+import unittest
+
+from control_panel_backend.update_coalescer import UpdateCoalescer
+
+from tests.helpers import process_events, qt_application
+
+APP = qt_application()
+
+
+class TestUpdateCoalescer(unittest.TestCase):
+    def setUp(self) -> None:
+        self.coalescer = UpdateCoalescer(interval_ms=50)
+        self.flushes: list = []
+        self.coalescer.flushed.connect(lambda updates: self.flushes.append((time.monotonic(), updates)))
+
+    def updates(self) -> list:
+        return [updates for _, updates in self.flushes]
+
+    def test_first_update_is_flushed_right_away(self):
+        self.coalescer.submit("curvespeed", 0.5)
+        self.assertEqual(self.updates(), [{"curvespeed": 0.5}])
+
+    def test_burst_is_collapsed_to_the_latest_values(self):
+        self.coalescer.submit("curvespeed", 0.1)
+        for i in range(20):
+            self.coalescer.submit("curvespeed", i)
+            self.coalescer.submit("motor", i % 2 == 0)
+        self.assertEqual(len(self.flushes), 1)
+        process_events(0.15)
+        self.assertEqual(self.updates(), [{"curvespeed": 0.1}, {"curvespeed": 19, "motor": False}])
+
+    def test_flushes_are_an_interval_apart(self):
+        for i in range(10):
+            self.coalescer.submit("curvespeed", i)
+            process_events(0.015)
+        process_events(0.1)
+        self.assertEqual(self.updates()[-1], {"curvespeed": 9})
+        times = [flushed_at for flushed_at, _ in self.flushes]
+        # a timer may fire a little early, not a whole interval
+        self.assertTrue(all(later - earlier >= 0.04 for earlier, later in zip(times, times[1:])))
+        self.assertLess(len(self.flushes), 10)
+
+    def test_flush_emits_pending_updates_once(self):
+        self.coalescer.submit("curvespeed", 1)
+        self.coalescer.submit("curvespeed", 2)
+        self.coalescer.flush()
+        self.coalescer.flush()
+        process_events(0.1)
+        self.assertEqual(self.updates(), [{"curvespeed": 1}, {"curvespeed": 2}])
+
+
+if __name__ == "__main__":
+    unittest.main()
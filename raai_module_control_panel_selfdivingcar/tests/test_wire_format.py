@@ -0,0 +1,64 @@
+# Copyright (C) 2023, NG:ITL
+import json
+import random
+import unittest
+
+from control_panel_backend.wire_format import (
+    CONFIG_FIELDS_PEDALS_ACTIVE,
+    CONFIG_FIELDS_PEDALS_INACTIVE,
+    DRIVER_INPUT_FIELDS,
+    WireFormatError,
+    binary_topic,
+    decode_message,
+    encode_message,
+)
+
+
+class TestWireFormat(unittest.TestCase):
+    def test_round_trip(self):
+        rng = random.Random(8)
+        for fields, topic in (
+            (CONFIG_FIELDS_PEDALS_ACTIVE, "config"),
+            (CONFIG_FIELDS_PEDALS_INACTIVE, "config"),
+            (DRIVER_INPUT_FIELDS, "driver_input"),
+        ):
+            for _ in range(100):
+                payload = {field: rng.uniform(-100, 100) for field in fields}
+                self.assertEqual(decode_message(encode_message(topic, payload)), (topic, payload))
+
+    def test_json_message(self):
+        payload = {"throttle": 0.5, "brake": 0.0}
+        msg = f"driver_input {json.dumps(payload)}".encode()
+        self.assertEqual(decode_message(msg), ("driver_input", payload))
+
+    def test_binary_topic_doesnt_match_json_subscribers(self):
+        msg = encode_message("config", {field: 1.0 for field in CONFIG_FIELDS_PEDALS_ACTIVE})
+        self.assertEqual(binary_topic("config"), "bin.config")
+        self.assertTrue(msg.startswith(b"bin.config "))
+        # pynng subscriptions match by prefix
+        self.assertFalse(msg.startswith(b"config"))
+        self.assertFalse(msg.startswith(b"driver_input"))
+
+    def test_undecodable_messages_raise_one_error(self):
+        config = encode_message("config", {field: 1.0 for field in CONFIG_FIELDS_PEDALS_ACTIVE})
+        version_offset = len(b"bin.config ")
+        messages = {
+            "no topic": b"config",
+            "unknown binary topic": b"bin.lap_times \x01",
+            "short frame": config[:-3],
+            "bad version": config[:version_offset] + b"\x63" + config[version_offset + 1 :],
+            "broken json": b'config {"motor": tru',
+            "bad utf-8 topic": b"\xff\xfe {}",
+        }
+        for problem, msg in messages.items():
+            with self.subTest(problem):
+                with self.assertRaises(WireFormatError):
+                    decode_message(msg)
+
+    def test_error_is_a_value_error(self):
+        with self.assertRaises(ValueError):
+            decode_message(b"bin.config \x01")
+
+
+if __name__ == "__main__":
+    unittest.main()